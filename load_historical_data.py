@@ -7,7 +7,9 @@ import sys
 import requests
 import time
 from datetime import datetime
-from modules.database import save_historical_match, get_historical_stats
+from modules.http_client import http_get
+from modules.rate_limiter import request_priority, PRIORITY_BACKGROUND
+from modules.database import save_historical_matches_bulk, get_historical_stats, init_database
 
 # Принудительный вывод без буферизации
 def log(msg):
@@ -29,18 +31,15 @@ COMPETITIONS = {
 
 
 def make_request(url):
-    """Сделать запрос к API с обработкой лимитов"""
+    """
+    Сделать запрос к API
+    Лимит 10 запросов/минуту и ответы 429 обрабатывает общий rate_limiter:
+    фоновые запросы загрузчика уступают очередь интерактивным запросам бота
+    """
     headers = {"X-Auth-Token": API_KEY}
     
     try:
-        response = requests.get(url, headers=headers)
-        
-        # Проверка лимита запросов
-        if response.status_code == 429:
-            print("⏳ Достигнут лимит API, ждем 60 секунд...")
-            time.sleep(60)
-            return make_request(url)
-        
+        response = http_get(url, headers=headers)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -120,6 +119,7 @@ def load_matches_for_competition(competition_id, competition_name, seasons):
         seasons (list): Список годов сезонов (например, ["2022", "2023", "2024"])
     """
     total_loaded = 0
+    total_failed = 0
     
     for season in seasons:
         print(f"\n📥 Загружаем {competition_name}, сезон {season}...")
@@ -147,7 +147,9 @@ def load_matches_for_competition(competition_id, competition_name, seasons):
             
             # Получаем таблицу на этот тур (один раз для всех матчей тура)
             standings = get_standings_at_matchday(competition_id, season, matchday)
-            time.sleep(6)  # Лимит API: 10 запросов/минуту
+            
+            # Матчи тура сохраняются одной пачкой
+            matchday_rows = []
             
             # Обрабатываем каждый матч
             for match in matchday_matches:
@@ -205,17 +207,25 @@ def load_matches_for_competition(competition_id, competition_name, seasons):
                         "top_scorers": None
                     }
                     
-                    # Сохраняем в БД
-                    save_historical_match(match_data)
-                    total_loaded += 1
+                    matchday_rows.append(match_data)
                     
                 except Exception as e:
                     print(f"      ⚠️ Ошибка обработки матча {match.get('id')}: {e}")
+                    total_failed += 1
                     continue
+            
+            # Сохраняем тур в БД одной транзакцией (ошибочные матчи пропускаются по одному)
+            saved, failed = save_historical_matches_bulk(matchday_rows)
+            total_loaded += saved
+            total_failed += failed
+            if failed:
+                log(f"      ⚠️ Тур {matchday}: не сохранено {failed} из {len(matchday_rows)} матчей")
         
         log(f"✅ Сезон {season} завершен")
     
     log(f"\n🎯 Загружено {total_loaded} матчей для {competition_name}")
+    if total_failed:
+        log(f"⚠️ Не удалось загрузить {total_failed} матчей для {competition_name}")
     return total_loaded
 
 
@@ -228,6 +238,8 @@ def main():
         print("❌ Установите переменную окружения FOOTBALL_DATA_ORG_KEY")
         return
     
+    init_database()
+    
     # Показываем текущую статистику БД
     stats = get_historical_stats()
     print(f"\n📈 Текущая база данных:")
@@ -248,7 +260,9 @@ def main():
     
     for comp_id, comp_name in COMPETITIONS.items():
         try:
-            loaded = load_matches_for_competition(comp_id, comp_name, seasons)
+            # Загрузка истории - фоновая работа, не мешаем пользователям бота
+            with request_priority(PRIORITY_BACKGROUND):
+                loaded = load_matches_for_competition(comp_id, comp_name, seasons)
             total_matches += loaded
         except Exception as e:
             print(f"❌ Ошибка загрузки {comp_name}: {e}")
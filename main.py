@@ -1,13 +1,17 @@
 import telebot
 from telebot import types
 from modules.data_fetcher import get_upcoming_matches, get_match_data, LEAGUES, format_round_label, search_teams, get_team_matches
-from modules.predictor import generate_predictions_ultra
-from modules.message_formatter import format_match_analysis
-from modules.football_data_fetcher import enrich_match_data, fetch_upcoming_rounds_football_data, get_matches_from_football_data, get_match_data_from_football_data, LEAGUE_ID_TO_CODE
+from modules.football_data_fetcher import fetch_upcoming_rounds_football_data, get_matches_from_football_data, get_match_data_from_football_data, get_standings_snapshot, LEAGUE_ID_TO_CODE
 from modules.sport_api_fetcher import enrich_with_sport_api
-from modules.database import track_user, track_action, add_subscription, remove_subscription, get_user_subscriptions, get_connection
-from modules.analytics import update_excel_file
+from modules.database import init_database, add_subscription, remove_subscription, get_user_subscriptions, get_connection
+from modules.analytics_queue import track_user, track_action
 from modules.match_selector import get_top_matches, format_top_matches_message
+from modules.memory_cache import MemoryCache
+from modules.swr_cache import SWRCache
+from modules.tournaments import TOURNAMENTS
+from modules.prewarmer import start_prewarmer
+from modules import cache_registry, prediction_cache, warm_cache
+import io
 import os
 from psycopg2.extras import RealDictCursor
 
@@ -17,10 +21,13 @@ if not TOKEN:
     raise ValueError("TELEGRAM_TOKEN environment variable is required")
 bot = telebot.TeleBot(TOKEN)
 CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
+# Telegram ID администраторов через запятую (служебные команды)
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if x.isdigit()}
 
 # ==================== РЕКЛАМА: НАЧАЛО ====================
 # Счетчик прогнозов для каждого пользователя (для показа рекламы)
-_user_prediction_count = {}
+# Неактивные пользователи вытесняются через неделю
+_user_prediction_count = MemoryCache("ad_counters", max_entries=50000, ttl=7 * 24 * 3600)
 
 # Настройки рекламы
 AD_FREQUENCY = 5  # Показывать рекламу после каждого N-го прогноза
@@ -63,35 +70,14 @@ def check_and_send_ad(user_id, chat_id):
     ❗ ВАЖНО: Эта функция вызывается после каждого прогноза
     Чтобы ОТКЛЮЧИТЬ рекламу полностью - удали все вызовы check_and_send_ad()
     """
-    global _user_prediction_count
-    
     # Увеличиваем счетчик для пользователя
-    if user_id not in _user_prediction_count:
-        _user_prediction_count[user_id] = 0
-    
-    _user_prediction_count[user_id] += 1
+    count = _user_prediction_count.incr(user_id)
     
     # Если достигли нужного количества - показываем рекламу
-    if _user_prediction_count[user_id] % AD_FREQUENCY == 0:
+    if count % AD_FREQUENCY == 0:
         send_advertisement(chat_id)
 # ==================== РЕКЛАМА: КОНЕЦ ====================
 
-# Словарь турниров - все на одном уровне
-TOURNAMENTS = {
-    "premier_league": {"label": "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Премьер-лига", "league": "Premier League", "league_id": 39},
-    "la_liga": {"label": "🇪🇸 Ла Лига", "league": "La Liga", "league_id": 140},
-    "serie_a": {"label": "🇮🇹 Серия А", "league": "Serie A", "league_id": 135},
-    "bundesliga": {"label": "🇩🇪 Бундеслига", "league": "Bundesliga", "league_id": 78},
-    "ligue_1": {"label": "🇫🇷 Лига 1", "league": "Ligue 1", "league_id": 61},
-    "primeira_liga": {"label": "🇵🇹 Примейра Лига", "league": "Primeira Liga", "league_id": 235},
-    "eredivisie": {"label": "🇳🇱 Эредивизи", "league": "Eredivisie", "league_id": 88},
-    "championship": {"label": "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Чемпионшип", "league": "Championship", "league_id": 40},
-    "serie_a_brazil": {"label": "🇧🇷 Бразильская Серия А", "league": "Campeonato Brasileiro Série A", "league_id": 71},
-    "champions_league": {"label": "⭐ Лига Чемпионов", "league": "Champions League", "league_id": 2},
-    "world_cup": {"label": "🌍 Чемпионат мира", "league": "World Cup", "league_id": 1},
-    "euro": {"label": "🇪🇺 Чемпионат Европы", "league": "European Championship", "league_id": 4}
-}
-
 
 def analyze_bet_result(bet_tip, match_data):
     """
@@ -221,6 +207,13 @@ def create_main_keyboard():
     return keyboard
 
 
+# Данные меню /analyze: отдаются сразу, устаревшие обновляются в фоне
+MENU_SOFT_TTL = int(os.getenv("MENU_SOFT_TTL", "300"))
+MENU_HARD_TTL = int(os.getenv("MENU_HARD_TTL", "3600"))
+_rounds_menu_cache = SWRCache("menu_rounds", soft_ttl=MENU_SOFT_TTL, hard_ttl=MENU_HARD_TTL)
+_matches_menu_cache = SWRCache("menu_matches", soft_ttl=MENU_SOFT_TTL, hard_ttl=MENU_HARD_TTL)
+
+
 def create_round_menu(league_id):
     """Создает меню выбора раунда/тура"""
     keyboard = types.InlineKeyboardMarkup(row_width=1)
@@ -238,8 +231,11 @@ def create_round_menu(league_id):
         print("[DEBUG create_round_menu] api_league_id is None, returning None")
         return None
     
-    # Получаем доступные раунды из Football-Data.org
-    rounds = fetch_upcoming_rounds_football_data(api_league_id, max_rounds=5)
+    # Получаем доступные раунды из Football-Data.org (stale-while-revalidate)
+    rounds = _rounds_menu_cache.get(
+        api_league_id,
+        lambda: fetch_upcoming_rounds_football_data(api_league_id, max_rounds=5)
+    )
     print(f"[DEBUG create_round_menu] Found {len(rounds) if rounds else 0} rounds")
     
     if not rounds:
@@ -278,8 +274,11 @@ def create_match_menu(league_id, round_code, api_league_id):
     
     print(f"[DEBUG create_match_menu] Getting matches for round {round_code}")
     
-    # Получаем матчи раунда
-    matches = get_matches_from_football_data(api_league_id, round_code)
+    # Получаем матчи раунда (stale-while-revalidate)
+    matches = _matches_menu_cache.get(
+        (api_league_id, round_code),
+        lambda: get_matches_from_football_data(api_league_id, round_code)
+    )
     
     if not matches:
         print("[DEBUG create_match_menu] No matches found")
@@ -510,6 +509,63 @@ def verify_command(message):
         )
 
 
+@bot.message_handler(commands=['cache_stats'])
+def cache_stats_command(message):
+    """Статистика кэшей (только для администраторов): /cache_stats [json]"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    try:
+        if "json" in message.text.split()[1:]:
+            # Машиночитаемая выгрузка - файлом
+            document = io.BytesIO(cache_registry.dump().encode("utf-8"))
+            document.name = "cache_stats.json"
+            bot.send_document(message.chat.id, document)
+            return
+        
+        report = cache_registry.format_report()
+        for start in range(0, len(report), 4000):
+            bot.send_message(message.chat.id, report[start:start + 4000], parse_mode='HTML')
+    except Exception as e:
+        bot.send_message(message.chat.id, f"❌ Ошибка статистики кэшей: {e}")
+
+
+@bot.message_handler(commands=['export_users'])
+def export_users_command(message):
+    """Выгрузка пользователей в Excel по запросу (только для администраторов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    from modules.analytics import export_excel_file, EXCEL_FILENAME
+    if not export_excel_file():
+        bot.send_message(message.chat.id, "❌ Не удалось выгрузить пользователей")
+        return
+    with open(EXCEL_FILENAME, "rb") as document:
+        bot.send_document(message.chat.id, document)
+
+
+@bot.message_handler(commands=['db_stats'])
+def db_stats_command(message):
+    """Метрики пула соединений с БД (только для администраторов)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    from modules.database import get_pool_stats
+    stats = get_pool_stats()
+    response = "🗄 <b>Пул соединений БД</b>\n\n"
+    response += f"Занято: {stats['in_use']} из {stats['max_size']} (пик {stats['peak_in_use']})\n"
+    response += f"Выдач: {stats['checkouts']}, повторно в потоке: {stats['reused']}\n"
+    response += f"Ожидание: среднее {stats['wait_avg_ms']} мс, макс {stats['wait_max_ms']} мс\n"
+    response += f"Таймаутов: {stats['timeouts']}, заменено разорванных: {stats['broken']}"
+
+    from modules.analytics_queue import get_stats as get_analytics_stats
+    analytics = get_analytics_stats()
+    response += "\n\n📝 <b>Очередь аналитики</b>\n"
+    response += f"В очереди: {analytics['in_queue']}, ждут повтора: {analytics['pending']}\n"
+    response += f"Сбросов: {analytics['flushes']} (ошибок {analytics['failed_flushes']}), записано действий: {analytics['written_actions']}"
+    bot.send_message(message.chat.id, response, parse_mode='HTML')
+
+
 @bot.message_handler(commands=['train'])
 def train_command(message):
     """Запускает обучение ML моделей (все 15 моделей: 5 лиг × 3 алгоритма)"""
@@ -622,8 +678,9 @@ def model_stats_command(message):
 
 
 # Throttling для inline запросов (предотвращает перегрузку API)
-_inline_throttle = {}  # {user_id: {query: timestamp}}
 _throttle_interval = 1.5  # секунды между запросами
+# {user_id: {query, time}} - запись нужна только на время интервала
+_inline_throttle = MemoryCache("inline_throttle", max_entries=10000, ttl=_throttle_interval)
 
 @bot.inline_handler(lambda query: True)
 def handle_inline_query(inline_query):
@@ -638,8 +695,8 @@ def handle_inline_query(inline_query):
     from datetime import datetime
     now = datetime.now().timestamp()
     
-    if user_id in _inline_throttle:
-        last_query_data = _inline_throttle[user_id]
+    last_query_data = _inline_throttle.get(user_id)
+    if last_query_data:
         last_query = last_query_data.get('query', '')
         last_time = last_query_data.get('time', 0)
         
@@ -651,7 +708,7 @@ def handle_inline_query(inline_query):
     
     # Обновляем throttle данные только для запросов ≥ 3 символов
     if len(query_text) >= 3:
-        _inline_throttle[user_id] = {'query': query_text, 'time': now}
+        _inline_throttle.set(user_id, {'query': query_text, 'time': now})
     
     # Минимум 5 символов для поиска (защита от rate limits)
     if len(query_text) < 5:
@@ -1308,82 +1365,25 @@ def analyze_single_match(call, match_id, api_league_id=None):
             )
             return
         
-        home_team = data.get("teams", {}).get("home", {}).get("name", "")
-        away_team = data.get("teams", {}).get("away", {}).get("name", "")
         league = data.get("league", {}).get("name", "")
         
-        # Получаем данные лиги один раз (кэширование)
-        league_data_cache = {}
+        home_team_id = data.get("teams", {}).get("home", {}).get("id")
+        away_team_id = data.get("teams", {}).get("away", {}).get("id")
+        
+        # Снимок таблиц турнира: одна загрузка /standings на все HOME/AWAY/TOTAL
+        snapshot = None
         if api_league_id:
-            competition_code = LEAGUE_ID_TO_CODE.get(api_league_id)
-            if competition_code:
-                from modules.football_data_fetcher import get_standings, get_top_scorers
-                try:
-                    league_data_cache["standings"] = get_standings(competition_code)
-                    league_data_cache["scorers"] = get_top_scorers(competition_code, limit=3)
-                    print(f"[DEBUG] Cached league data for {competition_code}")
-                except Exception as e:
-                    print(f"[WARNING] Could not cache league data: {e}")
-        
-        # Собираем дополнительные данные
-        if league_data_cache:
-            # Извлекаем статистику команд из standings
-            from modules.football_data_fetcher import get_team_stats_extended
-            
-            standings = league_data_cache.get("standings", [])
-            
-            # Получаем раздельную статистику HOME/AWAY для точных прогнозов
-            home_stats = get_team_stats_extended(home_team, competition_code, venue="HOME")
-            away_stats = get_team_stats_extended(away_team, competition_code, venue="AWAY")
-            
-            # Fallback на TOTAL если HOME/AWAY пустые
-            if not home_stats or home_stats.get("played", 0) == 0:
-                home_stats = get_team_stats_extended(home_team, competition_code, venue="TOTAL")
-            
-            if not away_stats or away_stats.get("played", 0) == 0:
-                away_stats = get_team_stats_extended(away_team, competition_code, venue="TOTAL")
-            
-            enriched_data = {
-                "standings": standings,
-                "top_scorers": league_data_cache.get("scorers", []),
-                "home_stats": home_stats,
-                "away_stats": away_stats,
-                "h2h": [],
-                "form": {}
-            }
-        else:
-            enriched_data = enrich_match_data(home_team, away_team, league)
-        
-        sport_api_data = {}  # Отключаем SportAPI пока нет ключа
-        
-        # Дополнительные факторы (учитываются в расчётах, не показываются пользователю)
-        # Примечание: можно добавить когда станут доступны venue/season из API
-        weather_data = None
-        injuries_data = None
-        halftime_data = None
-        playstyle_data = None
-        odds_data = None
-        
-        # Генерируем детальный прогноз (БЕЗ value_bet_data на первом этапе)
-        analysis = generate_predictions_ultra(
-            data, enriched_data, sport_api_data,
-            weather_data, injuries_data, halftime_data,
-            playstyle_data, None  # value_bet_data рассчитаем после прогноза
+            snapshot = get_standings_snapshot(LEAGUE_ID_TO_CODE.get(api_league_id))
+        
+        # Готовый прогноз (прогрев или предыдущий запрос) или полный расчет
+        text = prediction_cache.get_or_build(
+            match_id, data, snapshot,
+            home_id=home_team_id,
+            away_id=away_team_id,
+            league=league
         )
         
-        # Value bet анализ отключен (можно включить когда появятся данные о коэффициентах)
-        
-        # Сохраняем прогноз в базу данных
-        try:
-            from modules.database import save_prediction
-            # Передаём уже существующий объект data (совместимый с API-Football форматом)
-            save_prediction(data, analysis, analysis.get('factors', {}))
-            print(f"✅ Прогноз сохранен в БД: {home_team} vs {away_team}")
-        except Exception as e:
-            print(f"⚠️ Не удалось сохранить прогноз в БД: {e}")
-        
-        # Форматируем и отправляем
-        text = format_match_analysis(data, analysis)
+        # Отправляем
         bot.send_message(call.message.chat.id, text, parse_mode='HTML')
         
         # Отправляем в канал если задан
@@ -1464,19 +1464,10 @@ def analyze_tournament(call, tournament_id, leagues_filter, tournament_name=None
         f"📊 Анализирую первые {min(len(all_matches), 5)} матчей с полной детализацией..."
     )
     
-    # Получаем данные лиги один раз (кэширование для оптимизации API запросов)
-    league_data_cache = {}
+    # Снимок таблиц турнира загружается один раз на весь тур
+    snapshot = None
     if api_league_id:
-        competition_code = LEAGUE_ID_TO_CODE.get(api_league_id)
-        if competition_code:
-            from modules.football_data_fetcher import get_standings, get_top_scorers
-            try:
-                league_data_cache["standings"] = get_standings(competition_code)
-                league_data_cache["scorers"] = get_top_scorers(competition_code, limit=3)
-                league_data_cache["competition_code"] = competition_code
-                print(f"[DEBUG] Cached league data for {competition_code}")
-            except Exception as e:
-                print(f"[WARNING] Could not cache league data: {e}")
+        snapshot = get_standings_snapshot(LEAGUE_ID_TO_CODE.get(api_league_id))
     
     # Анализируем матчи (ограничиваем до 5 для производительности)
     analyzed_count = 0
@@ -1491,51 +1482,24 @@ def analyze_tournament(call, tournament_id, leagues_filter, tournament_name=None
             if not data:
                 continue
             
-            home_team = data.get("teams", {}).get("home", {}).get("name", "")
-            away_team = data.get("teams", {}).get("away", {}).get("name", "")
             home_team_id = data.get("teams", {}).get("home", {}).get("id")
             away_team_id = data.get("teams", {}).get("away", {}).get("id")
             league = match.get("league", "")
             match_id = match.get("id")
             
-            # Собираем дополнительные данные (используем кэш если доступен)
-            if league_data_cache:
-                # Извлекаем статистику команд из standings
-                from modules.football_data_fetcher import get_team_stats_extended
-                
-                competition_code = league_data_cache.get("competition_code")
-                
-                # Получаем раздельную статистику HOME/AWAY для точных прогнозов
-                home_stats = get_team_stats_extended(home_team, competition_code, venue="HOME")
-                away_stats = get_team_stats_extended(away_team, competition_code, venue="AWAY")
-                
-                # Fallback на TOTAL если HOME/AWAY пустые
-                if not home_stats or home_stats.get("played", 0) == 0:
-                    home_stats = get_team_stats_extended(home_team, competition_code, venue="TOTAL")
-                
-                if not away_stats or away_stats.get("played", 0) == 0:
-                    away_stats = get_team_stats_extended(away_team, competition_code, venue="TOTAL")
-                
-                # Используем закэшированные данные
-                enriched_data = {
-                    "standings": league_data_cache.get("standings", []),
-                    "scorers": league_data_cache.get("scorers", []),
-                    "home_stats": home_stats,
-                    "away_stats": away_stats,
-                    "h2h": [],  # H2H требует отдельного запроса, пропускаем для оптимизации
-                    "form": {}  # Form также требует запросов, пропускаем
-                }
-            else:
-                # Используем старый метод (может превысить лимиты)
-                enriched_data = enrich_match_data(home_team, away_team, league)
-            
-            sport_api_data = {}  # Отключаем SportAPI пока нет ключа
+            # ID команд совпадают со снимком только для матчей из Football-Data.org
+            snapshot_home_id = home_team_id if round_filter else None
+            snapshot_away_id = away_team_id if round_filter else None
             
-            # Генерируем детальный прогноз
-            analysis = generate_predictions_ultra(data, enriched_data, sport_api_data)
+            # Готовый прогноз (прогрев или предыдущий запрос) или полный расчет
+            text = prediction_cache.get_or_build(
+                match_id, data, snapshot,
+                home_id=snapshot_home_id,
+                away_id=snapshot_away_id,
+                league=league
+            )
             
-            # Форматируем и отправляем
-            text = format_match_analysis(data, analysis)
+            # Отправляем
             bot.send_message(call.message.chat.id, text, parse_mode='HTML')
             
             # Отправляем в канал если задан
@@ -1870,4 +1834,17 @@ def subscription_callback(call):
         bot.answer_callback_query(call.id, "❌ Произошла ошибка")
 
 
+# Схема БД: недостающие миграции (если база актуальна - только проверка версии)
+try:
+    init_database()
+except Exception as e:
+    print(f"⚠️ Ошибка инициализации БД: {e}")
+
+# Теплый перезапуск: кэши прошлого процесса загружаются до начала polling
+warm_cache.restore()
+warm_cache.start_saver()
+
+# Фоновый прогрев прогнозов на ближайшие 48 часов
+start_prewarmer()
+
 bot.polling(none_stop=True)
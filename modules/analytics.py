@@ -1,122 +1,182 @@
 """
 Модуль для автоматического обновления Excel файла со статистикой пользователей
+
+Файл перестраивается в фоне не чаще раза в EXCEL_EXPORT_INTERVAL секунд:
+update_excel_file() только помечает данные измененными, поэтому стоимость
+выгрузки не зависит от количества действий пользователей. Выгрузка по
+запросу - export_excel_file(). Книга пишется потоково (write-only режим
+openpyxl) во временный файл и атомарно заменяет старый.
 """
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime
 from modules.database import get_all_users_for_export
 import os
+import threading
+import time
 
 
 EXCEL_FILENAME = "users_stats.xlsx"
+EXCEL_EXPORT_INTERVAL = int(os.getenv("EXCEL_EXPORT_INTERVAL", "600"))
+
+HEADERS = [
+    "№",
+    "User ID",
+    "Username",
+    "Имя",
+    "Фамилия",
+    "Первое использование",
+    "Последнее использование",
+    "Всего использований"
+]
+COLUMN_WIDTHS = {'A': 5, 'B': 12, 'C': 18, 'D': 18, 'E': 18, 'F': 18, 'G': 18, 'H': 15}
+
+_export_lock = threading.Lock()
+_worker_lock = threading.Lock()
+_dirty = threading.Event()
+_worker = None
+_last_export = 0.0
+
+
+def _styled(ws, value, font=None, fill=None, alignment=None, border=None):
+    cell = WriteOnlyCell(ws, value=value)
+    if font:
+        cell.font = font
+    if fill:
+        cell.fill = fill
+    if alignment:
+        cell.alignment = alignment
+    if border:
+        cell.border = border
+    return cell
+
+
+def _build_workbook(users):
+    """Книга со списком пользователей (write-only: строки пишутся потоком)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Пользователи бота")
+    
+    # В write-only режиме ширины, высоты и объединения задаются до записи строк
+    for column, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[column].width = width
+    ws.row_dimensions[1].height = 30
+    ws.merged_cells.add('A1:H1')
+    ws.merged_cells.add('A2:H2')
+    
+    border_style = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    center = Alignment(horizontal="center")
+    
+    # Заголовок
+    ws.append([_styled(
+        ws, "⚽ ПОЛЬЗОВАТЕЛИ FOOTBALL PREDICTOR BOT",
+        font=Font(size=16, bold=True, color="FFFFFF"),
+        fill=PatternFill(start_color="1F77B4", end_color="1F77B4", fill_type="solid"),
+        alignment=Alignment(horizontal="center", vertical="center")
+    )])
+    
+    # Дата обновления
+    ws.append([_styled(
+        ws, f"Обновлено: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+        font=Font(italic=True, size=10), alignment=center
+    )])
+    ws.append([])
+    
+    # Заголовки столбцов
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4CAF50", end_color="4CAF50", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    ws.append([
+        _styled(ws, header, font=header_font, fill=header_fill, alignment=header_alignment, border=border_style)
+        for header in HEADERS
+    ])
+    
+    # Данные пользователей
+    for idx, user in enumerate(users, start=1):
+        first_seen = user.get('first_seen')
+        last_seen = user.get('last_seen')
+        values = [
+            idx,
+            user.get('user_id'),
+            user.get('username') or '-',
+            user.get('first_name') or '-',
+            user.get('last_name') or '-',
+            first_seen.strftime("%d.%m.%Y %H:%M") if first_seen else None,
+            last_seen.strftime("%d.%m.%Y %H:%M") if last_seen else None,
+            user.get('total_actions')
+        ]
+        ws.append([_styled(ws, value, alignment=center, border=border_style) for value in values])
+    
+    # Итоговая строка
+    total_row = len(users) + 6
+    ws.merged_cells.add(f'A{total_row}:G{total_row}')
+    total_font = Font(bold=True, size=12)
+    ws.append([])
+    ws.append(
+        [_styled(ws, "ИТОГО:", font=total_font, alignment=center)]
+        + [None] * 6
+        + [_styled(ws, len(users), font=total_font)]
+    )
+    return wb
+
+
+def export_excel_file(path=EXCEL_FILENAME):
+    """
+    Выгружает Excel файл со списком всех пользователей бота немедленно
+    
+    Файл пишется во временный и заменяет старый через os.replace - читатели
+    никогда не видят недописанную книгу; параллельные выгрузки не пересекаются.
+    
+    Args:
+        path: Путь к файлу
+    
+    Returns:
+        bool: True если файл записан
+    """
+    global _last_export
+    with _export_lock:
+        _dirty.clear()
+        tmp_path = f"{path}.tmp"
+        try:
+            users = get_all_users_for_export()
+            _build_workbook(users).save(tmp_path)
+            os.replace(tmp_path, path)
+            _last_export = time.monotonic()
+            print(f"✅ Excel файл обновлен: {path} ({len(users)} пользователей)")
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка при обновлении Excel файла: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+
+def _loop():
+    while True:
+        _dirty.wait()
+        # Не чаще раза в EXCEL_EXPORT_INTERVAL: изменения за это время попадут в одну выгрузку
+        delay = _last_export + EXCEL_EXPORT_INTERVAL - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        export_excel_file()
 
 
 def update_excel_file():
     """
-    Автоматически обновляет Excel файл со списком всех пользователей бота
-    Создает файл, если его нет, или обновляет существующий
+    Отмечает, что статистика пользователей изменилась
+    
+    Файл будет перестроен фоновым потоком не позже чем через
+    EXCEL_EXPORT_INTERVAL секунд после предыдущей выгрузки.
     """
-    try:
-        # Получаем всех пользователей из базы данных
-        users = get_all_users_for_export()
-        
-        # Создаем новую рабочую книгу
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Пользователи бота"
-        
-        # Заголовок
-        ws['A1'] = "⚽ ПОЛЬЗОВАТЕЛИ FOOTBALL PREDICTOR BOT"
-        ws['A1'].font = Font(size=16, bold=True, color="FFFFFF")
-        ws['A1'].fill = PatternFill(start_color="1F77B4", end_color="1F77B4", fill_type="solid")
-        ws['A1'].alignment = Alignment(horizontal="center", vertical="center")
-        ws.merge_cells('A1:H1')
-        ws.row_dimensions[1].height = 30
-        
-        # Дата обновления
-        ws['A2'] = f"Обновлено: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"
-        ws['A2'].font = Font(italic=True, size=10)
-        ws['A2'].alignment = Alignment(horizontal="center")
-        ws.merge_cells('A2:H2')
-        
-        # Заголовки столбцов
-        headers = [
-            "№",
-            "User ID",
-            "Username",
-            "Имя",
-            "Фамилия",
-            "Первое использование",
-            "Последнее использование",
-            "Всего использований"
-        ]
-        
-        border_style = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Пишем заголовки
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=4, column=col)
-            cell.value = header
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="4CAF50", end_color="4CAF50", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = border_style
-        
-        # Заполняем данные пользователей
-        row = 5
-        for idx, user in enumerate(users, start=1):
-            ws.cell(row=row, column=1, value=idx)
-            ws.cell(row=row, column=2, value=user.get('user_id'))
-            ws.cell(row=row, column=3, value=user.get('username') or '-')
-            ws.cell(row=row, column=4, value=user.get('first_name') or '-')
-            ws.cell(row=row, column=5, value=user.get('last_name') or '-')
-            
-            # Форматируем даты
-            first_seen = user.get('first_seen')
-            last_seen = user.get('last_seen')
-            if first_seen:
-                ws.cell(row=row, column=6, value=first_seen.strftime("%d.%m.%Y %H:%M"))
-            if last_seen:
-                ws.cell(row=row, column=7, value=last_seen.strftime("%d.%m.%Y %H:%M"))
-            
-            ws.cell(row=row, column=8, value=user.get('total_actions'))
-            
-            # Применяем границы и выравнивание
-            for col in range(1, 9):
-                ws.cell(row=row, column=col).border = border_style
-                ws.cell(row=row, column=col).alignment = Alignment(horizontal="center")
-            
-            row += 1
-        
-        # Устанавливаем ширину столбцов
-        ws.column_dimensions['A'].width = 5
-        ws.column_dimensions['B'].width = 12
-        ws.column_dimensions['C'].width = 18
-        ws.column_dimensions['D'].width = 18
-        ws.column_dimensions['E'].width = 18
-        ws.column_dimensions['F'].width = 18
-        ws.column_dimensions['G'].width = 18
-        ws.column_dimensions['H'].width = 15
-        
-        # Добавляем итоговую строку
-        total_row = row + 1
-        ws.cell(row=total_row, column=1, value="ИТОГО:")
-        ws.cell(row=total_row, column=1).font = Font(bold=True, size=12)
-        ws.cell(row=total_row, column=8, value=len(users))
-        ws.cell(row=total_row, column=8).font = Font(bold=True, size=12)
-        ws.merge_cells(f'A{total_row}:G{total_row}')
-        ws.cell(row=total_row, column=1).alignment = Alignment(horizontal="center")
-        
-        # Сохраняем файл
-        wb.save(EXCEL_FILENAME)
-        print(f"✅ Excel файл обновлен: {EXCEL_FILENAME} ({len(users)} пользователей)")
-        
-    except Exception as e:
-        print(f"❌ Ошибка при обновлении Excel файла: {e}")
-        import traceback
-        traceback.print_exc()
+    global _worker
+    _dirty.set()
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = threading.Thread(target=_loop, name="excel-export", daemon=True)
+                _worker.start()
@@ -0,0 +1,146 @@
+"""
+Буферизованная запись аналитики пользователей (write-behind)
+
+track_user / track_action только кладут событие в очередь и сразу
+возвращаются - обработчик бота отвечает пользователю, не дожидаясь БД.
+Фоновый поток раз в ANALYTICS_FLUSH_INTERVAL секунд (или при накоплении
+ANALYTICS_BATCH_SIZE событий) записывает все одной транзакцией:
+upsert пользователей, многострочный INSERT действий и один UPDATE
+счетчиков на пользователя. При остановке процесса очередь сбрасывается.
+"""
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime
+
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "5"))
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "500"))
+# Сколько действий держать в памяти, если БД недоступна (старые отбрасываются)
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", "50000"))
+
+_queue = queue.Queue()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker = None
+
+# Не записанное из-за ошибки БД - повторяется при следующем сбросе
+_pending_users = {}
+_pending_actions = []
+
+stats = {"queued": 0, "flushes": 0, "written_actions": 0, "failed_flushes": 0, "dropped": 0}
+
+
+def track_user(user_id, username=None, first_name=None, last_name=None):
+    """
+    Отслеживание пользователя - создание или обновление записи (асинхронно)
+
+    Args:
+        user_id: Telegram user ID
+        username: Username пользователя
+        first_name: Имя пользователя
+        last_name: Фамилия пользователя
+    """
+    _queue.put(("user", user_id, (username, first_name, last_name, datetime.now())))
+    _enqueued()
+
+
+def track_action(user_id, action_type, action_details=None):
+    """
+    Отслеживание действия пользователя (асинхронно)
+
+    Args:
+        user_id: Telegram user ID
+        action_type: Тип действия (analyze, stats, train, etc.)
+        action_details: Дополнительные детали (JSON строка или текст)
+    """
+    _queue.put(("action", user_id, (user_id, action_type, action_details, datetime.now())))
+    _enqueued()
+
+
+def _enqueued():
+    stats["queued"] += 1
+    _ensure_worker()
+    if _queue.qsize() >= ANALYTICS_BATCH_SIZE:
+        _wakeup.set()
+
+
+def flush():
+    """
+    Записывает все накопленные события в БД
+
+    Returns:
+        int: Количество записанных действий
+    """
+    from modules.database import write_analytics_batch
+
+    with _flush_lock:
+        while True:
+            try:
+                kind, user_id, payload = _queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "user":
+                _pending_users[user_id] = payload
+            else:
+                _pending_actions.append(payload)
+
+        if not _pending_users and not _pending_actions:
+            return 0
+
+        try:
+            written_ok = write_analytics_batch(_pending_users, _pending_actions)
+        except Exception as e:
+            print(f"❌ Ошибка записи аналитики: {e}")
+            written_ok = False
+
+        if not written_ok:
+            stats["failed_flushes"] += 1
+            overflow = len(_pending_actions) - ANALYTICS_MAX_PENDING
+            if overflow > 0:
+                del _pending_actions[:overflow]
+                stats["dropped"] += overflow
+            return 0
+
+        written = len(_pending_actions)
+        _pending_users.clear()
+        _pending_actions.clear()
+        stats["flushes"] += 1
+        stats["written_actions"] += written
+
+    # Excel обновляется один раз на сброс, а не на каждое действие
+    if written:
+        try:
+            from modules.analytics import update_excel_file
+            update_excel_file()
+        except Exception as excel_error:
+            print(f"⚠️ Не удалось обновить Excel файл: {excel_error}")
+    return written
+
+
+def _loop():
+    while True:
+        _wakeup.wait(ANALYTICS_FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            print(f"❌ Ошибка сброса аналитики: {e}")
+
+
+def _ensure_worker():
+    """Запускает фоновый поток записи (один на процесс)"""
+    global _worker
+    if _worker is not None:
+        return
+    with _flush_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_loop, name="analytics-writer", daemon=True)
+            _worker.start()
+            # При остановке дописываем очередь, чтобы не потерять счетчики
+            atexit.register(flush)
+
+
+def get_stats():
+    """Счетчики очереди аналитики"""
+    return dict(stats, in_queue=_queue.qsize(), pending=len(_pending_actions))
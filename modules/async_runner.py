@@ -0,0 +1,60 @@
+"""
+Асинхронный интерфейс к fetcher-модулям
+
+Сетевые вызовы выполняются в ограниченном пуле потоков поверх общего
+http_client: пулы соединений, лимиты запросов и кэш ответов остаются
+общими для синхронного и асинхронного кода.
+
+Пример:
+    standings, scorers = await asyncio.gather(
+        get_standings_async("PL"),
+        get_top_scorers_async("PL", limit=3),
+    )
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.rate_limiter import current_priority, request_priority
+
+# Сколько блокирующих запросов одновременно выполняет асинхронный слой
+ASYNC_WORKERS = int(os.getenv("ASYNC_FETCH_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="async-fetch")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Выполняет синхронную функцию в пуле, не блокируя event loop
+
+    Приоритет запросов вызывающего потока переносится в поток пула.
+    """
+    priority = current_priority()
+
+    def call():
+        with request_priority(priority):
+            return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, call)
+
+
+def to_async(func):
+    """Создает async-версию синхронной функции fetcher-модуля"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(func, *args, **kwargs)
+
+    wrapper.__name__ = f"{func.__name__}_async"
+    wrapper.__qualname__ = f"{func.__qualname__}_async"
+    return wrapper
+
+
+def run(coro):
+    """
+    Выполняет корутину из синхронного кода (обработчики бота, scheduler)
+
+    Внутри работающего event loop используйте await напрямую.
+    """
+    return asyncio.run(coro)
@@ -0,0 +1,275 @@
+"""
+Подключаемое хранилище кэшей (общее для нескольких реплик бота)
+
+CACHE_BACKEND выбирает реализацию:
+- "local" (по умолчанию) - память процесса (MemoryCache на каждое пространство имен)
+- "postgres" - таблица shared_cache в той же базе (DATABASE_URL), общая для всех реплик
+
+Код работает с пространствами имен и не знает, где лежат данные:
+    _cache = cache_backend.namespace("inline", ttl=300, max_entries=2000)
+    _cache.set(key, value)
+    _cache.get(key)
+"""
+import os
+import pickle
+import threading
+
+from modules import cache_registry, warm_cache
+from modules.memory_cache import MemoryCache
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local").lower()
+
+# Как часто (в записях) удалять устаревшие строки shared_cache
+CLEANUP_EVERY = 200
+
+_MISSING = object()
+
+
+class LocalBackend:
+    """Кэши в памяти процесса (по одному MemoryCache на пространство имен)"""
+
+    name = "local"
+
+    def __init__(self):
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def configure(self, namespace, ttl=None, max_entries=1000, max_bytes=None):
+        """Создает хранилище пространства имен с ограничениями"""
+        with self._lock:
+            if namespace not in self._namespaces:
+                self._namespaces[namespace] = MemoryCache(
+                    namespace, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl
+                )
+            return self._namespaces[namespace]
+
+    def get(self, namespace, key):
+        cache = self._namespaces.get(namespace)
+        return cache.get(key, _MISSING) if cache is not None else _MISSING
+
+    def set(self, namespace, key, value, ttl):
+        self.configure(namespace).set(key, value, ttl)
+
+    def delete(self, namespace, key):
+        cache = self._namespaces.get(namespace)
+        if cache is not None:
+            cache.delete(key)
+
+    def clear(self, namespace=None):
+        for name, cache in list(self._namespaces.items()):
+            if namespace is None or name == namespace:
+                cache.clear()
+
+    def get_stats(self):
+        return {name: cache.get_stats() for name, cache in self._namespaces.items()}
+
+    def dump(self, namespace):
+        cache = self._namespaces.get(namespace)
+        return cache.dump() if cache is not None else []
+
+    def restore(self, namespace, items, elapsed=0):
+        return self.configure(namespace).restore(items, elapsed)
+
+    def namespace_stats(self, namespace):
+        cache = self._namespaces.get(namespace)
+        return cache.get_stats() if cache is not None else {}
+
+
+class PostgresBackend:
+    """
+    Кэши в таблице shared_cache (значения сериализуются pickle)
+
+    Ошибки базы не ломают вызывающий код: чтение превращается в промах,
+    запись пропускается.
+    """
+
+    name = "postgres"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _connect(self):
+        # Импорт здесь: локальному бэкенду база не нужна.
+        # Таблица shared_cache создается миграцией (modules.migrations)
+        from modules.database import get_connection
+        return get_connection()
+
+    def _execute(self, query, params, fetch=False):
+        conn = None
+        try:
+            conn = self._connect()
+            cur = conn.cursor()
+            cur.execute(query, params)
+            row = cur.fetchone() if fetch else None
+            conn.commit()
+            cur.close()
+            return row
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[Cache Backend] Ошибка Postgres: {e}")
+            if conn is not None:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def configure(self, namespace, ttl=None, max_entries=1000, max_bytes=None):
+        """Размер таблицы ограничивается TTL записей, лимиты памяти не нужны"""
+
+    def get(self, namespace, key):
+        try:
+            row = self._execute("""
+                SELECT value FROM shared_cache
+                WHERE namespace = %s AND key = %s
+                AND (expires_at IS NULL OR expires_at > NOW())
+            """, (namespace, str(key)), fetch=True)
+        except Exception:
+            return _MISSING
+        if row is None:
+            self.stats["misses"] += 1
+            return _MISSING
+        self.stats["hits"] += 1
+        return pickle.loads(bytes(row[0]))
+
+    def set(self, namespace, key, value, ttl):
+        from psycopg2 import Binary
+        try:
+            self._execute("""
+                INSERT INTO shared_cache (namespace, key, value, expires_at, updated_at)
+                VALUES (%s, %s, %s,
+                        CASE WHEN %s IS NULL THEN NULL ELSE NOW() + %s * INTERVAL '1 second' END,
+                        CURRENT_TIMESTAMP)
+                ON CONFLICT (namespace, key) DO UPDATE SET
+                    value = EXCLUDED.value,
+                    expires_at = EXCLUDED.expires_at,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (namespace, str(key), Binary(pickle.dumps(value)), ttl, ttl))
+        except Exception:
+            return
+        self.stats["stores"] += 1
+
+        with self._lock:
+            self._writes += 1
+            cleanup = self._writes % CLEANUP_EVERY == 0
+        if cleanup:
+            try:
+                self._execute("DELETE FROM shared_cache WHERE expires_at < NOW()", ())
+            except Exception:
+                pass
+
+    def delete(self, namespace, key):
+        try:
+            self._execute("DELETE FROM shared_cache WHERE namespace = %s AND key = %s", (namespace, str(key)))
+        except Exception:
+            pass
+
+    def clear(self, namespace=None):
+        try:
+            if namespace is None:
+                self._execute("DELETE FROM shared_cache", ())
+            else:
+                self._execute("DELETE FROM shared_cache WHERE namespace = %s", (namespace,))
+        except Exception:
+            pass
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def namespace_stats(self, namespace):
+        # Счетчики общие для всех пространств имен
+        return dict(self.stats)
+
+    def dump(self, namespace):
+        # Таблица сама переживает перезапуск - сохранять нечего
+        return []
+
+    def restore(self, namespace, items, elapsed=0):
+        return 0
+
+
+class CacheNamespace:
+    """
+    Пространство имен в выбранном хранилище
+
+    Args:
+        backend: LocalBackend или PostgresBackend
+        name: Имя пространства (например, "inline", "standings")
+        ttl: Время жизни по умолчанию в секундах (None - бессрочно)
+    """
+
+    def __init__(self, backend, name, ttl=None):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        """Значение по ключу или default"""
+        value = self.backend.get(self.name, key)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=_MISSING):
+        """Сохраняет значение; ttl по умолчанию - ttl пространства"""
+        self.backend.set(self.name, key, value, self.ttl if ttl is _MISSING else ttl)
+
+    def delete(self, key):
+        self.backend.delete(self.name, key)
+
+    def clear(self):
+        self.backend.clear(self.name)
+
+    def get_stats(self):
+        return self.backend.namespace_stats(self.name)
+
+    def dump(self):
+        """Записи для теплого перезапуска (см. warm_cache)"""
+        return self.backend.dump(self.name)
+
+    def restore(self, items, elapsed=0):
+        return self.backend.restore(self.name, items, elapsed)
+
+
+_BACKENDS = {
+    "local": LocalBackend,
+    "postgres": PostgresBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Хранилище, выбранное через CACHE_BACKEND (одно на процесс)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = _BACKENDS.get(CACHE_BACKEND)
+                if backend_class is None:
+                    print(f"[Cache Backend] Неизвестный CACHE_BACKEND={CACHE_BACKEND}, используем local")
+                    backend_class = LocalBackend
+                _backend = backend_class()
+    return _backend
+
+
+def namespace(name, ttl=None, max_entries=1000, max_bytes=None):
+    """
+    Пространство имен в общем хранилище
+
+    Args:
+        name: Имя пространства
+        ttl: Время жизни записей по умолчанию (секунды, None - бессрочно)
+        max_entries: Лимит записей (для локального хранилища)
+        max_bytes: Лимит объема (для локального хранилища)
+
+    Returns:
+        CacheNamespace
+    """
+    backend = get_backend()
+    backend.configure(name, ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+    cache = CacheNamespace(backend, name, ttl)
+    cache_registry.register(name, cache.get_stats)
+    warm_cache.register_cache(f"namespace:{name}", cache)
+    return cache
@@ -0,0 +1,126 @@
+"""
+Единая статистика всех кэшей бота
+
+Все MemoryCache (включая локальные пространства cache_backend и SWR кэши)
+попадают в отчет автоматически. Остальные кэши (SQLite кэш ответов, модели,
+снимки таблиц и линии, lru_cache) регистрируются через register().
+Загрузки при промахах засекаются через record_load() / timed().
+
+Отчет приводится к общему виду: hit rate, размер, вытеснения, оценка
+объема в памяти и время загрузки при промахе.
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from modules import memory_cache
+
+_sources = {}
+_loads = {}
+_lock = threading.Lock()
+
+
+def register(name, stats_fn):
+    """
+    Регистрирует кэш в отчете
+
+    Args:
+        name: Имя кэша
+        stats_fn: Функция без аргументов, возвращающая dict со счетчиками
+            (hits, misses, entries, evictions, bytes - какие есть)
+    """
+    _sources[name] = stats_fn
+
+
+def register_lru(name, cached_fn):
+    """Регистрирует функцию с functools.lru_cache"""
+    def stats():
+        info = cached_fn.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+    register(name, stats)
+
+
+def record_load(name, seconds):
+    """Учитывает время загрузки данных при промахе кэша"""
+    with _lock:
+        load = _loads.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        load["count"] += 1
+        load["total"] += seconds
+        load["max"] = max(load["max"], seconds)
+
+
+@contextmanager
+def timed(name):
+    """Засекает загрузку: with cache_registry.timed("predictions"): ..."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record_load(name, time.monotonic() - started)
+
+
+def _normalize(stats, load):
+    hits = stats.get("hits", 0) or 0
+    misses = stats.get("misses", 0) or 0
+    lookups = hits + misses
+    report = {
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+        "hits": hits,
+        "misses": misses,
+        "entries": stats.get("entries"),
+        "evictions": stats.get("evictions", 0),
+        "bytes": stats.get("bytes"),
+    }
+    if load and load["count"]:
+        report["loads"] = load["count"]
+        report["load_avg_ms"] = round(load["total"] / load["count"] * 1000, 1)
+        report["load_max_ms"] = round(load["max"] * 1000, 1)
+    # Остальные счетчики источника (stale, refreshes, not_modified ...) - как есть
+    for key, value in stats.items():
+        report.setdefault(key, value)
+    return report
+
+
+def collect():
+    """
+    Статистика всех кэшей
+
+    Returns:
+        dict: {name: {"hit_rate", "hits", "misses", "entries", "evictions", "bytes",
+                      "loads", "load_avg_ms", "load_max_ms", ...}}
+    """
+    raw = dict(memory_cache.get_all_stats())
+    for name, stats_fn in list(_sources.items()):
+        try:
+            raw[name] = stats_fn()
+        except Exception as e:
+            raw[name] = {"error": str(e)}
+
+    with _lock:
+        loads = {name: dict(load) for name, load in _loads.items()}
+    return {name: _normalize(stats, loads.get(name)) for name, stats in sorted(raw.items())}
+
+
+def dump():
+    """Отчет в JSON (для выгрузки и внешнего мониторинга)"""
+    return json.dumps({"generated_at": time.time(), "caches": collect()}, ensure_ascii=False, indent=2, default=str)
+
+
+def format_report(report=None):
+    """Краткий текстовый отчет (для Telegram, HTML)"""
+    report = report if report is not None else collect()
+    lines = ["📦 <b>Кэши</b>\n"]
+    for name, stats in report.items():
+        hit_rate = f"{stats['hit_rate'] * 100:.0f}%" if stats["hit_rate"] is not None else "—"
+        line = f"<b>{name}</b>: hit {hit_rate} ({stats['hits']}/{stats['hits'] + stats['misses']})"
+        if stats.get("entries") is not None:
+            line += f", записей {stats['entries']}"
+        if stats.get("evictions"):
+            line += f", вытеснено {stats['evictions']}"
+        if stats.get("bytes"):
+            line += f", ~{stats['bytes'] / 1024:.0f} КБ"
+        if stats.get("load_avg_ms") is not None:
+            line += f", загрузка {stats['load_avg_ms']:.0f}/{stats['load_max_ms']:.0f} мс"
+        lines.append(line)
+    return "\n".join(lines)
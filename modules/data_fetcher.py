@@ -1,9 +1,15 @@
-import requests
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 import pytz
 from functools import lru_cache
 import hashlib
+from modules.http_client import http_get
+from modules.async_runner import to_async
+from modules import cache_backend
+from modules.rate_limiter import current_priority, request_priority
+from modules.response_cache import cached_request
 
 API_KEY = os.getenv("API_FOOTBALL_KEY")
 API_URL = "https://v3.football.api-sports.io"
@@ -12,9 +18,26 @@ HEADERS = {
     "x-apisports-key": API_KEY
 }
 
-# In-memory кэш для inline режима (время жизни ~5 минут)
-_inline_cache = {}
+# Параллельная загрузка лиг: число потоков и общий дедлайн (секунды)
+LEAGUE_FETCH_WORKERS = int(os.getenv("LEAGUE_FETCH_WORKERS", "6"))
+LEAGUE_FETCH_DEADLINE = float(os.getenv("LEAGUE_FETCH_DEADLINE", "20"))
+
+_league_executor = ThreadPoolExecutor(max_workers=LEAGUE_FETCH_WORKERS, thread_name_prefix="league-fetch")
+
+# Статистика последней загрузки лиг: {league_name: секунды | None если не успела}
+league_fetch_stats = {"last_latency": {}, "timeouts": 0, "runs": 0}
+
+# API-Football принимает до 20 ID матчей в одном запросе /fixtures?ids=
+MATCH_IDS_PER_REQUEST = 20
+
+# Кэш для inline режима (время жизни ~5 минут, общий для реплик при CACHE_BACKEND=postgres)
 _cache_ttl = 300  # 5 минут в секундах
+_inline_cache = cache_backend.namespace(
+    "inline",
+    max_entries=int(os.getenv("INLINE_CACHE_MAX_ENTRIES", "2000")),
+    max_bytes=int(os.getenv("INLINE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=_cache_ttl
+)
 
 def _get_cache_key(prefix, *args):
     """Генерирует ключ кэша из префикса и аргументов"""
@@ -23,25 +46,23 @@ def _get_cache_key(prefix, *args):
 
 def _get_cached(key):
     """Получает значение из кэша если оно свежее"""
-    if key in _inline_cache:
-        data, timestamp = _inline_cache[key]
-        if datetime.now().timestamp() - timestamp < _cache_ttl:
-            return data
-        else:
-            del _inline_cache[key]
-    return None
+    return _inline_cache.get(key)
 
 def _set_cached(key, value):
-    """Сохраняет значение в кэш с текущим временем"""
-    _inline_cache[key] = (value, datetime.now().timestamp())
+    """Сохраняет значение в кэш на _cache_ttl секунд"""
+    _inline_cache.set(key, value)
 
-def _get(endpoint, params=None):
-    """Helper function to make API requests"""
+def _get(endpoint, params=None, use_cache=True):
+    """Helper function to make API requests (через персистентный кэш ответов)"""
     url = f"{API_URL}{endpoint}"
-    try:
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
+
+    def fetch():
+        response = http_get(url, params=params, headers=HEADERS)
         response.raise_for_status()
         return response.json()
+
+    try:
+        return cached_request("api-football", endpoint, params, fetch, use_cache=use_cache)
     except Exception as e:
         print(f"[API Error] {endpoint}: {e}")
         return {}
@@ -91,6 +112,40 @@ def get_match_result(match_id):
     return {"finished": False}
 
 
+def get_match_results_bulk(match_ids):
+    """
+    Получает результаты нескольких матчей запросами /fixtures?ids=
+    
+    Args:
+        match_ids: Список ID матчей
+    
+    Returns:
+        dict: {str(match_id): {finished, home_goals, away_goals}} для найденных матчей
+    """
+    unique_ids = list(dict.fromkeys(str(match_id) for match_id in match_ids))
+    results = {}
+    
+    for start in range(0, len(unique_ids), MATCH_IDS_PER_REQUEST):
+        chunk = unique_ids[start:start + MATCH_IDS_PER_REQUEST]
+        data = _get("/fixtures", params={"ids": "-".join(chunk)})
+        
+        for fixture in data.get("response", []):
+            match_id = str(fixture.get("fixture", {}).get("id"))
+            status = fixture.get("fixture", {}).get("status", {}).get("short", "")
+            goals = fixture.get("goals", {})
+            
+            if status in ["FT", "AET", "PEN"]:
+                results[match_id] = {
+                    "finished": True,
+                    "home_goals": goals.get("home"),
+                    "away_goals": goals.get("away")
+                }
+            else:
+                results[match_id] = {"finished": False, "status": status}
+    
+    return results
+
+
 def get_league_rounds(league_id, season=None):
     """Получает список раундов для лиги"""
     if not season:
@@ -202,6 +257,66 @@ def format_round_label(round_code, league_name=""):
     return clean_round
 
 
+def _fetch_league_fixtures(league_id, params_template, priority):
+    """Загружает матчи одной лиги; возвращает (матчи, секунды)"""
+    started = time.monotonic()
+    # Приоритет запросов хранится в потоке - переносим его в поток пула
+    with request_priority(priority):
+        data = _get("/fixtures", params={"league": league_id, **params_template}).get("response", [])
+    return data, time.monotonic() - started
+
+
+def _fetch_leagues_parallel(leagues, params_template, deadline=None):
+    """
+    Загружает матчи нескольких лиг параллельно с общим дедлайном
+
+    Args:
+        leagues: {league_name: league_id}
+        params_template: Общие параметры /fixtures (season, from, to)
+        deadline: Общий лимит времени в секундах (по умолчанию LEAGUE_FETCH_DEADLINE)
+
+    Returns:
+        dict: {league_name: [матчи]} только для лиг, успевших загрузиться
+    """
+    if not leagues:
+        return {}
+
+    deadline = LEAGUE_FETCH_DEADLINE if deadline is None else deadline
+    priority = current_priority()
+    started = time.monotonic()
+
+    futures = {
+        _league_executor.submit(_fetch_league_fixtures, league_id, params_template, priority): league_name
+        for league_name, league_id in leagues.items()
+    }
+    done, pending = wait(futures, timeout=deadline)
+
+    results = {}
+    latency = {}
+    for future in done:
+        league_name = futures[future]
+        try:
+            results[league_name], latency[league_name] = future.result()
+        except Exception as e:
+            print(f"[Leagues] {league_name}: ошибка загрузки: {e}")
+            latency[league_name] = None
+
+    # Не успевшие лиги дозагрузятся в фоне и попадут в кэш ответов
+    for future in pending:
+        latency[futures[future]] = None
+
+    league_fetch_stats["runs"] += 1
+    league_fetch_stats["timeouts"] += len(pending)
+    league_fetch_stats["last_latency"] = latency
+
+    report = ", ".join(
+        f"{name}={value:.1f}s" if value is not None else f"{name}=timeout"
+        for name, value in sorted(latency.items(), key=lambda item: item[1] if item[1] is not None else float("inf"))
+    )
+    print(f"[Leagues] {len(done)}/{len(futures)} лиг за {time.monotonic() - started:.1f}с: {report}")
+    return results
+
+
 def get_upcoming_matches(hours_ahead=24, next_n=None, window_hours=None, league_filter=None, round_filter=None):
     """Возвращает список ближайших матчей по всем топ-лигам"""
     now = datetime.utcnow().replace(tzinfo=pytz.UTC)
@@ -219,22 +334,16 @@ def get_upcoming_matches(hours_ahead=24, next_n=None, window_hours=None, league_
         # league_filter может содержать ID лиг (числа) или названия лиг (строки)
         leagues_to_fetch = {k: v for k, v in LEAGUES.items() if v in league_filter or k in league_filter}
 
-    for league_name, league_id in leagues_to_fetch.items():
-        url = f"{API_URL}/fixtures"
-        params = {
-            "league": league_id,
-            "season": datetime.now().year,
-            "from": now.strftime("%Y-%m-%d"),
-            "to": end.strftime("%Y-%m-%d")
-        }
+    params_template = {
+        "season": datetime.now().year,
+        "from": now.strftime("%Y-%m-%d"),
+        "to": end.strftime("%Y-%m-%d")
+    }
+    league_results = _fetch_leagues_parallel(leagues_to_fetch, params_template)
 
-        try:
-            response = requests.get(url, headers=HEADERS, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json().get("response", [])
-        except Exception as e:
-            print(f"[Ошибка API] {league_name}: {e}")
-            continue
+    # Порядок лиг сохраняется как в LEAGUES
+    for league_name in leagues_to_fetch:
+        data = league_results.get(league_name, [])
 
         for match in data:
             fixture = match.get("fixture", {})
@@ -272,30 +381,99 @@ def get_upcoming_matches(hours_ahead=24, next_n=None, window_hours=None, league_
     return matches
 
 
-def get_match_data(fixture_id):
-    """Возвращает расширенные данные по конкретному матчу"""
-    url = f"{API_URL}/fixtures?id={fixture_id}"
+# Подресурсы матча, которые загружаются только при первом обращении
+MATCH_SUBRESOURCES = {
+    "statistics": "/fixtures/statistics",
+    "lineups": "/fixtures/lineups",
+}
+
+_match_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="match-fetch")
+
+
+def _fetch_subresource(fixture_id, name):
+    """Загружает statistics/lineups матча"""
+    return _get(MATCH_SUBRESOURCES[name], params={"fixture": fixture_id}).get("response", [])
+
+
+class MatchData(dict):
+    """
+    Данные матча с ленивыми statistics и lineups
+
+    Заголовок матча (fixture, league, teams, goals) доступен сразу.
+    statistics и lineups запрашиваются при первом обращении
+    (match_data["lineups"] или match_data.get("lineups")) и запоминаются.
+    """
+
+    def __init__(self, fixture_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fixture_id = fixture_id
+
+    def _load(self, name):
+        value = _fetch_subresource(self.fixture_id, name)
+        self.setdefault(name, value)
+        return self[name]
+
+    def __missing__(self, key):
+        if key in MATCH_SUBRESOURCES:
+            return self._load(key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self or key in MATCH_SUBRESOURCES:
+            return self[key]
+        return default
+
+    def is_loaded(self, name):
+        """Загружен ли подресурс"""
+        return dict.__contains__(self, name)
+
+    def prefetch(self, *names):
+        """Параллельно загружает указанные подресурсы (по умолчанию все)"""
+        names = [n for n in (names or MATCH_SUBRESOURCES) if not self.is_loaded(n)]
+        priority = current_priority()
+
+        def load(name):
+            with request_priority(priority):
+                return self._load(name)
 
+        for future in [_match_executor.submit(load, name) for name in names]:
+            future.result()
+        return self
+
+
+def get_match_data(fixture_id, prefetch=()):
+    """
+    Возвращает расширенные данные по конкретному матчу
+
+    Args:
+        fixture_id: ID матча
+        prefetch: Подресурсы ("statistics", "lineups"), которые нужно загрузить
+            сразу - параллельно с заголовком матча. Остальные загрузятся
+            при первом обращении.
+
+    Returns:
+        MatchData | None: Данные матча
+    """
     try:
-        fixture_resp = requests.get(url, headers=HEADERS, timeout=15).json()
-        data = fixture_resp.get("response", [])[0]
+        priority = current_priority()
+
+        def load(name):
+            with request_priority(priority):
+                return _fetch_subresource(fixture_id, name)
 
-        stats_url = f"{API_URL}/fixtures/statistics?fixture={fixture_id}"
-        stats_resp = requests.get(stats_url, headers=HEADERS, timeout=15).json()
-        stats = stats_resp.get("response", [])
+        pending = {name: _match_executor.submit(load, name) for name in prefetch}
 
-        lineup_url = f"{API_URL}/fixtures/lineups?fixture={fixture_id}"
-        lineup_resp = requests.get(lineup_url, headers=HEADERS, timeout=15).json()
-        lineup = lineup_resp.get("response", [])
+        fixture_resp = _get("/fixtures", params={"id": fixture_id})
+        data = fixture_resp.get("response", [])[0]
 
-        match_data = {
+        match_data = MatchData(fixture_id, {
             "fixture": data.get("fixture", {}),
             "league": data.get("league", {}),
             "teams": data.get("teams", {}),
             "goals": data.get("goals", {}),
-            "statistics": stats,
-            "lineups": lineup
-        }
+        })
+        for name, future in pending.items():
+            match_data[name] = future.result()
 
         return match_data
 
@@ -746,3 +924,16 @@ def get_team_matches(team_id, days_back=7, days_ahead=30):
     except Exception as e:
         print(f"[Ошибка получения матчей команды {team_id}]: {e}")
         return []
+
+
+# Асинхронный интерфейс (те же функции в общем пуле потоков)
+get_match_result_async = to_async(get_match_result)
+get_match_results_bulk_async = to_async(get_match_results_bulk)
+fetch_upcoming_rounds_async = to_async(fetch_upcoming_rounds)
+get_upcoming_matches_async = to_async(get_upcoming_matches)
+get_match_data_async = to_async(get_match_data)
+get_lineups_async = to_async(get_lineups)
+get_team_stats_async = to_async(get_team_stats)
+get_injuries_async = to_async(get_injuries)
+get_halftime_stats_async = to_async(get_halftime_stats)
+get_team_matches_async = to_async(get_team_matches)
@@ -3,278 +3,223 @@
 Хранение прогнозов, результатов матчей и обучение ML модели
 """
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
+import time
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime
 import json
 
+# Пул соединений: размер, ожидание свободного соединения и проверка простаивавших
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "60"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_local = threading.local()
+_idle_since = {}
+_stats_lock = threading.Lock()
+
+pool_stats = {
+    "checkouts": 0, "reused": 0, "in_use": 0, "peak_in_use": 0,
+    "wait_total": 0.0, "wait_max": 0.0, "timeouts": 0, "broken": 0
+}
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pg_pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, os.environ['DATABASE_URL'])
+    return _pool
+
+
+def _is_healthy(conn):
+    """Соединение живо (простаивавшее дольше DB_POOL_PING_AFTER проверяется SELECT 1)"""
+    if conn.closed:
+        return False
+    if time.monotonic() - _idle_since.get(id(conn), 0) < DB_POOL_PING_AFTER:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _acquire():
+    started = time.monotonic()
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        with _stats_lock:
+            pool_stats["timeouts"] += 1
+        raise pg_pool.PoolError(f"Нет свободного соединения с БД за {DB_POOL_TIMEOUT:g}с")
+    waited = time.monotonic() - started
+
+    try:
+        db_pool = _get_pool()
+        conn = db_pool.getconn()
+        if not _is_healthy(conn):
+            # Соединение разорвано (рестарт БД, таймаут) - заменяем новым
+            with _stats_lock:
+                pool_stats["broken"] += 1
+            _idle_since.pop(id(conn), None)
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+    except Exception:
+        _pool_slots.release()
+        raise
+
+    with _stats_lock:
+        pool_stats["checkouts"] += 1
+        pool_stats["wait_total"] += waited
+        pool_stats["wait_max"] = max(pool_stats["wait_max"], waited)
+        pool_stats["in_use"] += 1
+        pool_stats["peak_in_use"] = max(pool_stats["peak_in_use"], pool_stats["in_use"])
+    return conn
+
+
+def _release(conn):
+    try:
+        broken = bool(conn.closed)
+        if not broken and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            # Незавершенная транзакция (SELECT без commit или ошибка) не должна попасть в пул
+            conn.rollback()
+        if broken:
+            # id() закрытого соединения может достаться новому - оно не должно пропустить проверку
+            _idle_since.pop(id(conn), None)
+        else:
+            _idle_since[id(conn)] = time.monotonic()
+        _get_pool().putconn(conn, close=broken)
+    except Exception as e:
+        print(f"⚠️ Ошибка возврата соединения в пул: {e}")
+        _idle_since.pop(id(conn), None)
+        try:
+            _get_pool().putconn(conn, close=True)
+        except Exception:
+            pass
+    finally:
+        with _stats_lock:
+            pool_stats["in_use"] -= 1
+        _pool_slots.release()
+
+
+class _Checkout:
+    """Соединение, выданное потоку (вложенные get_connection() получают его же)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.depth = 1
+
+
+class PooledConnection:
+    """
+    Соединение из пула с интерфейсом psycopg2 connection
+
+    close() возвращает соединение в пул. Поддерживает with:
+    commit при успехе, rollback при исключении, затем возврат в пул.
+    """
+
+    def __init__(self, checkout):
+        self._checkout = checkout
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._checkout.conn, name)
+
+    @property
+    def closed(self):
+        return self._released or self._checkout.conn.closed
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        checkout = self._checkout
+        checkout.depth -= 1
+        if checkout.depth == 0:
+            if getattr(_local, "checkout", None) is checkout:
+                _local.checkout = None
+            _release(checkout.conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._checkout.conn.commit()
+            else:
+                self._checkout.conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Страховка для функций, не закрывших соединение при исключении
+        try:
+            self.close()
+        except Exception:
+            pass
+
 
 def get_connection():
-    """Получить соединение с базой данных"""
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+    """
+    Получить соединение с базой данных (из пула)
+
+    Внутри одного потока вложенные вызовы получают то же соединение,
+    в пул оно возвращается после последнего close().
+
+    Returns:
+        PooledConnection: Используйте conn.close() или with get_connection() as conn
+    """
+    checkout = getattr(_local, "checkout", None)
+    if checkout is not None and not checkout.conn.closed:
+        checkout.depth += 1
+        with _stats_lock:
+            pool_stats["reused"] += 1
+    else:
+        checkout = _Checkout(_acquire())
+        _local.checkout = checkout
+    return PooledConnection(checkout)
+
+
+def get_pool_stats():
+    """
+    Метрики пула соединений
+
+    Returns:
+        dict: Выдачи, повторные выдачи в потоке, занято сейчас / пик,
+            ожидание свободного соединения (всего / среднее / максимум, мс),
+            таймауты и замененные разорванные соединения
+    """
+    with _stats_lock:
+        stats = dict(pool_stats)
+    checkouts = stats["checkouts"] or 1
+    stats["wait_avg_ms"] = round(stats.pop("wait_total") / checkouts * 1000, 2)
+    stats["wait_max_ms"] = round(stats.pop("wait_max") * 1000, 2)
+    stats["max_size"] = DB_POOL_MAX
+    return stats
 
 
 def init_database():
-    """Инициализация таблиц базы данных"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Таблица для прогнозов
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS predictions (
-            id SERIAL PRIMARY KEY,
-            match_id VARCHAR(100) UNIQUE,
-            home_team VARCHAR(200),
-            away_team VARCHAR(200),
-            league VARCHAR(200),
-            round_number VARCHAR(100),
-            match_date TIMESTAMP,
-            
-            -- Прогнозы
-            predicted_result VARCHAR(100),
-            predicted_home_goals FLOAT,
-            predicted_away_goals FLOAT,
-            predicted_total FLOAT,
-            confidence FLOAT,
-            betting_tips TEXT,
-            
-            -- Факторы прогноза
-            home_attack FLOAT,
-            away_attack FLOAT,
-            h2h_factor_home FLOAT,
-            h2h_factor_away FLOAT,
-            home_motivation FLOAT,
-            away_motivation FLOAT,
-            home_streak_factor FLOAT,
-            away_streak_factor FLOAT,
-            
-            -- Новые факторы (10 ноября 2025)
-            weather_adjustment FLOAT,
-            injuries_home_count INTEGER,
-            injuries_away_count INTEGER,
-            halftime_adjustment FLOAT,
-            playstyle_adjustment_home FLOAT,
-            playstyle_adjustment_away FLOAT,
-            
-            -- Реальный результат (заполняется после матча)
-            actual_result VARCHAR(100),
-            actual_home_goals INTEGER,
-            actual_away_goals INTEGER,
-            actual_total INTEGER,
-            
-            -- Точность прогноза
-            result_correct BOOLEAN,
-            total_error FLOAT,
-            
-            -- Версия алгоритма
-            algorithm_version VARCHAR(20) DEFAULT 'v2',
-            
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Таблица для весов ML модели
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS ml_weights (
-            id SERIAL PRIMARY KEY,
-            weight_name VARCHAR(100) UNIQUE,
-            weight_value FLOAT,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Инициализация начальных весов (включая новые факторы 10 ноября 2025)
-    initial_weights = {
-        'h2h_weight': 1.0,
-        'motivation_weight': 1.0,
-        'streak_weight': 1.0,
-        'form_weight': 1.0,
-        'position_weight': 1.0,
-        'weather_weight': 1.0,
-        'injuries_weight': 1.0,
-        'halftime_weight': 1.0,
-        'playstyle_weight': 1.0
-    }
-    
-    for name, value in initial_weights.items():
-        cur.execute("""
-            INSERT INTO ml_weights (weight_name, weight_value)
-            VALUES (%s, %s)
-            ON CONFLICT (weight_name) DO NOTHING
-        """, (name, value))
-    
-    # Таблица для статистики точности
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS accuracy_stats (
-            id SERIAL PRIMARY KEY,
-            period VARCHAR(50),
-            total_predictions INTEGER,
-            correct_results INTEGER,
-            accuracy_percentage FLOAT,
-            avg_total_error FLOAT,
-            calculated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Таблица для исторических матчей (для обучения ML)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS historical_matches (
-            id SERIAL PRIMARY KEY,
-            match_id VARCHAR(100) UNIQUE,
-            season VARCHAR(20),
-            competition_id INTEGER,
-            competition_name VARCHAR(200),
-            
-            -- Команды
-            home_team_id INTEGER,
-            home_team VARCHAR(200),
-            away_team_id INTEGER,
-            away_team VARCHAR(200),
-            
-            -- Время матча
-            match_date TIMESTAMP,
-            matchday INTEGER,
-            
-            -- Результат
-            home_goals INTEGER,
-            away_goals INTEGER,
-            winner VARCHAR(20),
-            
-            -- Статистика домашней команды
-            home_position INTEGER,
-            home_points INTEGER,
-            home_form VARCHAR(10),
-            home_goals_for INTEGER,
-            home_goals_against INTEGER,
-            home_played INTEGER,
-            home_won INTEGER,
-            home_draw INTEGER,
-            home_lost INTEGER,
-            
-            -- Статистика гостевой команды
-            away_position INTEGER,
-            away_points INTEGER,
-            away_form VARCHAR(10),
-            away_goals_for INTEGER,
-            away_goals_against INTEGER,
-            away_played INTEGER,
-            away_won INTEGER,
-            away_draw INTEGER,
-            away_lost INTEGER,
-            
-            -- Дополнительные данные
-            h2h_data JSONB,
-            top_scorers JSONB,
-            
-            -- Метаданные
-            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Индексы для быстрого поиска
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_historical_season 
-        ON historical_matches(season)
-    """)
-    
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_historical_competition 
-        ON historical_matches(competition_id)
-    """)
-    
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_historical_date 
-        ON historical_matches(match_date)
-    """)
-    
-    # Таблица для подписок на команды
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_subscriptions (
-            id SERIAL PRIMARY KEY,
-            user_id BIGINT NOT NULL,
-            team_name VARCHAR(200) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, team_name)
-        )
-    """)
-    
-    # Индекс для быстрого поиска подписок
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_subscriptions_user 
-        ON user_subscriptions(user_id)
-    """)
-    
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_subscriptions_team 
-        ON user_subscriptions(team_name)
-    """)
-    
-    # Таблица для отслеживания отправленных уведомлений
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS sent_notifications (
-            id SERIAL PRIMARY KEY,
-            match_id VARCHAR(100) NOT NULL,
-            user_id BIGINT NOT NULL,
-            notification_type VARCHAR(50) NOT NULL,
-            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(match_id, user_id, notification_type)
-        )
-    """)
-    
-    # Индекс для быстрой проверки отправленных уведомлений
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_sent_notifications_match 
-        ON sent_notifications(match_id, notification_type)
-    """)
-    
-    # Таблица для метрик ML моделей (A/B тестирование + специализация по лигам)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS ml_model_metrics (
-            id SERIAL PRIMARY KEY,
-            league VARCHAR(200) NOT NULL,
-            algorithm VARCHAR(100) NOT NULL,
-            
-            -- Метрики точности для каждого веса
-            h2h_r2_score FLOAT DEFAULT 0.0,
-            motivation_r2_score FLOAT DEFAULT 0.0,
-            streak_r2_score FLOAT DEFAULT 0.0,
-            overall_accuracy FLOAT DEFAULT 0.0,
-            
-            -- Статистика обучения
-            training_samples INTEGER DEFAULT 0,
-            test_samples INTEGER DEFAULT 0,
-            test_mse FLOAT DEFAULT 0.0,
-            
-            -- Метаданные
-            last_trained TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT FALSE,
-            model_version VARCHAR(50),
-            
-            UNIQUE(league, algorithm)
-        )
-    """)
-    
-    # Индексы для быстрого поиска лучших моделей
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_model_metrics_league 
-        ON ml_model_metrics(league)
-    """)
-    
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_model_metrics_active 
-        ON ml_model_metrics(is_active)
-    """)
-    
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_model_metrics_accuracy 
-        ON ml_model_metrics(overall_accuracy DESC)
-    """)
+    """
+    Инициализация таблиц базы данных (применяет миграции, см. modules.migrations)
     
-    conn.commit()
-    cur.close()
-    conn.close()
-    print("✅ База данных инициализирована!")
+    Returns:
+        int: Версия схемы
+    """
+    from modules.migrations import migrate
+    version = migrate()
+    print(f"✅ База данных инициализирована (схема v{version})")
+    return version
 
 
 def save_prediction(match_data, predictions, factors):
@@ -577,8 +522,15 @@ def get_predictions_by_league(league_name):
     return [dict(row) for row in predictions]
 
 
-def get_unverified_predictions(limit=100):
-    """Получает все прогнозы с незаполненными результатами"""
+def get_unverified_predictions(limit=100, min_age_minutes=0):
+    """
+    Получает все прогнозы с незаполненными результатами
+    
+    Args:
+        limit: Максимальное количество прогнозов
+        min_age_minutes: Сколько минут должно пройти с начала матча
+            (матчи, которые еще идут, не проверяем)
+    """
     conn = get_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
@@ -593,15 +545,16 @@ def get_unverified_predictions(limit=100):
                 match_date,
                 predicted_result,
                 predicted_home_goals,
-                predicted_away_goals
+                predicted_away_goals,
+                predicted_total
             FROM predictions
             WHERE actual_home_goals IS NULL
-            AND match_date < NOW()
+            AND match_date < NOW() - %s * INTERVAL '1 minute'
             ORDER BY match_date DESC
             LIMIT %s
         """
         
-        cur.execute(query, (limit,))
+        cur.execute(query, (min_age_minutes, limit))
         predictions = cur.fetchall()
         
         return [dict(row) for row in predictions]
@@ -614,32 +567,46 @@ def get_unverified_predictions(limit=100):
         conn.close()
 
 
+def _evaluate_result(home_team, away_team, actual_home_goals, actual_away_goals, predicted_result):
+    """
+    Определяет фактический исход матча и точность прогноза
+    
+    Returns:
+        tuple: (actual_result, result_correct)
+    """
+    predicted_result = predicted_result or ""
+    
+    if actual_home_goals > actual_away_goals:
+        actual_result = f"Победа {home_team}"
+        actual_result_type = "home_win"
+    elif actual_away_goals > actual_home_goals:
+        actual_result = f"Победа {away_team}"
+        actual_result_type = "away_win"
+    else:
+        actual_result = "Ничья"
+        actual_result_type = "draw"
+    
+    # Проверяем точность прогноза результата
+    result_correct = False
+    if actual_result_type == "home_win" and home_team in predicted_result and "Победа" in predicted_result:
+        result_correct = True
+    elif actual_result_type == "away_win" and away_team in predicted_result and "Победа" in predicted_result:
+        result_correct = True
+    elif actual_result_type == "draw" and "Ничья" in predicted_result:
+        result_correct = True
+    
+    return actual_result, result_correct
+
+
 def update_match_result(prediction_id, home_team, away_team, actual_home_goals, actual_away_goals, predicted_result):
     """Обновляет фактические результаты матча"""
     conn = get_connection()
     cur = conn.cursor()
     
     try:
-        # Определяем фактический результат
-        if actual_home_goals > actual_away_goals:
-            actual_result = f"Победа {home_team}"
-            actual_result_type = "home_win"
-        elif actual_away_goals > actual_home_goals:
-            actual_result = f"Победа {away_team}"
-            actual_result_type = "away_win"
-        else:
-            actual_result = "Ничья"
-            actual_result_type = "draw"
-        
-        # Проверяем точность прогноза результата
-        result_correct = False
-        if actual_result_type == "home_win" and home_team in predicted_result and "Победа" in predicted_result:
-            result_correct = True
-        elif actual_result_type == "away_win" and away_team in predicted_result and "Победа" in predicted_result:
-            result_correct = True
-        elif actual_result_type == "draw" and "Ничья" in predicted_result:
-            result_correct = True
-        
+        actual_result, result_correct = _evaluate_result(
+            home_team, away_team, actual_home_goals, actual_away_goals, predicted_result
+        )
         actual_total = actual_home_goals + actual_away_goals
         
         # Обновляем результаты
@@ -667,82 +634,140 @@ def update_match_result(prediction_id, home_team, away_team, actual_home_goals,
         conn.close()
 
 
-def track_user(user_id, username=None, first_name=None, last_name=None):
+def update_match_results_bulk(results):
     """
-    Отслеживание пользователя - создание или обновление записи
+    Записывает результаты нескольких матчей одной транзакцией
     
     Args:
-        user_id: Telegram user ID
-        username: Username пользователя
-        first_name: Имя пользователя
-        last_name: Фамилия пользователя
+        results: Список словарей с ключами prediction_id, home_team, away_team,
+            actual_home_goals, actual_away_goals, predicted_result, predicted_total
+    
+    Returns:
+        int: Количество обновленных прогнозов (0 при ошибке - транзакция откатывается)
     """
+    if not results:
+        return 0
+    
+    rows = []
+    for item in results:
+        home_goals = item['actual_home_goals']
+        away_goals = item['actual_away_goals']
+        actual_result, result_correct = _evaluate_result(
+            item['home_team'], item['away_team'], home_goals, away_goals, item.get('predicted_result')
+        )
+        actual_total = home_goals + away_goals
+        predicted_total = item.get('predicted_total')
+        total_error = abs(predicted_total - actual_total) if predicted_total is not None else None
+        rows.append((item['prediction_id'], home_goals, away_goals, actual_total,
+                     actual_result, result_correct, total_error))
+    
     conn = get_connection()
     cur = conn.cursor()
     
     try:
-        # Проверяем существует ли пользователь
-        cur.execute("""
-            INSERT INTO users (user_id, username, first_name, last_name, total_actions)
-            VALUES (%s, %s, %s, %s, 0)
-            ON CONFLICT (user_id) DO UPDATE
-            SET username = EXCLUDED.username,
-                first_name = EXCLUDED.first_name,
-                last_name = EXCLUDED.last_name,
-                last_seen = CURRENT_TIMESTAMP
-        """, (user_id, username, first_name, last_name))
+        execute_values(cur, """
+            UPDATE predictions AS p
+            SET 
+                actual_home_goals = v.actual_home_goals,
+                actual_away_goals = v.actual_away_goals,
+                actual_total = v.actual_total,
+                actual_result = v.actual_result,
+                result_correct = v.result_correct,
+                total_error = v.total_error,
+                updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v (id, actual_home_goals, actual_away_goals, actual_total,
+                                   actual_result, result_correct, total_error)
+            WHERE p.id = v.id
+        """, rows, template="(%s, %s, %s, %s, %s, %s, %s::float)", page_size=len(rows))
         
+        updated = cur.rowcount
         conn.commit()
+        return updated
+        
     except Exception as e:
+        print(f"Ошибка массового обновления результатов: {e}")
         conn.rollback()
-        print(f"❌ Ошибка отслеживания пользователя: {e}")
+        return 0
     finally:
         cur.close()
         conn.close()
 
 
-def track_action(user_id, action_type, action_details=None):
+def write_analytics_batch(users, actions):
     """
-    Отслеживание действия пользователя
+    Записывает накопленную аналитику одной транзакцией (см. analytics_queue)
     
     Args:
-        user_id: Telegram user ID
-        action_type: Тип действия (analyze, stats, train, etc.)
-        action_details: Дополнительные детали (JSON строка или текст)
+        users: {user_id: (username, first_name, last_name, last_seen)} - последние данные
+            каждого пользователя за период
+        actions: [(user_id, action_type, action_details, created_at), ...]
+    
+    Returns:
+        bool: True если записано
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    if not users and not actions:
+        return True
+    
+    conn = None
+    cur = None
     
     try:
-        # Сохраняем действие
-        cur.execute("""
-            INSERT INTO user_actions (user_id, action_type, action_details)
-            VALUES (%s, %s, %s)
-        """, (user_id, action_type, action_details))
+        # БД недоступна / пул исчерпан - тоже неудачная запись, а не исключение
+        conn = get_connection()
+        cur = conn.cursor()
         
-        # Увеличиваем счетчик действий пользователя
-        cur.execute("""
-            UPDATE users
-            SET total_actions = total_actions + 1,
-                last_seen = CURRENT_TIMESTAMP
-            WHERE user_id = %s
-        """, (user_id,))
+        # Пользователи: один upsert на всех (по одной строке на пользователя)
+        if users:
+            execute_values(cur, """
+                INSERT INTO users (user_id, username, first_name, last_name, total_actions, last_seen)
+                VALUES %s
+                ON CONFLICT (user_id) DO UPDATE
+                SET username = EXCLUDED.username,
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    last_seen = GREATEST(users.last_seen, EXCLUDED.last_seen)
+            """, [
+                (user_id, username, first_name, last_name, 0, last_seen)
+                for user_id, (username, first_name, last_name, last_seen) in users.items()
+            ], page_size=1000)
         
-        conn.commit()
-        
-        # Автоматически обновляем Excel файл
-        try:
-            from modules.analytics import update_excel_file
-            update_excel_file()
-        except Exception as excel_error:
-            print(f"⚠️ Не удалось обновить Excel файл: {excel_error}")
+        if actions:
+            # Действия: многострочный INSERT
+            execute_values(cur, """
+                INSERT INTO user_actions (user_id, action_type, action_details, created_at)
+                VALUES %s
+            """, actions, page_size=1000)
+            
+            # Счетчики: один UPDATE на пользователя за период
+            counters = {}
+            for user_id, _, _, created_at in actions:
+                count, last_seen = counters.get(user_id, (0, created_at))
+                counters[user_id] = (count + 1, max(last_seen, created_at))
+            execute_values(cur, """
+                UPDATE users
+                SET total_actions = users.total_actions + v.actions,
+                    last_seen = GREATEST(users.last_seen, v.last_seen)
+                FROM (VALUES %s) AS v(user_id, actions, last_seen)
+                WHERE users.user_id = v.user_id
+            """, [
+                (user_id, count, last_seen) for user_id, (count, last_seen) in counters.items()
+            ], template="(%s::bigint, %s::int, %s::timestamp)", page_size=1000)
         
+        conn.commit()
+        return True
     except Exception as e:
-        conn.rollback()
-        print(f"❌ Ошибка отслеживания действия: {e}")
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        print(f"❌ Ошибка записи аналитики: {e}")
+        return False
     finally:
-        cur.close()
-        conn.close()
+        if cur is not None:
+            cur.close()
+        if conn is not None:
+            conn.close()
 
 
 def get_user_stats():
@@ -840,6 +865,32 @@ def get_all_users_for_export():
         conn.close()
 
 
+HISTORICAL_COLUMNS = (
+    'match_id', 'season', 'competition_id', 'competition_name',
+    'home_team_id', 'home_team', 'away_team_id', 'away_team',
+    'match_date', 'matchday',
+    'home_goals', 'away_goals', 'winner',
+    'home_position', 'home_points', 'home_form',
+    'home_goals_for', 'home_goals_against', 'home_played',
+    'home_won', 'home_draw', 'home_lost',
+    'away_position', 'away_points', 'away_form',
+    'away_goals_for', 'away_goals_against', 'away_played',
+    'away_won', 'away_draw', 'away_lost',
+    'h2h_data', 'top_scorers'
+)
+
+# JSONB колонки сериализуются перед записью
+_HISTORICAL_JSON_COLUMNS = ('h2h_data', 'top_scorers')
+
+
+def _historical_row(match_data):
+    """Значения исторического матча в порядке HISTORICAL_COLUMNS"""
+    return tuple(
+        json.dumps(match_data.get(column)) if column in _HISTORICAL_JSON_COLUMNS else match_data.get(column)
+        for column in HISTORICAL_COLUMNS
+    )
+
+
 def save_historical_match(match_data):
     """
     Сохранить исторический матч в БД
@@ -847,77 +898,85 @@ def save_historical_match(match_data):
     Args:
         match_data (dict): Данные матча с результатом и статистикой команд
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    save_historical_matches_bulk([match_data])
+
+
+def _upsert_historical(cur, rows):
+    execute_values(cur, f"""
+        INSERT INTO historical_matches ({', '.join(HISTORICAL_COLUMNS)})
+        VALUES %s
+        ON CONFLICT (match_id) DO UPDATE SET
+            home_goals = EXCLUDED.home_goals,
+            away_goals = EXCLUDED.away_goals,
+            winner = EXCLUDED.winner
+    """, rows, page_size=1000)
+
+
+def save_historical_matches_bulk(rows):
+    """
+    Сохранить пачку исторических матчей (тур или сезон) одной транзакцией
+    
+    Многострочный upsert через execute_values вместо отдельного соединения,
+    запроса и коммита на каждый матч. Повторы match_id внутри пачки
+    схлопываются (побеждает последний) - ON CONFLICT не может обновить
+    одну строку дважды в одной команде.
+    
+    Если пачка не записалась (например, форма длиннее VARCHAR(10)), матчи
+    записываются по одному через SAVEPOINT: пропускаются только ошибочные.
+    
+    Args:
+        rows (list): Список dict с данными матчей (как в save_historical_match)
+    
+    Returns:
+        tuple: (сохранено, не сохранено) - количество матчей
+    """
+    unique = {}
+    for match_data in rows:
+        unique[match_data.get('match_id')] = _historical_row(match_data)
+    if not unique:
+        return 0, 0
+    
+    conn = None
+    cur = None
     
     try:
-        cur.execute("""
-            INSERT INTO historical_matches (
-                match_id, season, competition_id, competition_name,
-                home_team_id, home_team, away_team_id, away_team,
-                match_date, matchday,
-                home_goals, away_goals, winner,
-                home_position, home_points, home_form,
-                home_goals_for, home_goals_against, home_played,
-                home_won, home_draw, home_lost,
-                away_position, away_points, away_form,
-                away_goals_for, away_goals_against, away_played,
-                away_won, away_draw, away_lost,
-                h2h_data, top_scorers
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s
-            )
-            ON CONFLICT (match_id) DO UPDATE SET
-                home_goals = EXCLUDED.home_goals,
-                away_goals = EXCLUDED.away_goals,
-                winner = EXCLUDED.winner
-        """, (
-            match_data.get('match_id'),
-            match_data.get('season'),
-            match_data.get('competition_id'),
-            match_data.get('competition_name'),
-            match_data.get('home_team_id'),
-            match_data.get('home_team'),
-            match_data.get('away_team_id'),
-            match_data.get('away_team'),
-            match_data.get('match_date'),
-            match_data.get('matchday'),
-            match_data.get('home_goals'),
-            match_data.get('away_goals'),
-            match_data.get('winner'),
-            match_data.get('home_position'),
-            match_data.get('home_points'),
-            match_data.get('home_form'),
-            match_data.get('home_goals_for'),
-            match_data.get('home_goals_against'),
-            match_data.get('home_played'),
-            match_data.get('home_won'),
-            match_data.get('home_draw'),
-            match_data.get('home_lost'),
-            match_data.get('away_position'),
-            match_data.get('away_points'),
-            match_data.get('away_form'),
-            match_data.get('away_goals_for'),
-            match_data.get('away_goals_against'),
-            match_data.get('away_played'),
-            match_data.get('away_won'),
-            match_data.get('away_draw'),
-            match_data.get('away_lost'),
-            json.dumps(match_data.get('h2h_data')),
-            json.dumps(match_data.get('top_scorers'))
-        ))
+        conn = get_connection()
+        cur = conn.cursor()
+        
+        try:
+            _upsert_historical(cur, list(unique.values()))
+            conn.commit()
+            return len(unique), 0
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Пачка исторических матчей не записана ({e}), сохраняем по одному")
+        
+        saved = 0
+        for match_id, row in unique.items():
+            cur.execute("SAVEPOINT historical_row")
+            try:
+                _upsert_historical(cur, [row])
+                cur.execute("RELEASE SAVEPOINT historical_row")
+                saved += 1
+            except Exception as row_error:
+                cur.execute("ROLLBACK TO SAVEPOINT historical_row")
+                print(f"❌ Матч {match_id} не сохранен: {row_error}")
         
         conn.commit()
+        return saved, len(unique) - saved
     except Exception as e:
-        print(f"❌ Ошибка сохранения исторического матча: {e}")
-        conn.rollback()
+        print(f"❌ Ошибка сохранения исторических матчей: {e}")
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        return 0, len(unique)
     finally:
-        cur.close()
-        conn.close()
+        if cur is not None:
+            cur.close()
+        if conn is not None:
+            conn.close()
 
 
 def get_historical_matches(season=None, competition_id=None, limit=1000):
@@ -1454,9 +1513,3 @@ def set_active_model(league, algorithm):
         cur.close()
         conn.close()
 
-
-# Инициализация при импорте
-try:
-    init_database()
-except Exception as e:
-    print(f"⚠️ Ошибка инициализации БД: {e}")
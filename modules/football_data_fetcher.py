@@ -2,9 +2,19 @@
 Модуль для работы с Football-Data.org API
 Предоставляет дополнительную статистику: турнирные таблицы, H2H, бомбардиров
 """
-import requests
+import asyncio
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from modules.http_client import http_get
+from modules.response_cache import cached_request
+from modules import cache_backend, cache_registry, team_index, warm_cache
+from modules.team_index import normalize_name
+from modules.async_runner import run, to_async
+from modules.data_fetcher import get_injuries_async
+from modules.odds_fetcher import fetch_odds_async
+from modules.weather_fetcher import get_weather_for_match_async
 
 API_KEY = os.getenv("FOOTBALL_DATA_ORG_KEY")
 API_URL = "https://api.football-data.org/v4"
@@ -45,16 +55,33 @@ LEAGUE_ID_TO_CODE = {
 }
 
 
-def _get(endpoint, params=None):
-    """Helper function для запросов к API"""
+# Как долго снимок турнирной таблицы считается актуальным (секунды)
+STANDINGS_REFRESH_SECONDS = int(os.getenv("STANDINGS_REFRESH_SECONDS", "600"))
+
+STANDING_TYPES = ("TOTAL", "HOME", "AWAY")
+
+# Снимки таблиц по коду турнира
+_snapshots = {}
+# Ответы /standings, общие для реплик (снимок с индексами строится локально)
+_shared_standings = cache_backend.namespace("standings", ttl=STANDINGS_REFRESH_SECONDS, max_entries=100)
+_snapshot_locks = {}
+_snapshot_locks_guard = threading.Lock()
+
+
+def _get(endpoint, params=None, use_cache=True):
+    """Helper function для запросов к API (через персистентный кэш ответов)"""
     if not API_KEY:
         return {}
     
     url = f"{API_URL}{endpoint}"
+
+    def fetch(validators):
+        # validators - If-None-Match / If-Modified-Since из устаревшей записи кэша
+        return http_get(url, params=params, headers={**HEADERS, **validators})
+
     try:
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
-        response.raise_for_status()
-        return response.json()
+        return cached_request("football-data", endpoint, params, fetch,
+                              use_cache=use_cache, conditional=True)
     except Exception as e:
         print(f"[Football-Data.org Error] {endpoint}: {e}")
         return {}
@@ -218,27 +245,20 @@ def get_matches_from_football_data(league_id, round_filter=None):
     return result
 
 
-def get_match_data_from_football_data(match_id):
-    """
-    Получает полные данные о матче из Football-Data.org API
-    Возвращает данные в формате совместимом с API-Football
+def _to_match_data(data, competition=None):
     """
-    print(f"[DEBUG get_match_data_FD] Fetching match {match_id}")
-    
-    # Получаем данные матча
-    data = _get(f"/matches/{match_id}")
-    
-    if not data or "id" not in data:
-        print(f"[ERROR] Match {match_id} not found")
-        return None
+    Преобразует матч Football-Data.org в формат совместимый с API-Football
     
-    # Преобразуем в формат совместимый с существующим кодом
+    Args:
+        data: Объект матча (/matches/{id} или элемент списка матчей турнира)
+        competition: Турнир из ответа списка (если в самом матче его нет)
+    """
     home_team = data.get("homeTeam", {})
     away_team = data.get("awayTeam", {})
     score = data.get("score", {})
-    competition = data.get("competition", {})
+    competition = data.get("competition") or competition or {}
     
-    result = {
+    return {
         "fixture": {
             "id": data.get("id"),
             "date": data.get("utcDate"),
@@ -269,10 +289,267 @@ def get_match_data_from_football_data(match_id):
         "statistics": [],  # Football-Data.org не предоставляет детальную статистику матча
         "lineups": []  # Football-Data.org не предоставляет составы
     }
+
+
+def get_match_data_from_football_data(match_id):
+    """
+    Получает полные данные о матче из Football-Data.org API
+    Возвращает данные в формате совместимом с API-Football
+    """
+    print(f"[DEBUG get_match_data_FD] Fetching match {match_id}")
+    
+    # Получаем данные матча
+    data = _get(f"/matches/{match_id}")
+    
+    if not data or "id" not in data:
+        print(f"[ERROR] Match {match_id} not found")
+        return None
+    
+    return _to_match_data(data)
+
+
+def get_upcoming_match_data(league_id, hours_ahead=48):
+    """
+    Данные всех матчей турнира в ближайшие hours_ahead часов одним запросом
+    (тот же формат, что у get_match_data_from_football_data)
+    
+    Args:
+        league_id: ID лиги из API-Football (39, 140 и т.д.)
+        hours_ahead: Горизонт в часах
+    
+    Returns:
+        list: Данные матчей в формате API-Football
+    """
+    competition_code = LEAGUE_ID_TO_CODE.get(league_id)
+    if not competition_code:
+        return []
+    
+    data = _get(f"/competitions/{competition_code}/matches", params={"status": "SCHEDULED"})
+    now = datetime.now(timezone.utc)
+    horizon = now + timedelta(hours=hours_ahead)
     
+    result = []
+    for match in data.get("matches", []):
+        try:
+            kick_off = datetime.fromisoformat(match.get("utcDate", "").replace('Z', '+00:00'))
+        except ValueError:
+            continue
+        if now <= kick_off <= horizon:
+            result.append(_to_match_data(match, data.get("competition")))
     return result
 
 
+class StandingsSnapshot:
+    """
+    Снимок турнирных таблиц (TOTAL/HOME/AWAY) одного турнира
+
+    Загружается одним запросом /standings, строки индексируются
+    по id команды и нормализованному названию.
+
+    Args:
+        competition_code: Код турнира (PL, PD, SA и т.д.)
+        payload: Ответ эндпоинта /competitions/{code}/standings
+        fetched_at: Время загрузки payload (по умолчанию - сейчас)
+    """
+
+    def __init__(self, competition_code, payload, fetched_at=None):
+        self.competition_code = competition_code
+        self.fetched_at = fetched_at or time.time()
+        self.payload = payload
+        self.tables = {}
+        self._rows = {}
+        self._ids_by_name = {}
+        self._resolved = {}
+
+        for standing in payload.get("standings", []):
+            standing_type = standing.get("type", "TOTAL")
+            # В групповых этапах несколько таблиц одного типа (по группам)
+            self.tables.setdefault(standing_type, []).extend(standing.get("table", []))
+
+        for standing_type, table in self.tables.items():
+            rows = self._rows.setdefault(standing_type, {})
+            for index, row in enumerate(table, 1):
+                team = row.get("team", {})
+                team_key = team.get("id") or team.get("name")
+                if team_key is None:
+                    continue
+                rows[team_key] = (row.get("position") or index, row)
+                self._ids_by_name.setdefault(normalize_name(team.get("name")), team_key)
+                short_name = team.get("shortName")
+                if short_name:
+                    self._ids_by_name.setdefault(normalize_name(short_name), team_key)
+
+    def __bool__(self):
+        return any(self.tables.values())
+
+    def is_fresh(self):
+        """Снимок моложе STANDINGS_REFRESH_SECONDS"""
+        return time.time() - self.fetched_at < STANDINGS_REFRESH_SECONDS
+
+    def table(self, standing_type="TOTAL"):
+        """Таблица нужного типа (fallback на первую доступную)"""
+        if self.tables.get(standing_type):
+            return self.tables[standing_type]
+        for table in self.tables.values():
+            if table:
+                return table
+        return []
+
+    def find_team_id(self, team_name=None, team_id=None):
+        """
+        Находит команду в снимке
+
+        Args:
+            team_name: Название команды
+            team_id: ID команды в Football-Data.org (проверяется первым)
+
+        Returns:
+            int | str | None: Ключ команды в индексах снимка
+        """
+        if team_id is not None and any(team_id in rows for rows in self._rows.values()):
+            return team_id
+        if not team_name:
+            return None
+
+        key = normalize_name(team_name)
+        if key in self._ids_by_name:
+            return self._ids_by_name[key]
+        if key in self._resolved:
+            return self._resolved[key]
+
+        # Через справочник команд: ID Football-Data.org или любой из псевдонимов
+        found = None
+        team = team_index.lookup(team_name)
+        if team is not None:
+            fd_id = team.ids.get(team_index.FOOTBALL_DATA)
+            if fd_id is not None and any(fd_id in rows for rows in self._rows.values()):
+                found = fd_id
+            else:
+                found = next((self._ids_by_name[alias] for alias in team.aliases if alias in self._ids_by_name), None)
+
+        # Совпадение по словам названия (не по подстроке), результат запоминаем
+        if found is None and key:
+            tokens = set(key.split())
+            for name, candidate in self._ids_by_name.items():
+                if tokens <= set(name.split()):
+                    found = candidate
+                    break
+        self._resolved[key] = found
+        return found
+
+    def team_stats(self, team_name=None, team_id=None, venue="TOTAL"):
+        """
+        Статистика команды из таблицы нужного типа
+
+        Returns:
+            dict: Позиция, очки, матчи, голы, форма (пустой если команды нет)
+        """
+        team_key = self.find_team_id(team_name, team_id)
+        if team_key is None:
+            return {}
+
+        rows = self._rows.get(venue) if self.tables.get(venue) else None
+        if rows is None:
+            rows = next((r for r in self._rows.values() if r), {})
+        entry = rows.get(team_key)
+        if entry is None:
+            return {}
+
+        position, team = entry
+        return {
+            "position": position,
+            "points": team.get("points", 0),
+            "played": team.get("playedGames", 0),
+            "won": team.get("won", 0),
+            "draw": team.get("draw", 0),
+            "lost": team.get("lost", 0),
+            "goals_for": team.get("goalsFor", 0),
+            "goals_against": team.get("goalsAgainst", 0),
+            "goal_difference": team.get("goalDifference", 0),
+            "form": team.get("form", "")
+        }
+
+    def venue_stats(self, team_name=None, team_id=None, venue="HOME"):
+        """Статистика HOME/AWAY с fallback на TOTAL если матчей на этом поле нет"""
+        stats = self.team_stats(team_name, team_id, venue=venue)
+        if not stats or stats.get("played", 0) == 0:
+            stats = self.team_stats(team_name, team_id, venue="TOTAL")
+        return stats
+
+
+def _snapshot_lock(competition_code):
+    with _snapshot_locks_guard:
+        return _snapshot_locks.setdefault(competition_code, threading.Lock())
+
+
+def get_standings_snapshot(competition_code, force_refresh=False):
+    """
+    Возвращает снимок турнирных таблиц турнира
+
+    Таблицы загружаются не чаще одного раза за STANDINGS_REFRESH_SECONDS
+    на турнир; параллельные вызовы ждут одну загрузку.
+
+    Args:
+        competition_code: Код турнира (PL, PD, SA и т.д.)
+        force_refresh: Загрузить заново, даже если снимок актуален
+
+    Returns:
+        StandingsSnapshot | None: Снимок или None если данных нет
+    """
+    if not competition_code:
+        return None
+
+    snapshot = _snapshots.get(competition_code)
+    if snapshot is not None and snapshot.is_fresh() and not force_refresh:
+        return snapshot
+
+    with _snapshot_lock(competition_code):
+        snapshot = _snapshots.get(competition_code)
+        if snapshot is not None and snapshot.is_fresh() and not force_refresh:
+            return snapshot
+
+        # Таблицы могла уже загрузить другая реплика
+        shared = None if force_refresh else _shared_standings.get(competition_code)
+        if shared:
+            fresh = StandingsSnapshot(competition_code, shared["payload"], fetched_at=shared["fetched_at"])
+            if fresh.is_fresh():
+                _snapshots[competition_code] = fresh
+                return fresh
+
+        with cache_registry.timed("standings_snapshots"):
+            data = _get(f"/competitions/{competition_code}/standings", use_cache=not force_refresh)
+        fresh = StandingsSnapshot(competition_code, data) if data else None
+        if fresh:
+            _snapshots[competition_code] = fresh
+            _shared_standings.set(competition_code, {"payload": data, "fetched_at": fresh.fetched_at})
+            print(f"[Standings] Снимок {competition_code}: {', '.join(sorted(fresh.tables))}")
+            return fresh
+
+    # Ошибка загрузки - отдаем устаревший снимок, если он есть
+    return snapshot
+
+
+cache_registry.register("standings_snapshots", lambda: {"entries": len(_snapshots)})
+
+
+def _export_snapshots():
+    return {code: (snapshot.payload, snapshot.fetched_at) for code, snapshot in list(_snapshots.items())}
+
+
+def _import_snapshots(items, elapsed=0):
+    # Устаревший снимок тоже полезен: is_fresh() заставит обновить его при первом
+    # запросе, а до тех пор (и при ошибке API) он служит запасным вариантом
+    restored = 0
+    for code, (payload, fetched_at) in items.items():
+        if code not in _snapshots:
+            _snapshots[code] = StandingsSnapshot(code, payload, fetched_at=fetched_at)
+            restored += 1
+    return restored
+
+
+warm_cache.register("standings_snapshots", _export_snapshots, _import_snapshots)
+
+
 def get_standings(competition_code, standing_type="TOTAL"):
     """
     Получает турнирную таблицу
@@ -284,17 +561,8 @@ def get_standings(competition_code, standing_type="TOTAL"):
     Returns:
         list: Таблица с позициями команд
     """
-    data = _get(f"/competitions/{competition_code}/standings")
-    
-    standings = data.get("standings", [])
-    for standing in standings:
-        if standing.get("type") == standing_type:
-            return standing.get("table", [])
-    
-    # Fallback на первую доступную таблицу если тип не найден
-    if standings:
-        return standings[0].get("table", [])
-    return []
+    snapshot = get_standings_snapshot(competition_code)
+    return snapshot.table(standing_type) if snapshot else []
 
 
 def get_top_scorers(competition_code, limit=5):
@@ -356,7 +624,7 @@ def get_competition_matches(competition_code, date_filter="TODAY"):
     return data.get("matches", [])
 
 
-def get_team_stats_extended(team_name, competition_code=None, venue="TOTAL"):
+def get_team_stats_extended(team_name, competition_code=None, venue="TOTAL", snapshot=None, team_id=None):
     """
     Расширенная статистика команды
     
@@ -364,61 +632,130 @@ def get_team_stats_extended(team_name, competition_code=None, venue="TOTAL"):
         team_name: Название команды
         competition_code: Код турнира (PL, PD и т.д.)
         venue: "TOTAL", "HOME" или "AWAY" - тип статистики
+        snapshot: Готовый StandingsSnapshot (иначе берется по competition_code)
+        team_id: ID команды в Football-Data.org
     
     Returns:
         dict: Позиция в таблице, форма, последние матчи
     """
-    if not competition_code:
+    if snapshot is None:
+        if not competition_code:
+            return {}
+        snapshot = get_standings_snapshot(competition_code)
+    if not snapshot:
         return {}
     
-    standings = get_standings(competition_code, standing_type=venue)
-    team_stats = {}
-    
-    for position, team in enumerate(standings, 1):
-        if team_name.lower() in team.get("team", {}).get("name", "").lower():
-            team_stats = {
-                "position": position,
-                "points": team.get("points", 0),
-                "played": team.get("playedGames", 0),
-                "won": team.get("won", 0),
-                "draw": team.get("draw", 0),
-                "lost": team.get("lost", 0),
-                "goals_for": team.get("goalsFor", 0),
-                "goals_against": team.get("goalsAgainst", 0),
-                "goal_difference": team.get("goalDifference", 0),
-                "form": team.get("form", "")
-            }
-            break
-    
-    return team_stats
+    return snapshot.team_stats(team_name, team_id, venue=venue)
+
 
+# Дополнительные данные, которые enrich_match_data_async может собрать вместе с таблицей
+ENRICH_EXTRAS = ("weather", "injuries", "odds")
 
-def enrich_match_data(home_team, away_team, league):
+
+async def enrich_match_data_async(home_team, away_team, league=None, snapshot=None,
+                                  home_id=None, away_id=None, include_h2h=True,
+                                  fixture_id=None, match_datetime=None, extras=ENRICH_EXTRAS):
     """
-    Обогащает данные матча информацией из Football-Data.org
-    Получает отдельную статистику для дома и гостей с fallback на TOTAL
+    Обогащает данные матча, выполняя все запросы одновременно
+    
+    Таблица, бомбардиры, H2H, погода, травмы и коэффициенты запрашиваются
+    параллельно, поэтому время ответа равно самому медленному источнику.
+    
+    Args:
+        home_team: Название команды хозяев
+        away_team: Название команды гостей
+        league: Название лиги (если снимок не передан)
+        snapshot: StandingsSnapshot турнира (одна загрузка на все матчи тура)
+        home_id: ID хозяев в Football-Data.org
+        away_id: ID гостей в Football-Data.org
+        include_h2h: Запрашивать H2H (отдельный запрос к API)
+        fixture_id: ID матча в API-Football (нужен для травм и коэффициентов)
+        match_datetime: Время матча (для прогноза погоды)
+        extras: Какие из ENRICH_EXTRAS собирать
+    
+    Returns:
+        dict: standings, home_stats, away_stats, top_scorers, h2h, form
+            и запрошенные extras (weather, injuries, odds)
     """
-    competition_code = COMPETITION_CODES.get(league)
+    competition_code = snapshot.competition_code if snapshot else COMPETITION_CODES.get(league)
     
     if not competition_code:
         return {}
     
-    # Получаем раздельную статистику: хозяева - HOME stats, гости - AWAY stats
-    home_stats = get_team_stats_extended(home_team, competition_code, venue="HOME")
-    away_stats = get_team_stats_extended(away_team, competition_code, venue="AWAY")
-    
-    # Fallback: если HOME/AWAY пустая, используем TOTAL статистику
-    if not home_stats or home_stats.get("played", 0) == 0:
-        home_stats = get_team_stats_extended(home_team, competition_code, venue="TOTAL")
-    
-    if not away_stats or away_stats.get("played", 0) == 0:
-        away_stats = get_team_stats_extended(away_team, competition_code, venue="TOTAL")
+    tasks = {"top_scorers": get_top_scorers_async(competition_code, limit=3)}
+    if snapshot is None:
+        tasks["snapshot"] = get_standings_snapshot_async(competition_code)
+    if include_h2h:
+        tasks["h2h"] = get_h2h_stats_async(home_team, away_team)
+    if "weather" in extras:
+        tasks["weather"] = get_weather_for_match_async(home_team, away_team, match_datetime)
+    if "injuries" in extras and fixture_id:
+        tasks["injuries"] = get_injuries_async(fixture_id=fixture_id)
+    if "odds" in extras and fixture_id:
+        tasks["odds"] = fetch_odds_async(fixture_id, home_team, away_team)
+    
+    values = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    results = {}
+    for name, value in zip(tasks, values):
+        if isinstance(value, Exception):
+            print(f"[enrich_match_data] {name}: {value}")
+            value = None
+        results[name] = value
+    
+    if snapshot is None:
+        snapshot = results.pop("snapshot", None)
+    
+    # Раздельная статистика: хозяева - HOME stats, гости - AWAY stats (fallback на TOTAL)
+    if snapshot:
+        home_stats = snapshot.venue_stats(home_team, home_id, venue="HOME")
+        away_stats = snapshot.venue_stats(away_team, away_id, venue="AWAY")
+        standings = snapshot.table("TOTAL")
+    else:
+        home_stats, away_stats, standings = {}, {}, []
     
     enriched_data = {
+        "standings": standings,
         "home_stats": home_stats,
         "away_stats": away_stats,
-        "top_scorers": get_top_scorers(competition_code, limit=3),
-        "h2h": get_h2h_stats(home_team, away_team)
+        "top_scorers": results.get("top_scorers") or [],
+        "h2h": results.get("h2h") or [],
+        "form": {}
     }
+    for extra in extras:
+        if extra in results:
+            enriched_data[extra] = results[extra]
     
     return enriched_data
+
+
+def enrich_match_data(home_team, away_team, league=None, snapshot=None,
+                      home_id=None, away_id=None, include_h2h=True,
+                      fixture_id=None, match_datetime=None, extras=()):
+    """
+    Обогащает данные матча информацией из Football-Data.org
+    Синхронная обертка над enrich_match_data_async (запросы идут параллельно)
+    
+    По умолчанию собирает только таблицу, бомбардиров и H2H;
+    погода, травмы и коэффициенты - через extras.
+    """
+    return run(enrich_match_data_async(
+        home_team, away_team, league,
+        snapshot=snapshot,
+        home_id=home_id,
+        away_id=away_id,
+        include_h2h=include_h2h,
+        fixture_id=fixture_id,
+        match_datetime=match_datetime,
+        extras=extras
+    ))
+
+
+# Асинхронный интерфейс (те же функции в общем пуле потоков)
+get_standings_snapshot_async = to_async(get_standings_snapshot)
+get_standings_async = to_async(get_standings)
+get_top_scorers_async = to_async(get_top_scorers)
+get_team_matches_async = to_async(get_team_matches)
+get_h2h_stats_async = to_async(get_h2h_stats)
+get_competition_matches_async = to_async(get_competition_matches)
+get_matches_from_football_data_async = to_async(get_matches_from_football_data)
+get_match_data_from_football_data_async = to_async(get_match_data_from_football_data)
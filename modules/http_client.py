@@ -0,0 +1,170 @@
+"""
+Общий HTTP клиент для всех внешних API
+Один keep-alive пул соединений на хост, единые таймауты и политика повторов
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from modules import rate_limiter
+
+# Таймауты (connect, read) в секундах
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Политика повторов: только сетевые ошибки и 5xx, с экспоненциальной задержкой
+RETRY_TOTAL = int(os.getenv("HTTP_RETRIES", "2"))
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Сколько раз повторять запрос после 429 (ожидание идет через rate_limiter)
+RATE_LIMIT_RETRIES = int(os.getenv("HTTP_RATE_LIMIT_RETRIES", "3"))
+
+# Размер пула соединений для хостов, которых нет в HOST_POOL_LIMITS
+DEFAULT_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Лимиты одновременных соединений по хостам
+HOST_POOL_LIMITS = {
+    "v3.football.api-sports.io": 10,
+    "api.football-data.org": 4,
+    "api.sportdevs.com": 4,
+    "api.openweathermap.org": 4,
+    "api.the-odds-api.com": 2,
+}
+
+# Одна сессия (и один пул) на хост
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """Не дождались свободного слота в лимите запросов хоста"""
+
+
+def _build_session(host):
+    """Создает сессию с пулом соединений и политикой повторов для хоста"""
+    pool_size = HOST_POOL_LIMITS.get(host, DEFAULT_POOL_SIZE)
+    retry = Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        pool_block=True,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url):
+    """
+    Возвращает общую сессию для хоста из URL
+
+    Args:
+        url: Полный URL запроса
+
+    Returns:
+        requests.Session: Сессия с keep-alive пулом этого хоста
+    """
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _build_session(host)
+            _sessions[host] = session
+    return session
+
+
+def _retry_after_seconds(response):
+    """Сколько секунд ждать после 429 (Retry-After или заголовок Football-Data.org)"""
+    for header in ("Retry-After", "X-RequestCounter-Reset"):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return max(float(value), 1.0)
+            except ValueError:
+                continue
+    return 60.0
+
+
+def _observe_quota(host, response):
+    """Синхронизирует лимит с остатком квоты из заголовков ответа"""
+    bucket = rate_limiter.get_bucket(host)
+    if bucket is None:
+        return
+    available = response.headers.get("X-Requests-Available-Minute")
+    if available is not None:
+        try:
+            bucket.observe(int(available))
+        except ValueError:
+            pass
+
+
+def http_get(url, params=None, headers=None, timeout=None, priority=None):
+    """
+    GET запрос через общий пул соединений и лимиты запросов хоста
+
+    Args:
+        url: Полный URL
+        params: Query параметры
+        headers: Заголовки запроса
+        timeout: Таймаут (по умолчанию DEFAULT_TIMEOUT)
+        priority: Приоритет в очереди лимита (по умолчанию - приоритет потока)
+
+    Returns:
+        requests.Response: Ответ сервера (исключения requests пробрасываются)
+    """
+    host = urlsplit(url).netloc
+    session = get_session(url)
+
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        if not rate_limiter.acquire(host, priority):
+            raise RateLimitExceeded(f"Лимит запросов к {host} исчерпан, слот не получен")
+
+        response = session.get(
+            url,
+            params=params,
+            headers=headers,
+            timeout=timeout or DEFAULT_TIMEOUT
+        )
+
+        if response.status_code != 429:
+            _observe_quota(host, response)
+            return response
+
+        retry_after = _retry_after_seconds(response)
+        print(f"[HTTP] 429 от {host}, пауза {retry_after:.0f}с (попытка {attempt + 1})")
+        bucket = rate_limiter.get_bucket(host)
+        if bucket is None:
+            return response
+        bucket.penalize(retry_after)
+
+    return response
+
+
+def close_all():
+    """Закрывает все сессии (используется при завершении процесса)"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
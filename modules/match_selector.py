@@ -5,6 +5,7 @@
 from datetime import datetime, timedelta
 from modules.data_fetcher import get_upcoming_matches, LEAGUES
 from modules.predictor import analyze_streak
+from modules import team_index
 
 # Топ-5 лиг Европы (высший приоритет)
 TOP_5_LEAGUES = ["Premier League", "La Liga", "Serie A", "Bundesliga", "Ligue 1"]
@@ -12,6 +13,35 @@ TOP_5_LEAGUES = ["Premier League", "La Liga", "Serie A", "Bundesliga", "Ligue 1"
 # Европейские турниры
 EUROPEAN_COMPETITIONS = ["Champions League", "Europa League"]
 
+# Известные топ-клубы (канонические названия из team_index)
+TOP_CLUBS = {
+    "Manchester City", "Manchester United", "Liverpool", "Arsenal", "Chelsea", "Tottenham",
+    "Real Madrid", "Barcelona", "Atletico Madrid", "Sevilla",
+    "Bayern Munich", "Borussia Dortmund", "RB Leipzig",
+    "Inter", "AC Milan", "Juventus", "Napoli", "Roma",
+    "PSG", "Monaco", "Lyon", "Marseille"
+}
+
+# Дерби и принципиальные соперники (канонические названия, порядок не важен)
+DERBIES = {frozenset(pair) for pair in [
+    ("Manchester City", "Manchester United"),
+    ("Arsenal", "Tottenham"),
+    ("Liverpool", "Everton"),
+    ("Chelsea", "Arsenal"),
+    ("Real Madrid", "Barcelona"),
+    ("Real Madrid", "Atletico Madrid"),
+    ("Inter", "AC Milan"),
+    ("Juventus", "Inter"),
+    ("Roma", "Lazio"),
+    ("Bayern Munich", "Borussia Dortmund"),
+    ("PSG", "Marseille"),
+    ("Benfica", "Porto"),
+    ("Ajax", "Feyenoord"),
+    ("Galatasaray", "Fenerbahce"),
+    ("Celtic", "Rangers"),
+    ("Flamengo", "Corinthians")
+]}
+
 
 def calculate_match_interest_score(match_data, league_name):
     """
@@ -36,47 +66,19 @@ def calculate_match_interest_score(match_data, league_name):
         score += 10
     
     # 2. Известные топ-клубы
-    top_clubs = [
-        "Manchester City", "Manchester United", "Liverpool", "Arsenal", "Chelsea", "Tottenham",
-        "Real Madrid", "Barcelona", "Atletico Madrid", "Sevilla",
-        "Bayern Munich", "Borussia Dortmund", "RB Leipzig",
-        "Inter", "Milan", "Juventus", "Napoli", "Roma",
-        "PSG", "Monaco", "Lyon", "Marseille"
-    ]
-    
-    home_is_top = any(club in home_team for club in top_clubs)
-    away_is_top = any(club in away_team for club in top_clubs)
+    home_club = team_index.canonical_name(home_team)
+    away_club = team_index.canonical_name(away_team)
+    home_is_top = home_club in TOP_CLUBS
+    away_is_top = away_club in TOP_CLUBS
     
     if home_is_top and away_is_top:
         score += 20  # Оба топ-клуба
     elif home_is_top or away_is_top:
         score += 10  # Один топ-клуб
     
-    # 3. Дерби и принципиальные соперники (по названию)
-    derbies = [
-        ("Manchester City", "Manchester United"),
-        ("Arsenal", "Tottenham"),
-        ("Liverpool", "Everton"),
-        ("Chelsea", "Arsenal"),
-        ("Real Madrid", "Barcelona"),
-        ("Real Madrid", "Atletico Madrid"),
-        ("Inter", "Milan"),
-        ("Juventus", "Inter"),
-        ("Roma", "Lazio"),
-        ("Bayern Munich", "Borussia Dortmund"),
-        ("PSG", "Marseille"),
-        ("Benfica", "Porto"),
-        ("Ajax", "Feyenoord"),
-        ("Galatasaray", "Fenerbahce"),
-        ("Celtic", "Rangers"),
-        ("Flamengo", "Corinthians")
-    ]
-    
-    for team1, team2 in derbies:
-        if (team1 in home_team and team2 in away_team) or \
-           (team2 in home_team and team1 in away_team):
-            score += 25
-            break
+    # 3. Дерби и принципиальные соперники
+    if frozenset((home_club, away_club)) in DERBIES:
+        score += 25
     
     return min(score, 100)  # Максимум 100 баллов
 
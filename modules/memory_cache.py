@@ -0,0 +1,205 @@
+"""
+Ограниченный потокобезопасный кэш в памяти процесса (LRU + TTL)
+
+Замена для словарей уровня модуля, которые растут без ограничений:
+размер ограничен количеством записей и примерным объемом в байтах,
+устаревшие записи удаляет общий фоновый поток.
+"""
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# Как часто фоновый поток удаляет устаревшие записи (секунды)
+SWEEP_INTERVAL = float(os.getenv("MEMORY_CACHE_SWEEP_INTERVAL", "60"))
+
+_MISSING = object()
+
+# Все созданные кэши (для фоновой очистки)
+_caches = weakref.WeakSet()
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _estimate_size(value, depth=0):
+    """Примерный размер значения в байтах (вложенность до 3 уровней)"""
+    size = sys.getsizeof(value)
+    if depth >= 3:
+        return size
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k, depth + 1) + _estimate_size(v, depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(item, depth + 1) for item in value)
+    return size
+
+
+class MemoryCache:
+    """
+    Потокобезопасный LRU кэш с TTL
+
+    Args:
+        name: Имя кэша (для логов и статистики)
+        max_entries: Максимальное количество записей
+        max_bytes: Максимальный примерный объем (None - без ограничения)
+        ttl: Время жизни записи по умолчанию в секундах (None - бессрочно)
+    """
+
+    def __init__(self, name, max_entries=1000, max_bytes=None, ttl=300):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        _caches.add(self)
+        _ensure_sweeper()
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _enforce_limits(self):
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def get(self, key, default=None):
+        """Значение по ключу или default если его нет или оно устарело"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        """Сохраняет значение; ttl по умолчанию - self.ttl, None - бессрочно"""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = _estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            self._enforce_limits()
+
+    def incr(self, key, delta=1, ttl=_MISSING):
+        """Атомарно увеличивает счетчик и возвращает новое значение"""
+        with self._lock:
+            value = self.get(key, 0) + delta
+            self.set(key, value, ttl)
+            return value
+
+    def delete(self, key):
+        """Удаляет запись (если есть)"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        """Удаляет все записи"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self):
+        """Удаляет устаревшие записи; возвращает их количество"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, (_, expires_at, _) in self._data.items()
+                if expires_at is not None and expires_at <= now
+            ]
+            for key in expired:
+                self._remove(key)
+            self.stats["expirations"] += len(expired)
+        return len(expired)
+
+    def dump(self):
+        """Живые записи для сохранения на диск: [(key, value, оставшийся ttl | None)]"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value, None if expires_at is None else expires_at - now)
+                for key, (value, expires_at, _) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def restore(self, items, elapsed=0):
+        """
+        Загружает записи из dump()
+
+        Args:
+            items: Результат dump()
+            elapsed: Сколько секунд прошло с сохранения (вычитается из ttl)
+
+        Returns:
+            int: Количество восстановленных записей
+        """
+        restored = 0
+        for key, value, ttl in items:
+            if ttl is not None:
+                ttl -= elapsed
+                if ttl <= 0:
+                    continue
+            with self._lock:
+                # Данные, загруженные после старта, новее сохраненных
+                if key in self._data:
+                    continue
+                self.set(key, value, ttl)
+            restored += 1
+        return restored
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        """Счетчики и текущий размер кэша"""
+        with self._lock:
+            return dict(self.stats, entries=len(self._data), bytes=self._bytes)
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        for cache in list(_caches):
+            try:
+                cache.sweep()
+            except Exception as e:
+                print(f"[Memory Cache] Ошибка очистки {cache.name}: {e}")
+
+
+def _ensure_sweeper():
+    """Запускает общий фоновый поток очистки (один на процесс)"""
+    global _sweeper
+    if _sweeper is not None:
+        return
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep_loop, name="memory-cache-sweeper", daemon=True)
+            _sweeper.start()
+
+
+def get_all_stats():
+    """Статистика всех кэшей: {name: {...}}"""
+    return {cache.name: cache.get_stats() for cache in list(_caches)}
@@ -1,9 +1,4 @@
-import requests
-import os
-
-# Odds API для получения коэффициентов легальных БК в России
-ODDS_API_KEY = os.getenv("ODDS_API_KEY")
-ODDS_URL = "https://api.the-odds-api.com/v4/sports/soccer/odds"
+from modules.odds_snapshot import get_match_odds
 
 # Список легальных БК в России
 LEGAL_BOOKMAKERS = [
@@ -14,42 +9,18 @@ LEGAL_BOOKMAKERS = [
     "Leon"
 ]
 
-def get_odds_for_match(home_team, away_team):
-    """Получение коэффициентов с Odds API для конкретного матча"""
+def get_odds_for_match(home_team, away_team, fixture_id=None):
+    """Получение коэффициентов легальных БК для конкретного матча (из снимка ленты Odds API)"""
     try:
-        if not ODDS_API_KEY:
-            return []
-        
-        params = {
-            "apiKey": ODDS_API_KEY,
-            "regions": "eu",
-            "markets": "h2h",
-            "oddsFormat": "decimal"
-        }
-        response = requests.get(ODDS_URL, params=params, timeout=15)
-        
-        if response.status_code != 200:
-            return []
-        
-        data = response.json()
-        
-        if not isinstance(data, list):
-            return []
-
         match_odds = []
-        for event in data:
-            if home_team.lower() in event["home_team"].lower() or away_team.lower() in event["away_team"].lower():
-                for bookmaker in event["bookmakers"]:
-                    name = bookmaker["title"]
-                    if any(legal.lower() in name.lower() for legal in LEGAL_BOOKMAKERS):
-                        outcomes = bookmaker["markets"][0]["outcomes"]
-                        odds = {
-                            "bookmaker": name,
-                            "home": outcomes[0]["price"],
-                            "draw": outcomes[1]["price"] if len(outcomes) > 2 else "-",
-                            "away": outcomes[-1]["price"]
-                        }
-                        match_odds.append(odds)
+        for name, odds in get_match_odds(home_team, away_team, fixture_id).items():
+            if odds["1"] and any(legal.lower() in name.lower() for legal in LEGAL_BOOKMAKERS):
+                match_odds.append({
+                    "bookmaker": name,
+                    "home": odds["1"],
+                    "draw": odds["X"] or "-",
+                    "away": odds["2"]
+                })
         return match_odds[:3]  # возвращаем максимум 3 лучших БК
     except Exception as e:
         print(f"[Ошибка получения коэффициентов]: {e}")
@@ -79,7 +50,8 @@ def format_match_analysis(match_or_data, predictions_or_home_stats=None, away_st
         teams = predictions.get("teams", "")
         odds_list = get_odds_for_match(
             match_data["teams"]["home"]["name"],
-            match_data["teams"]["away"]["name"]
+            match_data["teams"]["away"]["name"],
+            fixture.get("id")
         )
         date = fixture.get("date", "Неизвестно")[:16].replace("T", " ")
 
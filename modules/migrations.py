@@ -0,0 +1,548 @@
+"""
+Версионированные миграции схемы PostgreSQL
+
+Раньше весь DDL выполнялся при каждом импорте modules.database - в каждом
+процессе, включая каждый запуск scheduler.py по cron. Теперь схема
+применяется явно (main.py и load_historical_data.py при старте): номер
+версии хранится в таблице schema_migrations, и если база актуальна,
+запуск сводится к проверке номера версии.
+
+Новая миграция - функция (cur) -> None, добавленная в конец MIGRATIONS
+со следующим номером. Каждая миграция выполняется в своей транзакции
+вместе с записью версии; параллельные запуски сериализуются advisory lock.
+
+Проверка индексов: python -m modules.migrations --check
+"""
+import json
+import sys
+
+from modules.database import get_connection
+
+# Ключ pg_advisory_xact_lock для миграций (произвольная константа)
+MIGRATION_LOCK_ID = 730214
+
+_applied_version = None
+
+
+def _baseline(cur):
+    """Исходная схема: таблицы прогнозов, ML, исторических матчей, подписок и пользователей"""
+    
+    # Таблица для прогнозов
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS predictions (
+            id SERIAL PRIMARY KEY,
+            match_id VARCHAR(100) UNIQUE,
+            home_team VARCHAR(200),
+            away_team VARCHAR(200),
+            league VARCHAR(200),
+            round_number VARCHAR(100),
+            match_date TIMESTAMP,
+            
+            -- Прогнозы
+            predicted_result VARCHAR(100),
+            predicted_home_goals FLOAT,
+            predicted_away_goals FLOAT,
+            predicted_total FLOAT,
+            confidence FLOAT,
+            betting_tips TEXT,
+            
+            -- Факторы прогноза
+            home_attack FLOAT,
+            away_attack FLOAT,
+            h2h_factor_home FLOAT,
+            h2h_factor_away FLOAT,
+            home_motivation FLOAT,
+            away_motivation FLOAT,
+            home_streak_factor FLOAT,
+            away_streak_factor FLOAT,
+            
+            -- Новые факторы (10 ноября 2025)
+            weather_adjustment FLOAT,
+            injuries_home_count INTEGER,
+            injuries_away_count INTEGER,
+            halftime_adjustment FLOAT,
+            playstyle_adjustment_home FLOAT,
+            playstyle_adjustment_away FLOAT,
+            
+            -- Реальный результат (заполняется после матча)
+            actual_result VARCHAR(100),
+            actual_home_goals INTEGER,
+            actual_away_goals INTEGER,
+            actual_total INTEGER,
+            
+            -- Точность прогноза
+            result_correct BOOLEAN,
+            total_error FLOAT,
+            
+            -- Версия алгоритма
+            algorithm_version VARCHAR(20) DEFAULT 'v2',
+            
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Таблица для весов ML модели
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ml_weights (
+            id SERIAL PRIMARY KEY,
+            weight_name VARCHAR(100) UNIQUE,
+            weight_value FLOAT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Инициализация начальных весов (включая новые факторы 10 ноября 2025)
+    initial_weights = {
+        'h2h_weight': 1.0,
+        'motivation_weight': 1.0,
+        'streak_weight': 1.0,
+        'form_weight': 1.0,
+        'position_weight': 1.0,
+        'weather_weight': 1.0,
+        'injuries_weight': 1.0,
+        'halftime_weight': 1.0,
+        'playstyle_weight': 1.0
+    }
+    
+    for name, value in initial_weights.items():
+        cur.execute("""
+            INSERT INTO ml_weights (weight_name, weight_value)
+            VALUES (%s, %s)
+            ON CONFLICT (weight_name) DO NOTHING
+        """, (name, value))
+    
+    # Таблица для статистики точности
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS accuracy_stats (
+            id SERIAL PRIMARY KEY,
+            period VARCHAR(50),
+            total_predictions INTEGER,
+            correct_results INTEGER,
+            accuracy_percentage FLOAT,
+            avg_total_error FLOAT,
+            calculated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Таблица для исторических матчей (для обучения ML)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS historical_matches (
+            id SERIAL PRIMARY KEY,
+            match_id VARCHAR(100) UNIQUE,
+            season VARCHAR(20),
+            competition_id INTEGER,
+            competition_name VARCHAR(200),
+            
+            -- Команды
+            home_team_id INTEGER,
+            home_team VARCHAR(200),
+            away_team_id INTEGER,
+            away_team VARCHAR(200),
+            
+            -- Время матча
+            match_date TIMESTAMP,
+            matchday INTEGER,
+            
+            -- Результат
+            home_goals INTEGER,
+            away_goals INTEGER,
+            winner VARCHAR(20),
+            
+            -- Статистика домашней команды
+            home_position INTEGER,
+            home_points INTEGER,
+            home_form VARCHAR(10),
+            home_goals_for INTEGER,
+            home_goals_against INTEGER,
+            home_played INTEGER,
+            home_won INTEGER,
+            home_draw INTEGER,
+            home_lost INTEGER,
+            
+            -- Статистика гостевой команды
+            away_position INTEGER,
+            away_points INTEGER,
+            away_form VARCHAR(10),
+            away_goals_for INTEGER,
+            away_goals_against INTEGER,
+            away_played INTEGER,
+            away_won INTEGER,
+            away_draw INTEGER,
+            away_lost INTEGER,
+            
+            -- Дополнительные данные
+            h2h_data JSONB,
+            top_scorers JSONB,
+            
+            -- Метаданные
+            loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Индексы для быстрого поиска
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_historical_season 
+        ON historical_matches(season)
+    """)
+    
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_historical_competition 
+        ON historical_matches(competition_id)
+    """)
+    
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_historical_date 
+        ON historical_matches(match_date)
+    """)
+    
+    # Таблица для подписок на команды
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_subscriptions (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            team_name VARCHAR(200) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, team_name)
+        )
+    """)
+    
+    # Индекс для быстрого поиска подписок
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_user 
+        ON user_subscriptions(user_id)
+    """)
+    
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_team 
+        ON user_subscriptions(team_name)
+    """)
+    
+    # Таблица для отслеживания отправленных уведомлений
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sent_notifications (
+            id SERIAL PRIMARY KEY,
+            match_id VARCHAR(100) NOT NULL,
+            user_id BIGINT NOT NULL,
+            notification_type VARCHAR(50) NOT NULL,
+            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(match_id, user_id, notification_type)
+        )
+    """)
+    
+    # Индекс для быстрой проверки отправленных уведомлений
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sent_notifications_match 
+        ON sent_notifications(match_id, notification_type)
+    """)
+    
+    # Таблица для метрик ML моделей (A/B тестирование + специализация по лигам)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS ml_model_metrics (
+            id SERIAL PRIMARY KEY,
+            league VARCHAR(200) NOT NULL,
+            algorithm VARCHAR(100) NOT NULL,
+            
+            -- Метрики точности для каждого веса
+            h2h_r2_score FLOAT DEFAULT 0.0,
+            motivation_r2_score FLOAT DEFAULT 0.0,
+            streak_r2_score FLOAT DEFAULT 0.0,
+            overall_accuracy FLOAT DEFAULT 0.0,
+            
+            -- Статистика обучения
+            training_samples INTEGER DEFAULT 0,
+            test_samples INTEGER DEFAULT 0,
+            test_mse FLOAT DEFAULT 0.0,
+            
+            -- Метаданные
+            last_trained TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT FALSE,
+            model_version VARCHAR(50),
+            
+            UNIQUE(league, algorithm)
+        )
+    """)
+    
+    # Индексы для быстрого поиска лучших моделей
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_model_metrics_league 
+        ON ml_model_metrics(league)
+    """)
+    
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_model_metrics_active 
+        ON ml_model_metrics(is_active)
+    """)
+    
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_model_metrics_accuracy 
+        ON ml_model_metrics(overall_accuracy DESC)
+    """)
+    
+    
+    # Пользователи и их действия (раньше создавались вне кода)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username VARCHAR(200),
+            first_name VARCHAR(200),
+            last_name VARCHAR(200),
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            total_actions INTEGER DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+    """)
+    
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_actions (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            action_type VARCHAR(100),
+            action_details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _hot_query_indexes(cur):
+    """Индексы под фактические условия самых частых запросов (см. HOT_QUERIES)"""
+    # get_unverified_predictions: actual_home_goals IS NULL AND match_date < ... ORDER BY match_date DESC
+    # Частичный индекс содержит только непроверенные матчи - он маленький и не растет с историей
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_unverified
+        ON predictions(match_date DESC)
+        WHERE actual_home_goals IS NULL
+    """)
+    
+    # get_predictions_by_league / get_rounds_by_league: league = ? AND actual_result IS NOT NULL
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_league_verified
+        ON predictions(league, match_date DESC)
+        WHERE actual_result IS NOT NULL
+    """)
+    
+    # get_recent_predictions: actual_result IS NOT NULL ORDER BY match_date DESC LIMIT n
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_predictions_verified_date
+        ON predictions(match_date DESC)
+        WHERE actual_result IS NOT NULL
+    """)
+    
+    # История действий пользователя: user_id = ? ORDER BY created_at DESC
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_actions_user_created
+        ON user_actions(user_id, created_at DESC)
+    """)
+    
+    # get_user_stats: активные за 24 часа / 7 дней
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_last_seen
+        ON users(last_seen)
+    """)
+
+
+def _cache_tables(cur):
+    """Таблицы кэшей: общий кэш пространств имен (cache_backend) и снимок теплого старта (warm_cache)"""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS shared_cache (
+            namespace VARCHAR(100) NOT NULL,
+            key TEXT NOT NULL,
+            value BYTEA NOT NULL,
+            expires_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (namespace, key)
+        )
+    """)
+    
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_shared_cache_expires
+        ON shared_cache(expires_at)
+    """)
+    
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS warm_cache (
+            id VARCHAR(50) PRIMARY KEY,
+            payload BYTEA NOT NULL,
+            saved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+# (версия, описание, функция) - только добавлять в конец, не менять примененные
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "indexes for hot queries", _hot_query_indexes),
+    (3, "cache tables", _cache_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _current_version(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(200),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cur.fetchone()[0]
+
+
+def migrate():
+    """
+    Применяет недостающие миграции
+    
+    Returns:
+        int: Версия схемы после применения
+    """
+    global _applied_version
+    if _applied_version == LATEST_VERSION:
+        return _applied_version
+    
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        version = _current_version(cur)
+        conn.commit()
+        if version >= LATEST_VERSION:
+            _applied_version = version
+            return version
+        
+        for number, name, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            # Повторная проверка под блокировкой: другой процесс мог успеть раньше
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (number,))
+            if cur.fetchone():
+                conn.commit()
+                continue
+            apply(cur)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (number, name)
+            )
+            conn.commit()
+            print(f"✅ Миграция {number}: {name}")
+        
+        _applied_version = LATEST_VERSION
+        return LATEST_VERSION
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+# Самые частые запросы и индексы, которые они должны использовать:
+# (название, SQL, параметры, ожидаемый индекс)
+HOT_QUERIES = [
+    (
+        "get_unverified_predictions",
+        """
+            SELECT id, match_id, match_date FROM predictions
+            WHERE actual_home_goals IS NULL
+            AND match_date < NOW() - %s * INTERVAL '1 minute'
+            ORDER BY match_date DESC
+            LIMIT %s
+        """,
+        (0, 100),
+        "idx_predictions_unverified",
+    ),
+    (
+        "get_predictions_by_league",
+        """
+            SELECT home_team, away_team, match_date FROM predictions
+            WHERE league = %s AND actual_result IS NOT NULL
+            ORDER BY match_date DESC
+        """,
+        ("Premier League",),
+        "idx_predictions_league_verified",
+    ),
+    (
+        "get_recent_predictions",
+        """
+            SELECT home_team, away_team, match_date FROM predictions
+            WHERE actual_result IS NOT NULL
+            ORDER BY match_date DESC
+            LIMIT %s
+        """,
+        (5,),
+        "idx_predictions_verified_date",
+    ),
+    (
+        "user_actions_history",
+        """
+            SELECT action_type, created_at FROM user_actions
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+            LIMIT %s
+        """,
+        (0, 20),
+        "idx_user_actions_user_created",
+    ),
+    (
+        "active_users",
+        """
+            SELECT COUNT(*) FROM users
+            WHERE last_seen >= CURRENT_TIMESTAMP - INTERVAL '24 hours'
+        """,
+        (),
+        "idx_users_last_seen",
+    ),
+]
+
+
+def _plan_indexes(plan):
+    """Все индексы, встречающиеся в дереве плана EXPLAIN (FORMAT JSON)"""
+    found = set()
+    if plan.get("Index Name"):
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+def check_index_usage():
+    """
+    Проверяет через EXPLAIN, что горячие запросы могут использовать свои индексы
+    
+    На маленьких таблицах планировщик честно выбирает Seq Scan, поэтому
+    проверка выполняется с enable_seqscan = off: так видно, подходит ли
+    индекс к форме запроса, независимо от текущего объема данных.
+    
+    Returns:
+        list: [(название, ожидаемый индекс, используется ли, индексы плана), ...]
+    """
+    conn = get_connection()
+    cur = conn.cursor()
+    results = []
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, query, params, index_name in HOT_QUERIES:
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = _plan_indexes(plan[0]["Plan"])
+            results.append((name, index_name, index_name in used, sorted(used)))
+        return results
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    print(f"Версия схемы: {migrate()}")
+    if "--check" in sys.argv[1:]:
+        ok = True
+        for name, index_name, used, plan_indexes in check_index_usage():
+            mark = "✅" if used else "❌"
+            print(f"{mark} {name}: {index_name} (в плане: {', '.join(plan_indexes) or 'нет индексов'})")
+            ok = ok and used
+        sys.exit(0 if ok else 1)
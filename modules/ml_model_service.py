@@ -8,13 +8,21 @@ ML Model Service - загрузка и использование многомо
 import os
 import joblib
 import numpy as np
+from modules import cache_backend, cache_registry
 from modules.database import get_best_model_for_league
 
 # Путь к сохраненным моделям
 MODEL_PATH = "ml_models/"
 
-# Кэш загруженных моделей для оптимизации
+# Как долго (в секундах) помнить выбор лучшей модели лиги
+MODEL_INFO_TTL = int(os.getenv("MODEL_INFO_TTL", "600"))
+
+# Кэш загруженных моделей для оптимизации (объекты моделей - только в памяти процесса)
 _model_cache = {}
+_model_cache_stats = {"hits": 0, "misses": 0}
+
+# Лучшая модель лиги из БД, общая для реплик ({} - модели нет)
+_model_info_cache = cache_backend.namespace("ml_models", ttl=MODEL_INFO_TTL, max_entries=100)
 
 
 def ensure_model_dir():
@@ -22,6 +30,17 @@ def ensure_model_dir():
     os.makedirs(MODEL_PATH, exist_ok=True)
 
 
+def _get_model_info(league):
+    """Информация о лучшей модели лиги (из общего кэша или БД)"""
+    model_info = _model_info_cache.get(league)
+    if model_info is None:
+        with cache_registry.timed("ml_models"):
+            model_info = get_best_model_for_league(league)
+        model_info = dict(model_info) if model_info else {}
+        _model_info_cache.set(league, model_info)
+    return model_info
+
+
 def load_active_model(league):
     """
     Загрузить активную модель для лиги
@@ -37,13 +56,9 @@ def load_active_model(league):
             'metrics': {...}  # Метрики точности
         } или None если модель не найдена
     """
-    # Проверяем кэш
-    if league in _model_cache:
-        return _model_cache[league]
-    
     try:
-        # Получаем информацию о лучшей модели из БД
-        model_info = get_best_model_for_league(league)
+        # Получаем информацию о лучшей модели (общий кэш / БД)
+        model_info = _get_model_info(league)
         
         if not model_info:
             print(f"⚠️ Нет активной модели для {league}")
@@ -58,9 +73,21 @@ def load_active_model(league):
             print(f"⚠️ Файл модели не найден: {model_filename}")
             return None
         
+        # Версия меняется при переобучении (новый файл модели) или смене лучшего алгоритма
+        version = f"{algorithm}:{int(os.path.getmtime(model_filename))}"
+        
+        # Проверяем кэш: модель перезагружается, только если версия изменилась
+        cached = _model_cache.get(league)
+        if cached is not None and cached.get('version') == version:
+            _model_cache_stats["hits"] += 1
+            return cached
+        
         # Загружаем модель
-        model_data = joblib.load(model_filename)
+        _model_cache_stats["misses"] += 1
+        with cache_registry.timed("ml_model_objects"):
+            model_data = joblib.load(model_filename)
         model_data['algorithm'] = algorithm
+        model_data['version'] = version
         
         # Кэшируем
         _model_cache[league] = model_data
@@ -73,6 +100,19 @@ def load_active_model(league):
         return None
 
 
+def get_model_version(league):
+    """
+    Версия активной модели лиги (входит в ключ кэша прогнозов)
+    
+    Returns:
+        str: "алгоритм:время файла" или "default" если модели нет
+    """
+    model_data = load_active_model(league)
+    if not model_data:
+        return "default"
+    return model_data.get('version', model_data['algorithm'])
+
+
 def predict_weights_for_match(league, match_features):
     """
     Предсказать оптимальные веса для матча используя специализированную модель лиги
@@ -147,8 +187,12 @@ def predict_weights_for_match(league, match_features):
         return None
 
 
+cache_registry.register("ml_model_objects", lambda: dict(_model_cache_stats, entries=len(_model_cache)))
+
+
 def clear_model_cache():
     """Очистить кэш моделей (используется после переобучения)"""
     global _model_cache
     _model_cache = {}
+    _model_info_cache.clear()
     print("🗑️ Кэш моделей очищен")
@@ -4,7 +4,7 @@ ML модуль для самообучения бота на основе ре
 """
 import os
 from modules.database import get_connection, get_ml_weights, update_ml_weights
-from modules.data_fetcher import get_match_result
+from modules.results_verifier import verify_match_results
 from modules.local_ml_model import predict_weights, get_model_info, train_model
 import json
 
@@ -12,70 +12,10 @@ import json
 def update_actual_results():
     """
     Обновляет реальные результаты завершенных матчей через API
+    (пакетные запросы и одна транзакция - см. results_verifier)
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    # Получаем прогнозы без реальных результатов
-    cur.execute("""
-        SELECT id, match_id, home_team, away_team, 
-               predicted_result, predicted_total,
-               predicted_home_goals, predicted_away_goals
-        FROM predictions
-        WHERE actual_result IS NULL 
-        AND match_date < NOW()
-        LIMIT 50
-    """)
-    
-    predictions = cur.fetchall()
-    updated_count = 0
-    
-    for pred in predictions:
-        pred_id, match_id, home_team, away_team, predicted_result, predicted_total, pred_home, pred_away = pred
-        
-        try:
-            # Получаем реальный результат через API
-            result = get_match_result(match_id)
-            
-            if result and result.get("finished"):
-                home_goals = result.get("home_goals", 0)
-                away_goals = result.get("away_goals", 0)
-                actual_total = home_goals + away_goals
-                
-                # Определяем реальный результат
-                if home_goals > away_goals:
-                    actual_result = f"Победа {home_team}"
-                elif away_goals > home_goals:
-                    actual_result = f"Победа {away_team}"
-                else:
-                    actual_result = "Ничья"
-                
-                # Проверяем правильность прогноза
-                result_correct = (predicted_result == actual_result)
-                total_error = abs(predicted_total - actual_total)
-                
-                # Обновляем запись
-                cur.execute("""
-                    UPDATE predictions
-                    SET actual_result = %s,
-                        actual_home_goals = %s,
-                        actual_away_goals = %s,
-                        actual_total = %s,
-                        result_correct = %s,
-                        total_error = %s,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = %s
-                """, (actual_result, home_goals, away_goals, actual_total, 
-                      result_correct, total_error, pred_id))
-                
-                updated_count += 1
-        except Exception as e:
-            print(f"⚠️ Ошибка получения результата для матча {match_id}: {e}")
-            continue
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+    stats = verify_match_results()
+    updated_count = stats.get("updated", 0)
     
     print(f"✅ Обновлено результатов: {updated_count}")
     return updated_count
@@ -1,13 +1,12 @@
 """
 Попытка взять линии/коэффициенты:
 - сначала пробуем API-Football /odds (если доступно),
-- иначе пробуем external odds API если задан ODDS_API_KEY (пример: the-odds-api).
+- иначе берем матч из снимка ленты the-odds-api (modules/odds_snapshot, если задан ODDS_API_KEY).
 """
-import os
 from modules.data_fetcher import _get
-import requests
+from modules.async_runner import to_async
+from modules.odds_snapshot import get_match_odds
 
-ODDS_API_KEY = os.getenv("ODDS_API_KEY")
 LEGAL_BOOKMAKERS = [
     "Fonbet", "Winline", "BetCity", "Pari", "Melbet", "Liga Stavok",
     "Marathon", "Tennisi", "Betboom", "Leon", "Baltbet", "Zenit",
@@ -46,34 +45,19 @@ def get_odds_from_api_football(fixture_id):
         res.setdefault(lb, {"1": None, "X": None, "2": None, "O2.5": None, "BTTS": None})
     return res
 
-def get_odds_from_external():
-    # Example: the-odds-api
+def get_odds_from_external(home_team=None, away_team=None, fixture_id=None):
+    """Коэффициенты матча из снимка ленты the-odds-api (без отдельной загрузки)"""
     try:
-        if not ODDS_API_KEY:
-            return {}
-        url = f"https://api.the-odds-api.com/v4/sports/soccer/odds/?regions=eu&markets=h2h,totals&oddsFormat=decimal&apiKey={ODDS_API_KEY}"
-        r = requests.get(url, timeout=10)
-        data = r.json()
-        # map some data (simplified)
-        out = {}
-        for item in data[:10]:
-            try:
-                bk = item["bookmakers"][0]["title"]
-                market = item["bookmakers"][0]["markets"][0]
-                # store first outcomes
-                out[bk] = {"raw": market}
-            except Exception:
-                continue
-        return out
+        return get_match_odds(home_team, away_team, fixture_id)
     except Exception:
         return {}
 
-def fetch_odds(fixture_id):
+def fetch_odds(fixture_id, home_team=None, away_team=None):
     """Главная функция: возвращает объединённую таблицу коэффициентов."""
     res = get_odds_from_api_football(fixture_id)
     if not res or all(v["1"] is None and v["X"] is None and v["2"] is None for v in res.values()):
         # fallback to external
-        res = get_odds_from_external()
+        res = get_odds_from_external(home_team, away_team, fixture_id)
     return res
 
 
@@ -222,3 +206,9 @@ def analyze_value_bets(bot_predictions, odds_data, min_edge=5.0):
         "value_bets": sorted(value_bets, key=lambda x: x["edge"], reverse=True),  # Сортируем по преимуществу
         "best_available_odds": best_odds
     }
+
+
+# Асинхронный интерфейс (те же функции в общем пуле потоков)
+get_odds_from_api_football_async = to_async(get_odds_from_api_football)
+get_odds_from_external_async = to_async(get_odds_from_external)
+fetch_odds_async = to_async(fetch_odds)
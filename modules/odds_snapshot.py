@@ -0,0 +1,197 @@
+"""
+Снимок линии the-odds-api для всех матчей
+
+Лента коэффициентов по футболу загружается одним запросом не чаще раза
+в ODDS_SNAPSHOT_INTERVAL секунд (через персистентный кэш ответов - общий
+для бота и планировщика). События индексируются по канонической паре
+команд (team_index) и по ID события, поэтому поиск коэффициентов матча -
+обращение к словарю, а не скачивание и перебор всей ленты.
+"""
+import os
+import threading
+import time
+
+from modules import cache_registry, team_index
+from modules.http_client import http_get
+from modules.memory_cache import MemoryCache
+from modules.response_cache import cached_request
+
+ODDS_API_KEY = os.getenv("ODDS_API_KEY")
+ODDS_URL = "https://api.the-odds-api.com/v4/sports/soccer/odds"
+ODDS_SNAPSHOT_INTERVAL = int(os.getenv("ODDS_SNAPSHOT_INTERVAL", "600"))
+
+# Параметры ленты (ключ API добавляется при запросе и не попадает в ключ кэша)
+FEED_PARAMS = {
+    "regions": "eu",
+    "markets": "h2h,totals",
+    "oddsFormat": "decimal"
+}
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+# Сопоставленные матчи API-Football: fixture_id -> ID события the-odds-api
+_fixture_events = MemoryCache("odds_fixtures", max_entries=5000, ttl=7 * 86400)
+
+
+def pair_key(home_team, away_team):
+    """Ключ пары команд: канонические нормализованные названия"""
+    return (
+        team_index.normalize_name(team_index.canonical_name(home_team)),
+        team_index.normalize_name(team_index.canonical_name(away_team))
+    )
+
+
+def event_odds(event):
+    """
+    Коэффициенты события по букмекерам в формате odds_fetcher
+
+    Рынки выбираются по ключу ("h2h", "totals"), исходы - по названию, а не по позиции.
+
+    Returns:
+        dict: {bookmaker: {"1": ..., "X": ..., "2": ..., "O2.5": ..., "BTTS": None}}
+    """
+    home_name = event.get("home_team")
+    away_name = event.get("away_team")
+    result = {}
+    for bookmaker in event.get("bookmakers", []):
+        odds = {"1": None, "X": None, "2": None, "O2.5": None, "BTTS": None}
+        for market in bookmaker.get("markets", []):
+            for outcome in market.get("outcomes", []):
+                name = outcome.get("name")
+                price = outcome.get("price")
+                if market.get("key") == "h2h":
+                    if name == home_name:
+                        odds["1"] = price
+                    elif name == away_name:
+                        odds["2"] = price
+                    elif name == "Draw":
+                        odds["X"] = price
+                elif market.get("key") == "totals" and name == "Over" and outcome.get("point") == 2.5:
+                    odds["O2.5"] = price
+        title = bookmaker.get("title")
+        if title:
+            result[title] = odds
+    return result
+
+
+class OddsSnapshot:
+    """
+    Лента коэффициентов с индексами по паре команд и ID события
+
+    Args:
+        events: Ответ эндпоинта /v4/sports/soccer/odds
+        fetched_at: Время загрузки (по умолчанию - сейчас)
+    """
+
+    def __init__(self, events, fetched_at=None):
+        self.fetched_at = fetched_at or time.time()
+        self.events = events
+        self._by_pair = {}
+        self._by_id = {}
+        for event in events:
+            if event.get("id"):
+                self._by_id[event["id"]] = event
+            self._by_pair.setdefault(pair_key(event.get("home_team"), event.get("away_team")), event)
+
+    def __len__(self):
+        return len(self.events)
+
+    def is_fresh(self):
+        """Снимок моложе ODDS_SNAPSHOT_INTERVAL"""
+        return time.time() - self.fetched_at < ODDS_SNAPSHOT_INTERVAL
+
+    def find_event(self, home_team=None, away_team=None, fixture_id=None):
+        """
+        Событие матча
+
+        Args:
+            home_team: Команда хозяев (любое написание)
+            away_team: Команда гостей
+            fixture_id: ID матча в API-Football (запоминается после первого совпадения)
+
+        Returns:
+            dict | None: Событие the-odds-api
+        """
+        if fixture_id is not None:
+            event_id = _fixture_events.get(fixture_id)
+            if event_id in self._by_id:
+                return self._by_id[event_id]
+        if not home_team or not away_team:
+            return None
+
+        event = self._by_pair.get(pair_key(home_team, away_team))
+        if event is not None and fixture_id is not None and event.get("id"):
+            _fixture_events.set(fixture_id, event["id"])
+        return event
+
+
+def _fetch_feed():
+    response = http_get(ODDS_URL, params={**FEED_PARAMS, "apiKey": ODDS_API_KEY})
+    if response.status_code != 200:
+        print(f"[Odds Snapshot] Ошибка ленты: HTTP {response.status_code}")
+        return []
+    data = response.json()
+    return data if isinstance(data, list) else []
+
+
+def get_odds_snapshot(force_refresh=False):
+    """
+    Актуальный снимок ленты коэффициентов
+
+    Загружается не чаще раза в ODDS_SNAPSHOT_INTERVAL; параллельные вызовы
+    ждут одну загрузку. При ошибке отдается предыдущий снимок.
+
+    Returns:
+        OddsSnapshot | None: Снимок или None если ключа API нет / лента недоступна
+    """
+    global _snapshot
+    if not ODDS_API_KEY:
+        return None
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.is_fresh() and not force_refresh:
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.is_fresh() and not force_refresh:
+            return snapshot
+        try:
+            with cache_registry.timed("odds_snapshot"):
+                events = cached_request("the-odds-api", "/v4/sports/soccer/odds", FEED_PARAMS,
+                                        _fetch_feed, use_cache=not force_refresh)
+        except Exception as e:
+            print(f"[Odds Snapshot] Ошибка загрузки: {e}")
+            events = None
+        if events:
+            _snapshot = OddsSnapshot(events)
+            print(f"[Odds Snapshot] Событий в ленте: {len(_snapshot)}")
+            return _snapshot
+
+    # Ошибка загрузки - отдаем устаревший снимок, если он есть
+    return snapshot
+
+
+def _snapshot_stats():
+    snapshot = _snapshot
+    if snapshot is None:
+        return {"entries": 0}
+    return {"entries": len(snapshot), "age_seconds": round(time.time() - snapshot.fetched_at)}
+
+
+cache_registry.register("odds_snapshot", _snapshot_stats)
+
+
+def get_match_odds(home_team=None, away_team=None, fixture_id=None):
+    """
+    Коэффициенты матча из снимка
+
+    Returns:
+        dict: {bookmaker: {"1", "X", "2", "O2.5", "BTTS"}} (пустой если матча нет в ленте)
+    """
+    snapshot = get_odds_snapshot()
+    if not snapshot:
+        return {}
+    event = snapshot.find_event(home_team, away_team, fixture_id)
+    return event_odds(event) if event else {}
@@ -0,0 +1,170 @@
+"""
+Кэш готовых прогнозов
+
+generate_predictions_ultra детерминирован: одинаковые входные данные дают
+одинаковый прогноз. Поэтому готовый анализ (и отформатированный текст)
+хранится под ключом match_id + отпечаток входных данных: строки команд
+в таблицах, форма, H2H и версия ML модели лиги. Как только любой из входов
+меняется, меняется и ключ - старая запись просто перестает находиться.
+"""
+import hashlib
+import json
+import os
+import time
+
+from modules.football_data_fetcher import STANDING_TYPES, enrich_match_data
+from modules import cache_backend, cache_registry
+from modules.message_formatter import format_match_analysis
+from modules.ml_model_service import get_model_version
+from modules.predictor import generate_predictions_ultra
+
+# Бомбардиры не входят в отпечаток - TTL совпадает со сроком их кэширования
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+# Общий для реплик при CACHE_BACKEND=postgres (прогрев на одной - выдача на всех)
+_cache = cache_backend.namespace(
+    "predictions",
+    max_entries=int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "2000")),
+    ttl=PREDICTION_CACHE_TTL
+)
+
+
+def team_inputs(snapshot, team_name, team_id=None):
+    """Строки команды во всех таблицах снимка (TOTAL/HOME/AWAY, включая форму)"""
+    if not snapshot:
+        return None
+    return {venue: snapshot.team_stats(team_name, team_id, venue=venue) for venue in STANDING_TYPES}
+
+
+def _h2h_inputs(h2h_matches):
+    """Нормализованный H2H: только ID матчей и счет"""
+    return [
+        (match.get("id"), match.get("score", {}).get("fullTime"))
+        for match in (h2h_matches or [])
+    ]
+
+
+def fingerprint(match_data, snapshot, home_id=None, away_id=None, h2h_matches=None):
+    """
+    Стабильный хэш входных данных прогноза
+
+    Args:
+        match_data: Данные матча (fixture, league, teams)
+        snapshot: StandingsSnapshot турнира
+        home_id: ID хозяев в Football-Data.org (если есть)
+        away_id: ID гостей в Football-Data.org (если есть)
+        h2h_matches: Матчи H2H, если они участвуют в прогнозе
+
+    Returns:
+        str | None: Отпечаток или None если входные данные неизвестны
+    """
+    if not match_data or not snapshot:
+        return None
+
+    teams = match_data.get("teams", {})
+    home = teams.get("home", {}).get("name", "")
+    away = teams.get("away", {}).get("name", "")
+    fixture = match_data.get("fixture", {})
+    league = match_data.get("league", {})
+
+    inputs = {
+        # Статус матча в прогнозе не участвует (и отличается между эндпоинтами списка и матча)
+        "fixture": [fixture.get("id"), fixture.get("date")],
+        "league": [league.get("name"), league.get("round")],
+        "teams": [home, away],
+        "home": team_inputs(snapshot, home, home_id),
+        "away": team_inputs(snapshot, away, away_id),
+        "h2h": _h2h_inputs(h2h_matches),
+        "model": get_model_version(league.get("name", "")),
+    }
+    raw = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def get(match_id, match_fingerprint):
+    """
+    Готовый прогноз для тех же входных данных
+
+    Returns:
+        dict | None: {"analysis": ..., "text": ...}
+    """
+    if not match_fingerprint:
+        return None
+    return _cache.get(f"{match_id}:{match_fingerprint}")
+
+
+def put(match_id, match_fingerprint, analysis, text, saved=True):
+    """
+    Сохраняет прогноз и отформатированный текст
+
+    saved=False - прогноз еще не записан в БД (прогрев), запишется при первой выдаче
+    """
+    if not match_fingerprint or not analysis or analysis.get("error"):
+        return
+    _cache.set(f"{match_id}:{match_fingerprint}", {"analysis": analysis, "text": text, "saved": saved})
+
+
+def get_or_build(match_id, match_data, snapshot, home_id=None, away_id=None, league=None, save_to_db=True):
+    """
+    Текст прогноза матча: из кэша или после сбора данных и расчета
+
+    Args:
+        match_id: ID матча
+        match_data: Данные матча (fixture, league, teams)
+        snapshot: StandingsSnapshot турнира (None - кэш не используется)
+        home_id: ID хозяев в Football-Data.org (если есть)
+        away_id: ID гостей в Football-Data.org (если есть)
+        league: Название лиги (если снимка нет)
+        save_to_db: Записать прогноз в БД (False - для прогрева)
+
+    Returns:
+        str: Отформатированный анализ матча
+    """
+    teams = match_data.get("teams", {})
+    home_team = teams.get("home", {}).get("name", "")
+    away_team = teams.get("away", {}).get("name", "")
+
+    match_fingerprint = fingerprint(match_data, snapshot, home_id, away_id)
+    cached = get(match_id, match_fingerprint)
+
+    if cached:
+        print(f"[Prediction Cache] Готовый прогноз: {home_team} vs {away_team}")
+        if save_to_db and not cached.get("saved"):
+            try:
+                from modules.database import save_prediction
+                analysis = cached["analysis"]
+                save_prediction(match_data, analysis, analysis.get("ml_factors", {}))
+                put(match_id, match_fingerprint, analysis, cached["text"], saved=True)
+            except Exception as e:
+                print(f"⚠️ Не удалось сохранить прогноз в БД: {e}")
+        return cached["text"]
+
+    started = time.monotonic()
+    
+    # Собираем дополнительные данные
+    if snapshot:
+        enriched_data = enrich_match_data(
+            home_team, away_team, league,
+            snapshot=snapshot,
+            home_id=home_id,
+            away_id=away_id,
+            include_h2h=False  # H2H требует отдельного запроса, пропускаем для оптимизации
+        )
+    else:
+        enriched_data = enrich_match_data(home_team, away_team, league)
+
+    sport_api_data = {}  # Отключаем SportAPI пока нет ключа
+
+    # Генерируем детальный прогноз (сохраняется в БД внутри, если save_to_db)
+    analysis = generate_predictions_ultra(match_data, enriched_data, sport_api_data, save_to_db=save_to_db)
+
+    # Форматируем и запоминаем для следующих запросов
+    text = format_match_analysis(match_data, analysis)
+    put(match_id, match_fingerprint, analysis, text, saved=save_to_db)
+    cache_registry.record_load("predictions", time.monotonic() - started)
+    return text
+
+
+def get_stats():
+    """Счетчики кэша прогнозов"""
+    return _cache.get_stats()
@@ -1,5 +1,8 @@
+from functools import lru_cache
 from statistics import mean
 
+from modules import cache_registry, team_index
+
 # 🏆 РЕЙТИНГ ЛИГ - коэффициент класса лиги
 # Топ-5 лиги Европы имеют более высокий коэффициент
 LEAGUE_CLASS_MULTIPLIER = {
@@ -29,83 +32,7 @@ LEAGUE_CLASS_MULTIPLIER = {
     "default": 1.00
 }
 
-# 🌟 ИЗВЕСТНЫЕ ТОП-КЛУБЫ И ИХ ЛИГИ
-# Используется для определения класса команды в европейских турнирах
-TEAM_LEAGUES = {
-    # Испания (La Liga)
-    "Real Madrid": "La Liga",
-    "Barcelona": "La Liga",
-    "Atletico Madrid": "La Liga",
-    "Athletic Club": "La Liga",
-    "Real Sociedad": "La Liga",
-    "Villarreal": "La Liga",
-    "Sevilla": "La Liga",
-    "Real Betis": "La Liga",
-    
-    # Англия (Premier League)
-    "Manchester City": "Premier League",
-    "Liverpool": "Premier League",
-    "Arsenal": "Premier League",
-    "Manchester United": "Premier League",
-    "Chelsea": "Premier League",
-    "Tottenham": "Premier League",
-    "Newcastle": "Premier League",
-    "Aston Villa": "Premier League",
-    
-    # Италия (Serie A)
-    "Inter": "Serie A",
-    "AC Milan": "Serie A",
-    "Juventus": "Serie A",
-    "Napoli": "Serie A",
-    "Roma": "Serie A",
-    "Lazio": "Serie A",
-    "Atalanta": "Serie A",
-    
-    # Германия (Bundesliga)
-    "Bayern Munich": "Bundesliga",
-    "Borussia Dortmund": "Bundesliga",
-    "RB Leipzig": "Bundesliga",
-    "Bayer Leverkusen": "Bundesliga",
-    "Frankfurt": "Bundesliga",
-    
-    # Франция (Ligue 1)
-    "PSG": "Ligue 1",
-    "Monaco": "Ligue 1",
-    "Marseille": "Ligue 1",
-    "Lyon": "Ligue 1",
-    "Lille": "Ligue 1",
-    
-    # Португалия (Primeira Liga)
-    "Benfica": "Primeira Liga",
-    "Porto": "Primeira Liga",
-    "Sporting CP": "Primeira Liga",
-    
-    # Нидерланды (Eredivisie)
-    "Ajax": "Eredivisie",
-    "PSV": "Eredivisie",
-    "Feyenoord": "Eredivisie",
-    
-    # Греция (Greek Super League)
-    "Olympiakos Piraeus": "Greek Super League",
-    "Olympiacos": "Greek Super League",
-    "Panathinaikos": "Greek Super League",
-    "AEK Athens": "Greek Super League",
-    
-    # Другие
-    "Celtic": "Premiership",
-    "Rangers": "Premiership",
-    "Galatasaray": "Super Lig",
-    "Fenerbahce": "Super Lig",
-}
-
-# ⭐ ЭЛИТНЫЕ КЛУБЫ - получают дополнительный бонус
-# Это самые титулованные клубы Европы
-ELITE_CLUBS = [
-    "Real Madrid", "Barcelona", "Bayern Munich", "Manchester City", 
-    "Liverpool", "PSG", "Inter", "AC Milan", "Juventus", 
-    "Chelsea", "Manchester United", "Arsenal", "Atletico Madrid",
-    "Borussia Dortmund", "Benfica", "Porto"
-]
+# 🌟 Лиги и элитный статус клубов - в modules/team_index.py (TEAMS)
 
 
 def is_elite_club(team_name):
@@ -118,16 +45,8 @@ def is_elite_club(team_name):
     Returns:
         bool: True если команда элитная
     """
-    if not team_name:
-        return False
-    
-    team_name_lower = team_name.lower()
-    
-    for elite in ELITE_CLUBS:
-        if elite.lower() in team_name_lower or team_name_lower in elite.lower():
-            return True
-    
-    return False
+    team = team_index.lookup(team_name)
+    return bool(team and team.elite)
 
 
 def get_team_league(team_name):
@@ -140,19 +59,11 @@ def get_team_league(team_name):
     Returns:
         str: Название лиги или пустая строка
     """
-    if not team_name:
-        return ""
-    
-    # Поиск команды в словаре (частичное совпадение)
-    team_name_lower = team_name.lower()
-    
-    for team, league in TEAM_LEAGUES.items():
-        if team.lower() in team_name_lower or team_name_lower in team.lower():
-            return league
-    
-    return ""
+    team = team_index.lookup(team_name)
+    return (team.league or "") if team else ""
 
 
+@lru_cache(maxsize=256)
 def get_league_class_multiplier(league_name):
     """
     Получить коэффициент класса лиги
@@ -166,7 +77,11 @@ def get_league_class_multiplier(league_name):
     if not league_name:
         return 1.0
     
-    # Поиск лиги (частичное совпадение для гибкости)
+    # Точное совпадение
+    if league_name in LEAGUE_CLASS_MULTIPLIER:
+        return LEAGUE_CLASS_MULTIPLIER[league_name]
+    
+    # Поиск лиги (частичное совпадение для гибкости, результат запоминается)
     league_name_lower = league_name.lower()
     
     for league, multiplier in LEAGUE_CLASS_MULTIPLIER.items():
@@ -177,6 +92,9 @@ def get_league_class_multiplier(league_name):
     return LEAGUE_CLASS_MULTIPLIER["default"]
 
 
+cache_registry.register_lru("league_multiplier", get_league_class_multiplier)
+
+
 def analyze_h2h_matches(h2h_matches, home_team, away_team):
     """
     Детальный анализ последних встреч между командами
@@ -641,7 +559,7 @@ def calculate_cards_prediction(home_position=None, away_position=None, total_tea
     return round(total_cards, 1)
 
 
-def generate_predictions_ultra(match_data, enriched_data=None, sport_api_data=None, weather_data=None, injuries_data=None, halftime_data=None, playstyle_data=None, value_bet_data=None):
+def generate_predictions_ultra(match_data, enriched_data=None, sport_api_data=None, weather_data=None, injuries_data=None, halftime_data=None, playstyle_data=None, value_bet_data=None, save_to_db=True):
     """
     Максимально детальные прогнозы с использованием всех доступных API:
     - API-Football (базовая статистика)
@@ -652,6 +570,9 @@ def generate_predictions_ultra(match_data, enriched_data=None, sport_api_data=No
     - Halftime stats (анализ голов по таймам)
     - Playstyle analysis (стиль игры команд)
     - Value bet analysis (сравнение с букмекерскими коэффициентами)
+    
+    save_to_db=False - не сохранять прогноз в БД (прогрев кэша прогнозов);
+    факторы для последующего сохранения лежат в predictions["ml_factors"]
     """
     if not match_data:
         return {"error": "Нет данных для анализа"}
@@ -661,8 +582,6 @@ def generate_predictions_ultra(match_data, enriched_data=None, sport_api_data=No
     away = teams.get("away", {}).get("name", "Away Team")
     home_id = teams.get("home", {}).get("id")
     away_id = teams.get("away", {}).get("id")
-    stats = match_data.get("statistics", [])
-    lineups = match_data.get("lineups", [])
 
     # Данные из Football-Data.org
     home_form = ""
@@ -1204,37 +1123,35 @@ def generate_predictions_ultra(match_data, enriched_data=None, sport_api_data=No
     else:
         predictions["value_bets"] = []
     
+    # 🎯 КРИТИЧНО: Сохраняем ОРИГИНАЛЬНЫЕ факторы ДО применения ML весов
+    # Это позволяет AI анализировать чистые данные и правильно обучаться
+    factors = {
+        "home_attack": home_attack,  # Итоговая атака (после всех факторов)
+        "away_attack": away_attack,
+        "h2h_factor_home": original_h2h_factor_home,  # ОРИГИНАЛЬНЫЕ факторы
+        "h2h_factor_away": original_h2h_factor_away,
+        "home_motivation": original_home_motivation,
+        "away_motivation": original_away_motivation,
+        "home_streak_factor": original_home_streak_factor,
+        "away_streak_factor": original_away_streak_factor,
+        # Новые факторы для ML
+        "weather_adjustment": weather_adjustment,
+        "injuries_home_count": injuries_home_count,
+        "injuries_away_count": injuries_away_count,
+        "halftime_adjustment": halftime_adjustment,
+        "playstyle_adjustment_home": playstyle_adjustment_home,
+        "playstyle_adjustment_away": playstyle_adjustment_away
+    }
+    # Факторы остаются в прогнозе, чтобы его можно было сохранить позже (прогрев кэша)
+    predictions["ml_factors"] = factors
+    
     # 🆕 СОХРАНЕНИЕ ПРОГНОЗА В БАЗУ ДАННЫХ ДЛЯ ML
-    try:
-        from modules.database import save_prediction
-        
-        # Получаем веса ML модели
-        from modules.database import get_ml_weights
-        ml_weights = get_ml_weights()
-        
-        # 🎯 КРИТИЧНО: Сохраняем ОРИГИНАЛЬНЫЕ факторы ДО применения ML весов
-        # Это позволяет AI анализировать чистые данные и правильно обучаться
-        factors = {
-            "home_attack": home_attack,  # Итоговая атака (после всех факторов)
-            "away_attack": away_attack,
-            "h2h_factor_home": original_h2h_factor_home,  # ОРИГИНАЛЬНЫЕ факторы
-            "h2h_factor_away": original_h2h_factor_away,
-            "home_motivation": original_home_motivation,
-            "away_motivation": original_away_motivation,
-            "home_streak_factor": original_home_streak_factor,
-            "away_streak_factor": original_away_streak_factor,
-            # Новые факторы для ML
-            "weather_adjustment": weather_adjustment,
-            "injuries_home_count": injuries_home_count,
-            "injuries_away_count": injuries_away_count,
-            "halftime_adjustment": halftime_adjustment,
-            "playstyle_adjustment_home": playstyle_adjustment_home,
-            "playstyle_adjustment_away": playstyle_adjustment_away
-        }
-        
-        save_prediction(match_data, predictions, factors)
-    except Exception as e:
-        print(f"⚠️ Не удалось сохранить прогноз для ML: {e}")
+    if save_to_db:
+        try:
+            from modules.database import save_prediction
+            save_prediction(match_data, predictions, factors)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить прогноз для ML: {e}")
 
     return predictions
 
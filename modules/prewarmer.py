@@ -0,0 +1,95 @@
+"""
+Прогрев кэша прогнозов на ближайшие 48 часов
+
+Фоновый поток бота раз в PREWARM_INTERVAL секунд проходит по всем
+TOURNAMENTS: один запрос матчей и один снимок таблиц на турнир, затем
+прогноз и готовый текст для каждого матча. analyze_single_match после этого
+сводится к поиску в кэше и отправке сообщения.
+"""
+import os
+import threading
+import time
+
+from modules import prediction_cache
+from modules.football_data_fetcher import LEAGUE_ID_TO_CODE, get_standings_snapshot, get_upcoming_match_data
+from modules.rate_limiter import PRIORITY_BACKGROUND, request_priority
+from modules.tournaments import TOURNAMENTS
+
+PREWARM_HOURS = int(os.getenv("PREWARM_HOURS", "48"))
+# Чаще, чем истекает PREDICTION_CACHE_TTL, чтобы прогнозы не выпадали из кэша
+PREWARM_INTERVAL = int(os.getenv("PREWARM_INTERVAL", "1800"))
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1").lower() not in ("0", "false", "no")
+
+stats = {"runs": 0, "matches": 0, "errors": 0, "last_run_seconds": None}
+
+_thread = None
+
+
+def prewarm_once(hours_ahead=PREWARM_HOURS):
+    """
+    Считает прогнозы всех матчей ближайших hours_ahead часов
+
+    Прогнозы не записываются в БД: это произойдет при первой выдаче пользователю.
+
+    Returns:
+        int: Количество подготовленных прогнозов
+    """
+    started = time.monotonic()
+    prepared = 0
+
+    # Прогрев не должен отнимать лимит API у пользователей
+    with request_priority(PRIORITY_BACKGROUND):
+        for tournament_id, info in TOURNAMENTS.items():
+            api_league_id = info.get("league_id")
+            try:
+                matches = get_upcoming_match_data(api_league_id, hours_ahead=hours_ahead)
+                if not matches:
+                    continue
+
+                # Входные данные турнира загружаются один раз на все матчи
+                snapshot = get_standings_snapshot(LEAGUE_ID_TO_CODE.get(api_league_id))
+
+                for data in matches:
+                    teams = data.get("teams", {})
+                    try:
+                        prediction_cache.get_or_build(
+                            data["fixture"]["id"], data, snapshot,
+                            home_id=teams.get("home", {}).get("id"),
+                            away_id=teams.get("away", {}).get("id"),
+                            league=data.get("league", {}).get("name"),
+                            save_to_db=False
+                        )
+                        prepared += 1
+                    except Exception as e:
+                        stats["errors"] += 1
+                        print(f"[Prewarm] Ошибка прогноза матча {data.get('fixture', {}).get('id')}: {e}")
+            except Exception as e:
+                stats["errors"] += 1
+                print(f"[Prewarm] Ошибка турнира {tournament_id}: {e}")
+
+    elapsed = time.monotonic() - started
+    stats["runs"] += 1
+    stats["matches"] = prepared
+    stats["last_run_seconds"] = round(elapsed, 1)
+    print(f"[Prewarm] Подготовлено прогнозов: {prepared} за {elapsed:.0f}с")
+    return prepared
+
+
+def _loop():
+    while True:
+        try:
+            prewarm_once()
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"[Prewarm] Ошибка прогрева: {e}")
+        time.sleep(PREWARM_INTERVAL)
+
+
+def start_prewarmer():
+    """Запускает фоновый прогрев (один поток на процесс)"""
+    global _thread
+    if not PREWARM_ENABLED or _thread is not None:
+        return
+    _thread = threading.Thread(target=_loop, name="prediction-prewarmer", daemon=True)
+    _thread.start()
+    print(f"[Prewarm] Запущен: горизонт {PREWARM_HOURS}ч, интервал {PREWARM_INTERVAL}с")
@@ -0,0 +1,205 @@
+"""
+Центральный планировщик запросов к API с лимитами (token bucket)
+
+Запросы делятся на классы приоритета:
+- PRIORITY_INTERACTIVE - запросы из обработчиков бота (меню, анализ матча)
+- PRIORITY_BACKGROUND - фоновые задачи (scheduler, загрузка истории)
+
+Интерактивные запросы всегда обслуживаются первыми. Фоновые запросы
+не трогают резерв токенов и заполняют оставшуюся квоту вместо слепого sleep().
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Сколько ждет интерактивный запрос, прежде чем сдаться (секунды)
+INTERACTIVE_MAX_WAIT = float(os.getenv("RATE_LIMIT_INTERACTIVE_WAIT", "20"))
+
+
+class TokenBucket:
+    """
+    Token bucket с очередью ожидания по приоритетам
+
+    Args:
+        rate: Количество запросов за период
+        per: Длина периода в секундах
+        reserve: Сколько токенов держать только для интерактивных запросов
+    """
+
+    def __init__(self, rate, per, reserve=0):
+        self.capacity = float(rate)
+        self.refill_per_second = float(rate) / float(per)
+        self.reserve = min(float(reserve), self.capacity - 1)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"granted": 0, "timeouts": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def _refill(self, now):
+        if now <= self._last_refill:
+            return
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_per_second)
+        self._last_refill = now
+
+    def _needed(self, priority):
+        # Фоновые запросы не могут опустошить резерв интерактивных
+        if priority == PRIORITY_INTERACTIVE:
+            return 1.0
+        return 1.0 + self.reserve
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Ждет свободный токен с учетом приоритета
+
+        Args:
+            priority: Класс приоритета запроса
+            timeout: Максимальное время ожидания (None - без ограничения)
+
+        Returns:
+            bool: True если токен получен, False по таймауту
+        """
+        started = time.monotonic()
+        deadline = started + timeout if timeout is not None else None
+
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    needed = self._needed(priority)
+
+                    if self._waiters[0] == ticket and self._tokens >= needed:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1.0
+                        self.stats["granted"] += 1
+                        self.stats["wait_seconds"] += now - started
+                        self._cond.notify_all()
+                        return True
+
+                    if deadline is not None and now >= deadline:
+                        self._waiters.remove(ticket)
+                        heapq.heapify(self._waiters)
+                        self.stats["timeouts"] += 1
+                        self._cond.notify_all()
+                        return False
+
+                    # Время до появления нужного количества токенов
+                    if self._last_refill > now:
+                        wait = self._last_refill - now
+                    else:
+                        wait = max(needed - self._tokens, 0.0) / self.refill_per_second
+                    wait = max(wait, 0.05)
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            except BaseException:
+                if ticket in self._waiters:
+                    self._waiters.remove(ticket)
+                    heapq.heapify(self._waiters)
+                    self._cond.notify_all()
+                raise
+
+    def penalize(self, retry_after):
+        """Сервер ответил 429: обнуляем токены и замораживаем пополнение"""
+        with self._cond:
+            self._tokens = 0.0
+            self._last_refill = max(self._last_refill, time.monotonic() + retry_after)
+            self.stats["throttled"] += 1
+            self._cond.notify_all()
+
+    def observe(self, available):
+        """Синхронизирует bucket с остатком квоты, который сообщил сервер"""
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, float(available))
+
+
+# Лимиты по хостам
+_buckets = {}
+
+_context = threading.local()
+
+
+def register_limit(host, rate, per, reserve=0):
+    """
+    Регистрирует лимит запросов для хоста
+
+    Args:
+        host: Хост API (например, "api.football-data.org")
+        rate: Количество запросов за период
+        per: Период в секундах
+        reserve: Резерв токенов для интерактивных запросов
+    """
+    _buckets[host] = TokenBucket(rate, per, reserve)
+
+
+def get_bucket(host):
+    """Возвращает TokenBucket хоста или None если лимита нет"""
+    return _buckets.get(host)
+
+
+def current_priority():
+    """Приоритет запросов текущего потока (по умолчанию интерактивный)"""
+    return getattr(_context, "priority", PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Устанавливает приоритет для всех запросов внутри блока
+
+    Пример:
+        with request_priority(PRIORITY_BACKGROUND):
+            notify_subscribers()
+    """
+    previous = getattr(_context, "priority", None)
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _context.priority
+        else:
+            _context.priority = previous
+
+
+def acquire(host, priority=None):
+    """
+    Ждет разрешения на запрос к хосту
+
+    Returns:
+        bool: True если можно отправлять запрос (или лимита для хоста нет)
+    """
+    bucket = _buckets.get(host)
+    if bucket is None:
+        return True
+
+    if priority is None:
+        priority = current_priority()
+    timeout = INTERACTIVE_MAX_WAIT if priority == PRIORITY_INTERACTIVE else None
+    return bucket.acquire(priority, timeout=timeout)
+
+
+def get_stats():
+    """Статистика по всем лимитам: {host: {...}}"""
+    return {host: dict(bucket.stats) for host, bucket in _buckets.items()}
+
+
+# Football-Data.org, бесплатный план: 10 запросов в минуту
+register_limit(
+    "api.football-data.org",
+    rate=int(os.getenv("FOOTBALL_DATA_RATE_LIMIT", "10")),
+    per=60,
+    reserve=int(os.getenv("FOOTBALL_DATA_INTERACTIVE_RESERVE", "2"))
+)
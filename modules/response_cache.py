@@ -0,0 +1,385 @@
+"""
+Персистентный кэш ответов внешних API (SQLite файл)
+
+Общий для всех процессов на одной машине (main.py, scheduler.py, загрузчик),
+переживает перезапуски. Время жизни задается по эндпоинтам (TTL_RULES),
+размер ограничен API_CACHE_MAX_ENTRIES с вытеснением давно не читанных записей.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from modules import cache_registry, single_flight
+
+CACHE_PATH = os.getenv("API_CACHE_PATH", "api_cache.sqlite3")
+MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "5000"))
+CACHE_DISABLED = os.getenv("API_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+# Как часто (в записях) проверять размер кэша
+EVICT_EVERY = 50
+
+# accessed_at обновляется не чаще раза в столько секунд: чтение не должно быть записью
+ACCESS_TOUCH_INTERVAL = 60
+
+# Сколько хранить устаревшую запись с ETag/Last-Modified для условного запроса
+STALE_RETENTION = int(os.getenv("API_CACHE_STALE_RETENTION", "86400"))
+
+FOREVER = None
+FINISHED_STATUSES = ("FT", "AET", "PEN", "FINISHED", "AWARDED")
+
+
+def _football_data_match_ttl(endpoint, params, payload):
+    """Завершенный матч не меняется - храним бессрочно"""
+    if payload.get("status") in FINISHED_STATUSES:
+        return FOREVER
+    return 300
+
+
+def _api_football_fixtures_ttl(endpoint, params, payload):
+    """Конкретные матчи по id: завершенные - навсегда, остальные коротко"""
+    params = params or {}
+    if "id" not in params and "ids" not in params:
+        return 600
+    fixtures = payload.get("response", [])
+    if fixtures and all(
+        f.get("fixture", {}).get("status", {}).get("short") in FINISHED_STATUSES
+        for f in fixtures
+    ):
+        return FOREVER
+    return 120
+
+
+def _lineups_ttl(endpoint, params, payload):
+    """Составы публикуются за час до матча - пустой ответ живет совсем недолго"""
+    return 300 if payload.get("response") else 120
+
+
+# TTL по эндпоинтам: (namespace, regex эндпоинта, секунды | функция | FOREVER)
+# Первое совпадение выигрывает; эндпоинты без правила не кэшируются
+TTL_RULES = [
+    # Football-Data.org
+    ("football-data", r"^/competitions/[^/]+/standings$", 600),
+    ("football-data", r"^/competitions/[^/]+/scorers$", 3600),
+    ("football-data", r"^/competitions/[^/]+/matches$", 600),
+    ("football-data", r"^/matches/\d+$", _football_data_match_ttl),
+    ("football-data", r"^/teams/\d+/matches$", 1800),
+    ("football-data", r"^/matches$", 300),
+    # API-Football
+    ("api-football", r"^/fixtures/lineups$", _lineups_ttl),
+    ("api-football", r"^/fixtures/statistics$", 300),
+    ("api-football", r"^/fixtures/rounds$", 86400),
+    ("api-football", r"^/fixtures$", _api_football_fixtures_ttl),
+    ("api-football", r"^/teams/statistics$", 3600),
+    ("api-football", r"^/injuries$", 1800),
+    ("api-football", r"^/teams$", 86400),
+    ("api-football", r"^/odds$", 600),
+    # the-odds-api: вся лента коэффициентов (см. odds_snapshot)
+    ("the-odds-api", r"^/v4/sports/[^/]+/odds$", 600),
+    # OpenWeatherMap: координаты города не меняются, прогноз - корзинами по 3 часа
+    ("openweather", r"^/geo/1\.0/direct$", FOREVER),
+    ("openweather", r"^/data/2\.5/forecast$", 3 * 3600),
+]
+
+_compiled_rules = [(ns, re.compile(pattern), ttl) for ns, pattern, ttl in TTL_RULES]
+
+_local = threading.local()
+_writes = 0
+_writes_lock = threading.Lock()
+
+stats = {
+    "hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bypassed": 0,
+    # Условные запросы: 304 вместо полного ответа и сэкономленный объем
+    "revalidated": 0, "not_modified": 0, "bytes_saved": 0
+}
+
+
+def _connect():
+    """SQLite соединение текущего потока"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        # Валидаторы для условных запросов (колонки добавлены позже - дополняем старые файлы)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE responses ADD COLUMN {column} TEXT")
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def make_key(namespace, endpoint, params=None):
+    """Стабильный ключ кэша из эндпоинта и параметров"""
+    raw = json.dumps([namespace, endpoint, params or {}], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def ttl_for(namespace, endpoint, params, payload):
+    """
+    Время жизни ответа по правилам TTL_RULES
+
+    Returns:
+        int | None: Секунды, None - бессрочно, 0 - не кэшировать
+    """
+    for ns, pattern, ttl in _compiled_rules:
+        if ns == namespace and pattern.match(endpoint):
+            return ttl(endpoint, params, payload) if callable(ttl) else ttl
+    return 0
+
+
+def is_bypassed():
+    """Кэш отключен глобально или для текущего потока"""
+    return CACHE_DISABLED or getattr(_local, "bypass", False)
+
+
+@contextmanager
+def bypass_cache():
+    """Все запросы внутри блока идут напрямую в API (ответы все равно сохраняются)"""
+    previous = getattr(_local, "bypass", False)
+    _local.bypass = True
+    try:
+        yield
+    finally:
+        _local.bypass = previous
+
+
+def _get_entry(key):
+    """Запись кэша (в том числе устаревшая): (payload, expires_at, etag, last_modified)"""
+    return _connect().execute(
+        "SELECT payload, expires_at, etag, last_modified FROM responses WHERE key = ?", (key,)
+    ).fetchone()
+
+
+def get_cached(key):
+    """Возвращает сохраненный ответ или None если его нет или он устарел"""
+    try:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT payload, expires_at, accessed_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or (row[1] is not None and row[1] < now):
+            stats["misses"] += 1
+            return None
+        payload = json.loads(row[0])
+    except Exception as e:
+        print(f"[Response Cache] Ошибка чтения: {e}")
+        return None
+
+    stats["hits"] += 1
+    # Время чтения нужно только для вытеснения - достаточно точности ACCESS_TOUCH_INTERVAL.
+    # Ошибка этой записи (файл занят другим процессом) не превращает попадание в промах
+    if now - row[2] > ACCESS_TOUCH_INTERVAL:
+        try:
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        except Exception as e:
+            print(f"[Response Cache] Ошибка обновления времени чтения: {e}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+    return payload
+
+
+def store(key, namespace, endpoint, payload, ttl, etag=None, last_modified=None):
+    """Сохраняет ответ; ttl=None - бессрочно, ttl=0 - не сохранять"""
+    global _writes
+    if ttl == 0:
+        return
+    now = time.time()
+    expires_at = None if ttl is FOREVER else now + ttl
+    try:
+        conn = _connect()
+        conn.execute("""
+            INSERT OR REPLACE INTO responses
+                (key, namespace, endpoint, payload, created_at, expires_at, accessed_at,
+                 etag, last_modified)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (key, namespace, endpoint, json.dumps(payload), now, expires_at, now,
+              etag, last_modified))
+        conn.commit()
+        stats["stores"] += 1
+    except Exception as e:
+        print(f"[Response Cache] Ошибка записи: {e}")
+        return
+
+    with _writes_lock:
+        _writes += 1
+        should_evict = _writes % EVICT_EVERY == 0
+    if should_evict:
+        evict()
+
+
+def _refresh(key, ttl):
+    """Продлевает запись после ответа 304 Not Modified"""
+    now = time.time()
+    expires_at = None if ttl is FOREVER else now + ttl
+    try:
+        conn = _connect()
+        conn.execute(
+            "UPDATE responses SET expires_at = ?, accessed_at = ? WHERE key = ?",
+            (expires_at, now, key)
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"[Response Cache] Ошибка продления: {e}")
+
+
+def evict():
+    """Удаляет устаревшие записи и самые давно читанные сверх MAX_ENTRIES"""
+    try:
+        conn = _connect()
+        # Устаревшие записи с валидаторами живут дольше - для условных запросов
+        now = time.time()
+        cur = conn.execute("""
+            DELETE FROM responses
+            WHERE expires_at IS NOT NULL
+            AND (expires_at < ? OR (etag IS NULL AND last_modified IS NULL AND expires_at < ?))
+        """, (now - STALE_RETENTION, now))
+        removed = cur.rowcount
+        cur = conn.execute("""
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses
+                ORDER BY accessed_at DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (MAX_ENTRIES,))
+        removed += cur.rowcount
+        conn.commit()
+        stats["evictions"] += removed
+    except Exception as e:
+        print(f"[Response Cache] Ошибка очистки: {e}")
+
+
+def _validator_headers(entry):
+    """Заголовки условного запроса по сохраненной записи"""
+    headers = {}
+    if entry is None:
+        return headers
+    if entry[2]:
+        headers["If-None-Match"] = entry[2]
+    if entry[3]:
+        headers["If-Modified-Since"] = entry[3]
+    return headers
+
+
+def _conditional_fetch(key, namespace, endpoint, params, fetch):
+    """
+    Запрос с If-None-Match / If-Modified-Since по устаревшей записи
+
+    Ответ 304 продлевает сохраненную запись без загрузки тела.
+    """
+    try:
+        entry = _get_entry(key)
+    except Exception as e:
+        print(f"[Response Cache] Ошибка чтения: {e}")
+        entry = None
+    validators = _validator_headers(entry)
+    if validators:
+        stats["revalidated"] += 1
+
+    response = fetch(validators)
+
+    if response.status_code == 304 and entry is not None:
+        payload = json.loads(entry[0])
+        stats["not_modified"] += 1
+        stats["bytes_saved"] += len(entry[0])
+        _refresh(key, ttl_for(namespace, endpoint, params, payload))
+        print(f"[Response Cache] 304 {endpoint}: сэкономлено {len(entry[0]) // 1024} КБ")
+        return payload
+
+    response.raise_for_status()
+    payload = response.json()
+    if payload and not (isinstance(payload, dict) and payload.get("errors")):
+        store(key, namespace, endpoint, payload, ttl_for(namespace, endpoint, params, payload),
+              etag=response.headers.get("ETag"),
+              last_modified=response.headers.get("Last-Modified"))
+    return payload
+
+
+def cached_request(namespace, endpoint, params, fetch, use_cache=True, conditional=False):
+    """
+    Возвращает ответ из кэша или вызывает fetch() и сохраняет результат
+    
+    Одновременные промахи по одному ключу объединяются: fetch() выполняется
+    один раз, остальные вызовы получают его ответ.
+    
+    Args:
+        namespace: Провайдер API ("football-data", "api-football")
+        endpoint: Эндпоинт (например, "/competitions/PL/standings")
+        params: Query параметры
+        fetch: Функция без аргументов, возвращающая распарсенный JSON.
+            При conditional=True - fetch(headers), возвращающая requests.Response
+            (headers - заголовки If-None-Match / If-Modified-Since)
+        use_cache: False - не читать кэш (ответ все равно сохраняется)
+        conditional: Использовать ETag / Last-Modified устаревшей записи
+    
+    Returns:
+        dict | list: Ответ API
+    """
+    key = make_key(namespace, endpoint, params)
+    if use_cache and not is_bypassed():
+        cached = get_cached(key)
+        if cached is not None:
+            return cached
+    else:
+        stats["bypassed"] += 1
+
+    def load():
+        with cache_registry.timed("api_responses"):
+            return _load()
+
+    def _load():
+        if conditional:
+            return _conditional_fetch(key, namespace, endpoint, params, fetch)
+        payload = fetch()
+        # Не кэшируем пустые ответы ({}, [], None) и ответы с ошибками API.
+        # Конверт без данных ({"response": []}) сохраняется - TTL_RULES задают ему короткий срок
+        if payload and not (isinstance(payload, dict) and payload.get("errors")):
+            store(key, namespace, endpoint, payload, ttl_for(namespace, endpoint, params, payload))
+        return payload
+
+    return single_flight.do(key, load)
+
+
+def clear(namespace=None):
+    """Очищает кэш (целиком или для одного провайдера)"""
+    conn = _connect()
+    if namespace:
+        conn.execute("DELETE FROM responses WHERE namespace = ?", (namespace,))
+    else:
+        conn.execute("DELETE FROM responses")
+    conn.commit()
+
+
+def get_stats():
+    """Счетчики кэша ответов и количество записей в файле"""
+    try:
+        entries = _connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    except Exception:
+        entries = None
+    return dict(stats, entries=entries)
+
+
+cache_registry.register("api_responses", get_stats)
+cache_registry.register("single_flight", single_flight.get_stats)
@@ -2,97 +2,84 @@
 Модуль для проверки и обновления результатов завершенных матчей
 """
 import os
-import requests
-from modules.database import get_unverified_predictions, update_match_result
+from modules.data_fetcher import get_match_results_bulk, MATCH_IDS_PER_REQUEST
+from modules.database import get_unverified_predictions, update_match_results_bulk
 
-API_KEY = os.getenv("API_FOOTBALL_KEY")
-API_BASE_URL = "https://v3.football.api-sports.io"
+# Матч длится ~105 минут с перерывом - раньше проверять результат нет смысла
+VERIFY_MIN_AGE_MINUTES = int(os.getenv("VERIFY_MIN_AGE_MINUTES", "110"))
 
 
-def verify_match_results():
+def verify_match_results(limit=50):
     """
     Проверяет результаты всех непроверенных матчей
     
+    Результаты запрашиваются пачками по MATCH_IDS_PER_REQUEST матчей,
+    все найденные счета записываются в базу одной транзакцией.
+    
+    Args:
+        limit: Максимальное количество проверяемых прогнозов
+    
     Returns:
         dict: Статистика обновлений
     """
-    predictions = get_unverified_predictions(limit=50)
+    predictions = get_unverified_predictions(limit=limit, min_age_minutes=VERIFY_MIN_AGE_MINUTES)
     
     if not predictions:
         print("Нет непроверенных матчей")
         return {"total": 0, "updated": 0, "failed": 0}
     
-    print(f"Найдено {len(predictions)} непроверенных матчей")
+    requests_count = -(-len(predictions) // MATCH_IDS_PER_REQUEST)
+    print(f"Найдено {len(predictions)} непроверенных матчей ({requests_count} запросов к API)")
+    
+    try:
+        results = get_match_results_bulk([pred['match_id'] for pred in predictions])
+    except Exception as e:
+        print(f"Ошибка получения результатов: {e}")
+        return {"total": len(predictions), "updated": 0, "failed": len(predictions)}
     
-    updated = 0
+    outcomes = []
     failed = 0
     
     for pred in predictions:
-        try:
-            match_id = pred['match_id']
-            
-            # Получаем результат матча через API
-            headers = {
-                'x-apisports-key': API_KEY
-            }
-            
-            response = requests.get(
-                f"{API_BASE_URL}/fixtures",
-                headers=headers,
-                params={"id": match_id},
-                timeout=10
-            )
-            
-            if response.status_code != 200:
-                print(f"Ошибка API для матча {match_id}: {response.status_code}")
-                failed += 1
-                continue
-            
-            data = response.json()
-            
-            if not data.get('response'):
-                print(f"Нет данных для матча {match_id}")
-                failed += 1
-                continue
-            
-            match = data['response'][0]
-            fixture = match.get('fixture', {})
-            status = fixture.get('status', {}).get('short', '')
-            
-            # Проверяем что матч завершен
-            if status not in ['FT', 'AET', 'PEN']:
-                print(f"Матч {match_id} еще не завершен (статус: {status})")
-                continue
-            
-            # Получаем счет
-            goals = match.get('goals', {})
-            home_goals = goals.get('home')
-            away_goals = goals.get('away')
-            
-            if home_goals is None or away_goals is None:
-                print(f"Нет счета для матча {match_id}")
-                failed += 1
-                continue
-            
-            # Обновляем результат в базе
-            success = update_match_result(
-                prediction_id=pred['id'],
-                home_team=pred['home_team'],
-                away_team=pred['away_team'],
-                actual_home_goals=home_goals,
-                actual_away_goals=away_goals,
-                predicted_result=pred['predicted_result']
-            )
-            
-            if success:
-                print(f"✅ Обновлен результат: {pred['home_team']} {home_goals}:{away_goals} {pred['away_team']}")
-                updated += 1
-            else:
-                failed += 1
-                
-        except Exception as e:
-            print(f"Ошибка обработки матча {pred.get('match_id')}: {e}")
+        match_id = pred['match_id']
+        result = results.get(str(match_id))
+        
+        if result is None:
+            print(f"Нет данных для матча {match_id}")
             failed += 1
+            continue
+        
+        # Проверяем что матч завершен
+        if not result.get('finished'):
+            print(f"Матч {match_id} еще не завершен (статус: {result.get('status')})")
+            continue
+        
+        home_goals = result.get('home_goals')
+        away_goals = result.get('away_goals')
+        
+        if home_goals is None or away_goals is None:
+            print(f"Нет счета для матча {match_id}")
+            failed += 1
+            continue
+        
+        outcomes.append({
+            'prediction_id': pred['id'],
+            'home_team': pred['home_team'],
+            'away_team': pred['away_team'],
+            'actual_home_goals': home_goals,
+            'actual_away_goals': away_goals,
+            'predicted_result': pred['predicted_result'],
+            'predicted_total': pred.get('predicted_total')
+        })
+    
+    # Все результаты - одной транзакцией
+    updated = update_match_results_bulk(outcomes)
+    failed += len(outcomes) - updated
+    
+    if updated:
+        for outcome in outcomes:
+            print(f"✅ Обновлен результат: {outcome['home_team']} "
+                  f"{outcome['actual_home_goals']}:{outcome['actual_away_goals']} {outcome['away_team']}")
     
     print(f"\n📊 Результаты проверки:")
     print(f"  Всего: {len(predictions)}")
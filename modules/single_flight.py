@@ -0,0 +1,95 @@
+"""
+Объединение одинаковых одновременных запросов (single-flight)
+
+Если несколько потоков одновременно запрашивают один и тот же ресурс,
+в API уходит только один запрос, остальные ждут его и получают тот же ответ.
+
+Интерактивный поток не ждет чужой запрос дольше INTERACTIVE_MAX_WAIT: лидер
+может быть фоновым (SWR обновление, прогрев) и стоять в очереди лимитов
+без ограничения времени - тогда интерактивный поток выполняет запрос сам.
+"""
+import copy
+import threading
+
+from modules.rate_limiter import INTERACTIVE_MAX_WAIT, PRIORITY_INTERACTIVE, current_priority
+
+
+class _Call:
+    """Запрос, который сейчас выполняется"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Группа запросов с общим пространством ключей"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"executed": 0, "coalesced": 0, "wait_timeouts": 0}
+
+    def do(self, key, fn):
+        """
+        Выполняет fn() или ждет уже выполняющийся вызов с тем же ключом
+
+        Args:
+            key: Ключ запроса (эндпоинт + параметры)
+            fn: Функция без аргументов
+
+        Returns:
+            Результат fn(); ожидающие потоки получают свою копию
+            (исключение fn() пробрасывается всем ожидающим)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            self.stats["coalesced"] += 1
+            timeout = INTERACTIVE_MAX_WAIT if current_priority() == PRIORITY_INTERACTIVE else None
+            if not call.done.wait(timeout):
+                # Лидер слишком долго ждет слот - выполняем запрос сами (со своим приоритетом)
+                self.stats["wait_timeouts"] += 1
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        self.stats["executed"] += 1
+        try:
+            result = fn()
+            # Ожидающие копируют снимок, а не объект, который получит (и может изменить) лидер
+            call.result = copy.deepcopy(result)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """Количество выполняющихся сейчас запросов"""
+        with self._lock:
+            return len(self._calls)
+
+
+# Общая группа для запросов к внешним API
+_default = SingleFlight()
+
+
+def do(key, fn):
+    """Выполняет fn() в общей группе (см. SingleFlight.do)"""
+    return _default.do(key, fn)
+
+
+def get_stats():
+    """Статистика общей группы"""
+    return dict(_default.stats, in_flight=_default.in_flight())
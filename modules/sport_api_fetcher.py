@@ -2,9 +2,10 @@
 Модуль для работы с SportDevs Football API (SportAPI)
 Предоставляет обновляемую статистику, информацию о стадионах и игроках
 """
-import requests
 import os
 from datetime import datetime
+from modules.http_client import http_get
+from modules.async_runner import to_async
 
 API_KEY = os.getenv("SPORT_API_KEY")
 API_URL = "https://api.sportdevs.com/v1"
@@ -21,7 +22,7 @@ def _get(endpoint, params=None):
     
     url = f"{API_URL}{endpoint}"
     try:
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
+        response = http_get(url, params=params, headers=HEADERS)
         response.raise_for_status()
         return response.json()
     except Exception as e:
@@ -182,3 +183,11 @@ def enrich_with_sport_api(match_id, home_team_id, away_team_id):
     }
     
     return enriched
+
+
+# Асинхронный интерфейс (те же функции в общем пуле потоков)
+get_match_details_async = to_async(get_match_details)
+get_match_statistics_async = to_async(get_match_statistics)
+get_team_form_async = to_async(get_team_form)
+get_team_recent_performance_async = to_async(get_team_recent_performance)
+enrich_with_sport_api_async = to_async(enrich_with_sport_api)
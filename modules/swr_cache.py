@@ -0,0 +1,118 @@
+"""
+Кэш stale-while-revalidate для данных меню бота
+
+Пока данные моложе soft_ttl - отдаются как есть. Между soft_ttl и hard_ttl
+отдаются сразу, а обновление запускается в фоне. Старше hard_ttl (или при
+первом обращении) - загружаются синхронно.
+
+Фоновое обновление не читает персистентный кэш ответов API: иначе при
+soft_ttl меньше TTL эндпоинта оно получило бы тот же сохраненный ответ
+со свежей отметкой времени. Запрос при этом условный (ETag), так что
+неизменившиеся данные обходятся ответом 304.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from modules import cache_registry, warm_cache
+from modules.memory_cache import MemoryCache
+from modules.rate_limiter import PRIORITY_BACKGROUND, request_priority
+from modules.response_cache import bypass_cache
+
+# Фоновые обновления всех SWR кэшей
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="swr-refresh")
+
+
+class SWRCache:
+    """
+    Args:
+        name: Имя кэша (для логов и статистики)
+        soft_ttl: Через сколько секунд данные обновляются в фоне
+        hard_ttl: Через сколько секунд данные больше не отдаются
+        max_entries: Максимальное количество ключей
+    """
+
+    def __init__(self, name, soft_ttl, hard_ttl, max_entries=500):
+        self.name = name
+        self.soft_ttl = soft_ttl
+        self._cache = MemoryCache(name, max_entries=max_entries, ttl=hard_ttl)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.stats = {"fresh": 0, "stale": 0, "loads": 0, "refreshes": 0, "refresh_errors": 0}
+        cache_registry.register(name, self.get_stats)
+        warm_cache.register_cache(f"swr:{name}", self)
+
+    def _load(self, key, loader):
+        with cache_registry.timed(self.name):
+            value = loader()
+        # Пустой ответ не запоминаем - следующий запрос попробует снова
+        if value:
+            self._cache.set(key, (value, time.monotonic()))
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            with request_priority(PRIORITY_BACKGROUND), bypass_cache():
+                self._load(key, loader)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            self.stats["refresh_errors"] += 1
+            print(f"[SWR {self.name}] Ошибка фонового обновления {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, loader):
+        """
+        Возвращает данные по ключу
+
+        Args:
+            key: Ключ (например, ID лиги)
+            loader: Функция без аргументов, загружающая свежие данные
+
+        Returns:
+            Последние известные данные или результат loader()
+        """
+        entry = self._cache.get(key)
+        if entry is None:
+            self.stats["loads"] += 1
+            return self._load(key, loader)
+
+        value, loaded_at = entry
+        if time.monotonic() - loaded_at < self.soft_ttl:
+            self.stats["fresh"] += 1
+            return value
+
+        self.stats["stale"] += 1
+        with self._lock:
+            start_refresh = key not in self._refreshing
+            if start_refresh:
+                self._refreshing.add(key)
+        if start_refresh:
+            _refresh_executor.submit(self._refresh, key, loader)
+        return value
+
+    def dump(self):
+        """Записи для сохранения: [(key, value, возраст данных, оставшийся ttl)]"""
+        now = time.monotonic()
+        return [(key, value, now - loaded_at, ttl) for key, (value, loaded_at), ttl in self._cache.dump()]
+
+    def restore(self, items, elapsed=0):
+        """Загружает записи из dump(); данные старше soft_ttl обновятся в фоне при первом запросе"""
+        now = time.monotonic()
+        restored = [
+            (key, (value, now - age - elapsed), ttl)
+            for key, value, age, ttl in items
+        ]
+        return self._cache.restore(restored, elapsed)
+
+    def invalidate(self, key=None):
+        """Сбрасывает один ключ или весь кэш"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.delete(key)
+
+    def get_stats(self):
+        """Счетчики SWR и размер кэша"""
+        return dict(self.stats, **self._cache.get_stats())
@@ -0,0 +1,218 @@
+"""
+Индекс команд: единый справочник клубов для всех модулей
+
+Названия от разных провайдеров ("Arsenal FC", "Club Atlético de Madrid",
+"FC Internazionale Milano") нормализуются (регистр, диакритика, служебные
+слова) и сводятся к одной записи команды: лига, элитный статус, город
+стадиона и ID в API-Football / Football-Data.org.
+
+Индекс строится один раз при импорте, поиск по названию - обращение к словарю.
+Названия, которых нет среди псевдонимов, сопоставляются по словам
+(а не по подстроке: "Inter" не совпадает с "Internacional"), результат запоминается.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+from modules import cache_registry
+
+# Служебные слова в названиях клубов, которые отличаются между провайдерами
+NAME_NOISE_TOKENS = {"fc", "cf", "afc", "sc", "ac", "ssc", "cfc", "club", "de", "calcio"}
+
+# Провайдеры данных (ключи TeamRecord.ids)
+API_FOOTBALL = "api_football"
+FOOTBALL_DATA = "football_data"
+
+TeamRecord = namedtuple("TeamRecord", ["name", "league", "elite", "city", "country", "ids", "aliases"])
+
+# Справочник клубов:
+# (название, лига, элитный клуб, (город стадиона, страна), {провайдер: ID}, псевдонимы)
+# Лига указана для клубов, участвующих в межлиговой поправке прогноза (None - не учитывается)
+TEAMS = [
+    # Англия (Premier League)
+    ("Manchester City", "Premier League", True, ("Manchester", "GB"), {API_FOOTBALL: 50, FOOTBALL_DATA: 65}, ["Man City"]),
+    ("Manchester United", "Premier League", True, ("Manchester", "GB"), {API_FOOTBALL: 33, FOOTBALL_DATA: 66}, ["Man United", "Man Utd"]),
+    ("Liverpool", "Premier League", True, ("Liverpool", "GB"), {API_FOOTBALL: 40, FOOTBALL_DATA: 64}, []),
+    ("Arsenal", "Premier League", True, ("London", "GB"), {API_FOOTBALL: 42, FOOTBALL_DATA: 57}, []),
+    ("Chelsea", "Premier League", True, ("London", "GB"), {API_FOOTBALL: 49, FOOTBALL_DATA: 61}, []),
+    ("Tottenham", "Premier League", False, ("London", "GB"), {API_FOOTBALL: 47, FOOTBALL_DATA: 73}, ["Tottenham Hotspur", "Spurs"]),
+    ("Newcastle", "Premier League", False, ("Newcastle", "GB"), {API_FOOTBALL: 34, FOOTBALL_DATA: 67}, ["Newcastle United"]),
+    ("Aston Villa", "Premier League", False, ("Birmingham", "GB"), {API_FOOTBALL: 66, FOOTBALL_DATA: 58}, []),
+    ("Everton", None, False, ("Liverpool", "GB"), {API_FOOTBALL: 45, FOOTBALL_DATA: 62}, []),
+    ("West Ham", None, False, ("London", "GB"), {API_FOOTBALL: 48, FOOTBALL_DATA: 563}, ["West Ham United"]),
+    ("Crystal Palace", None, False, ("London", "GB"), {API_FOOTBALL: 52, FOOTBALL_DATA: 354}, []),
+    ("Fulham", None, False, ("London", "GB"), {API_FOOTBALL: 36, FOOTBALL_DATA: 63}, []),
+    ("Brentford", None, False, ("London", "GB"), {API_FOOTBALL: 55, FOOTBALL_DATA: 402}, []),
+    ("Leicester", None, False, ("Leicester", "GB"), {API_FOOTBALL: 46, FOOTBALL_DATA: 338}, ["Leicester City"]),
+    ("Brighton", None, False, ("Brighton", "GB"), {API_FOOTBALL: 51, FOOTBALL_DATA: 397}, ["Brighton & Hove Albion"]),
+    ("Southampton", None, False, ("Southampton", "GB"), {API_FOOTBALL: 41, FOOTBALL_DATA: 340}, []),
+    ("Bournemouth", None, False, ("Bournemouth", "GB"), {API_FOOTBALL: 35, FOOTBALL_DATA: 1044}, ["AFC Bournemouth"]),
+    ("Nottingham Forest", None, False, ("Nottingham", "GB"), {API_FOOTBALL: 65, FOOTBALL_DATA: 351}, ["Nott'm Forest"]),
+    ("Leeds", None, False, ("Leeds", "GB"), {API_FOOTBALL: 63, FOOTBALL_DATA: 341}, ["Leeds United"]),
+    ("Wolves", None, False, ("Wolverhampton", "GB"), {API_FOOTBALL: 39, FOOTBALL_DATA: 76}, ["Wolverhampton Wanderers", "Wolverhampton"]),
+    ("Queens Park Rangers", None, False, ("London", "GB"), {API_FOOTBALL: 72}, ["QPR"]),
+
+    # Испания (La Liga)
+    ("Real Madrid", "La Liga", True, ("Madrid", "ES"), {API_FOOTBALL: 541, FOOTBALL_DATA: 86}, []),
+    ("Barcelona", "La Liga", True, ("Barcelona", "ES"), {API_FOOTBALL: 529, FOOTBALL_DATA: 81}, ["Barça"]),
+    ("Atletico Madrid", "La Liga", True, ("Madrid", "ES"), {API_FOOTBALL: 530, FOOTBALL_DATA: 78}, ["Atlético de Madrid", "Atleti"]),
+    ("Athletic Club", "La Liga", False, ("Bilbao", "ES"), {API_FOOTBALL: 531, FOOTBALL_DATA: 77}, ["Athletic Bilbao"]),
+    ("Real Sociedad", "La Liga", False, ("San Sebastian", "ES"), {API_FOOTBALL: 548, FOOTBALL_DATA: 92}, []),
+    ("Villarreal", "La Liga", False, ("Villarreal", "ES"), {API_FOOTBALL: 533, FOOTBALL_DATA: 94}, []),
+    ("Sevilla", "La Liga", False, ("Sevilla", "ES"), {API_FOOTBALL: 536, FOOTBALL_DATA: 559}, ["Seville"]),
+    ("Real Betis", "La Liga", False, ("Sevilla", "ES"), {API_FOOTBALL: 543, FOOTBALL_DATA: 90}, ["Betis"]),
+    ("Valencia", None, False, ("Valencia", "ES"), {API_FOOTBALL: 532, FOOTBALL_DATA: 95}, []),
+
+    # Италия (Serie A)
+    ("Inter", "Serie A", True, ("Milan", "IT"), {API_FOOTBALL: 505, FOOTBALL_DATA: 108}, ["Internazionale", "Internazionale Milano", "Inter Milan"]),
+    ("AC Milan", "Serie A", True, ("Milan", "IT"), {API_FOOTBALL: 489, FOOTBALL_DATA: 98}, []),
+    ("Juventus", "Serie A", True, ("Turin", "IT"), {API_FOOTBALL: 496, FOOTBALL_DATA: 109}, []),
+    ("Napoli", "Serie A", False, ("Naples", "IT"), {API_FOOTBALL: 492, FOOTBALL_DATA: 113}, []),
+    ("Roma", "Serie A", False, ("Rome", "IT"), {API_FOOTBALL: 497, FOOTBALL_DATA: 100}, ["AS Roma"]),
+    ("Lazio", "Serie A", False, ("Rome", "IT"), {API_FOOTBALL: 487, FOOTBALL_DATA: 110}, []),
+    ("Atalanta", "Serie A", False, ("Bergamo", "IT"), {API_FOOTBALL: 499, FOOTBALL_DATA: 102}, []),
+    ("Fiorentina", None, False, ("Florence", "IT"), {API_FOOTBALL: 502, FOOTBALL_DATA: 99}, []),
+
+    # Германия (Bundesliga)
+    ("Bayern Munich", "Bundesliga", True, ("Munich", "DE"), {API_FOOTBALL: 157, FOOTBALL_DATA: 5}, ["Bayern München", "Bayern"]),
+    ("Borussia Dortmund", "Bundesliga", True, ("Dortmund", "DE"), {API_FOOTBALL: 165, FOOTBALL_DATA: 4}, ["Dortmund", "BVB"]),
+    ("RB Leipzig", "Bundesliga", False, ("Leipzig", "DE"), {API_FOOTBALL: 173, FOOTBALL_DATA: 721}, []),
+    ("Bayer Leverkusen", "Bundesliga", False, ("Leverkusen", "DE"), {API_FOOTBALL: 168, FOOTBALL_DATA: 3}, ["Leverkusen"]),
+    ("Frankfurt", "Bundesliga", False, ("Frankfurt", "DE"), {API_FOOTBALL: 169, FOOTBALL_DATA: 19}, ["Eintracht Frankfurt"]),
+
+    # Франция (Ligue 1)
+    ("PSG", "Ligue 1", True, ("Paris", "FR"), {API_FOOTBALL: 85, FOOTBALL_DATA: 524}, ["Paris Saint-Germain", "Paris SG"]),
+    ("Monaco", "Ligue 1", False, ("Monaco", "MC"), {API_FOOTBALL: 91, FOOTBALL_DATA: 548}, []),
+    ("Marseille", "Ligue 1", False, ("Marseille", "FR"), {API_FOOTBALL: 81, FOOTBALL_DATA: 516}, ["Olympique de Marseille"]),
+    ("Lyon", "Ligue 1", False, ("Lyon", "FR"), {API_FOOTBALL: 80, FOOTBALL_DATA: 523}, ["Olympique Lyonnais"]),
+    ("Lille", "Ligue 1", False, ("Lille", "FR"), {API_FOOTBALL: 79, FOOTBALL_DATA: 521}, ["Lille OSC"]),
+
+    # Португалия (Primeira Liga)
+    ("Benfica", "Primeira Liga", True, ("Lisbon", "PT"), {API_FOOTBALL: 211, FOOTBALL_DATA: 1903}, ["SL Benfica"]),
+    ("Porto", "Primeira Liga", True, ("Porto", "PT"), {API_FOOTBALL: 212, FOOTBALL_DATA: 503}, ["FC Porto"]),
+    ("Sporting CP", "Primeira Liga", False, ("Lisbon", "PT"), {API_FOOTBALL: 228, FOOTBALL_DATA: 498}, ["Sporting Clube de Portugal", "Sporting Lisbon"]),
+
+    # Нидерланды (Eredivisie)
+    ("Ajax", "Eredivisie", False, ("Amsterdam", "NL"), {API_FOOTBALL: 194, FOOTBALL_DATA: 678}, []),
+    ("PSV", "Eredivisie", False, ("Eindhoven", "NL"), {API_FOOTBALL: 197, FOOTBALL_DATA: 674}, ["PSV Eindhoven"]),
+    ("Feyenoord", "Eredivisie", False, ("Rotterdam", "NL"), {API_FOOTBALL: 209, FOOTBALL_DATA: 675}, []),
+
+    # Греция (Greek Super League)
+    ("Olympiacos", "Greek Super League", False, ("Piraeus", "GR"), {API_FOOTBALL: 553}, ["Olympiakos Piraeus", "Olympiacos Piraeus", "Olympiakos"]),
+    ("Panathinaikos", "Greek Super League", False, ("Athens", "GR"), {API_FOOTBALL: 617}, []),
+    ("AEK Athens", "Greek Super League", False, ("Athens", "GR"), {API_FOOTBALL: 575}, []),
+
+    # Другие
+    ("Celtic", "Premiership", False, ("Glasgow", "GB"), {API_FOOTBALL: 247}, []),
+    ("Rangers", "Premiership", False, ("Glasgow", "GB"), {API_FOOTBALL: 257}, []),
+    ("Galatasaray", "Super Lig", False, ("Istanbul", "TR"), {API_FOOTBALL: 645}, []),
+    ("Fenerbahce", "Super Lig", False, ("Istanbul", "TR"), {API_FOOTBALL: 611}, ["Fenerbahçe"]),
+    ("Flamengo", None, False, ("Rio de Janeiro", "BR"), {}, []),
+    ("Corinthians", None, False, ("Sao Paulo", "BR"), {}, []),
+    ("Inter Miami", None, False, ("Miami", "US"), {}, []),
+]
+
+
+def normalize_name(name):
+    """
+    Нормализует название команды для сравнения между источниками
+
+    "Club Atlético de Madrid" -> "atletico madrid", "Arsenal FC" -> "arsenal"
+    """
+    if not name:
+        return ""
+    folded = unicodedata.normalize("NFKD", name.replace("ß", "ss"))
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch)).lower()
+    tokens = re.findall(r"[a-z0-9]+", folded)
+    meaningful = [token for token in tokens if token not in NAME_NOISE_TOKENS]
+    return " ".join(meaningful or tokens)
+
+
+def _build_index():
+    by_alias = {}
+    by_id = {}
+    for name, league, elite, (city, country), ids, aliases in TEAMS:
+        normalized = []
+        for alias in [name] + aliases:
+            key = normalize_name(alias)
+            if key and key not in normalized:
+                normalized.append(key)
+        record = TeamRecord(name, league, elite, city, country, ids, tuple(normalized))
+        for key in normalized:
+            by_alias.setdefault(key, record)
+        for provider, team_id in ids.items():
+            by_id[(provider, team_id)] = record
+    alias_tokens = [(frozenset(key.split()), record) for key, record in by_alias.items()]
+    return by_alias, by_id, alias_tokens
+
+
+_by_alias, _by_id, _alias_tokens = _build_index()
+
+
+@lru_cache(maxsize=4096)
+def lookup(team_name):
+    """
+    Запись команды по названию любого провайдера
+
+    Args:
+        team_name: Название команды ("Arsenal FC", "FC Bayern München")
+
+    Returns:
+        TeamRecord | None: Запись или None если команда неизвестна
+    """
+    key = normalize_name(team_name)
+    if not key:
+        return None
+    record = _by_alias.get(key)
+    if record is not None:
+        return record
+
+    # Совпадение по словам: все слова псевдонима есть в названии
+    # ("Bayer 04 Leverkusen" -> "Bayer Leverkusen"). Побеждает самый длинный псевдоним,
+    # при равенстве между разными командами результат неоднозначен.
+    tokens = set(key.split())
+    best, best_size, ambiguous = None, 0, False
+    for alias_tokens, candidate in _alias_tokens:
+        if alias_tokens <= tokens:
+            size = len(alias_tokens)
+            if size > best_size:
+                best, best_size, ambiguous = candidate, size, False
+            elif size == best_size and candidate is not best:
+                ambiguous = True
+    return None if ambiguous else best
+
+
+def by_id(provider, team_id):
+    """
+    Запись команды по ID провайдера
+
+    Args:
+        provider: API_FOOTBALL или FOOTBALL_DATA
+        team_id: ID команды у провайдера
+
+    Returns:
+        TeamRecord | None
+    """
+    return _by_id.get((provider, team_id))
+
+
+def canonical_name(team_name):
+    """Каноническое название команды (или исходное, если команда неизвестна)"""
+    record = lookup(team_name)
+    return record.name if record else team_name
+
+
+def get_stats():
+    """Размер индекса и попадания в кэш поиска"""
+    info = lookup.cache_info()
+    return {
+        "teams": len(TEAMS),
+        "aliases": len(_by_alias),
+        "hits": info.hits,
+        "misses": info.misses,
+        "entries": info.currsize,
+    }
+
+
+cache_registry.register_lru("team_index", lookup)
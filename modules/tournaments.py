@@ -0,0 +1,19 @@
+"""
+Турниры, доступные в меню /analyze и для прогрева прогнозов
+"""
+
+# Словарь турниров - все на одном уровне
+TOURNAMENTS = {
+    "premier_league": {"label": "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Премьер-лига", "league": "Premier League", "league_id": 39},
+    "la_liga": {"label": "🇪🇸 Ла Лига", "league": "La Liga", "league_id": 140},
+    "serie_a": {"label": "🇮🇹 Серия А", "league": "Serie A", "league_id": 135},
+    "bundesliga": {"label": "🇩🇪 Бундеслига", "league": "Bundesliga", "league_id": 78},
+    "ligue_1": {"label": "🇫🇷 Лига 1", "league": "Ligue 1", "league_id": 61},
+    "primeira_liga": {"label": "🇵🇹 Примейра Лига", "league": "Primeira Liga", "league_id": 235},
+    "eredivisie": {"label": "🇳🇱 Эредивизи", "league": "Eredivisie", "league_id": 88},
+    "championship": {"label": "🏴󠁧󠁢󠁥󠁮󠁧󠁿 Чемпионшип", "league": "Championship", "league_id": 40},
+    "serie_a_brazil": {"label": "🇧🇷 Бразильская Серия А", "league": "Campeonato Brasileiro Série A", "league_id": 71},
+    "champions_league": {"label": "⭐ Лига Чемпионов", "league": "Champions League", "league_id": 2},
+    "world_cup": {"label": "🌍 Чемпионат мира", "league": "World Cup", "league_id": 1},
+    "euro": {"label": "🇪🇺 Чемпионат Европы", "league": "European Championship", "league_id": 4}
+}
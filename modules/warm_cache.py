@@ -0,0 +1,211 @@
+"""
+Теплый перезапуск: сохранение горячих кэшей между деплоями
+
+Render перезапускает сервис при каждом деплое, локальный диск при этом
+очищается - первые пользователи после рестарта ждали холодных запросов к API.
+Теперь снимки турнирных таблиц, меню туров и матчей, кэши пространств имен
+(прогнозы, inline, метаданные ML моделей) и координаты городов сохраняются
+периодически и при остановке, а при старте загружаются до начала polling.
+
+Хранилище (WARM_CACHE_STORE):
+- "postgres" (по умолчанию) - строка в таблице warm_cache (создается миграцией),
+  переживает деплой
+- "file" - pickle файл WARM_CACHE_PATH (для локального запуска / постоянного диска)
+
+Снимок старше WARM_CACHE_MAX_AGE не загружается; у записей кэшей
+оставшийся TTL уменьшается на время простоя.
+"""
+import atexit
+import os
+import pickle
+import signal
+import sys
+import threading
+import time
+
+WARM_CACHE_ENABLED = os.getenv("WARM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+WARM_CACHE_STORE = os.getenv("WARM_CACHE_STORE", "postgres").lower()
+WARM_CACHE_PATH = os.getenv("WARM_CACHE_PATH", "warm_cache.pickle")
+WARM_CACHE_SAVE_INTERVAL = int(os.getenv("WARM_CACHE_SAVE_INTERVAL", "900"))
+WARM_CACHE_MAX_AGE = int(os.getenv("WARM_CACHE_MAX_AGE", str(6 * 3600)))
+
+# Источники: name -> (export() -> данные, import(данные, elapsed) -> количество)
+_sources = {}
+
+stats = {"saves": 0, "last_save_bytes": None, "last_save_seconds": None, "restored": 0}
+
+_saver = None
+_save_lock = threading.Lock()
+
+
+def register(name, export_fn, import_fn):
+    """
+    Регистрирует кэш для сохранения между перезапусками
+
+    Args:
+        name: Имя источника (ключ в снимке)
+        export_fn: Функция без аргументов, возвращающая сериализуемые pickle данные
+        import_fn: Функция (данные, elapsed), восстанавливающая кэш; elapsed -
+            секунды с момента сохранения. Возвращает количество записей.
+    """
+    _sources[name] = (export_fn, import_fn)
+
+
+def register_cache(name, cache):
+    """Регистрирует кэш с методами dump() / restore(items, elapsed)"""
+    register(name, cache.dump, cache.restore)
+
+
+# ---------- Хранилища ----------
+
+def _save_file(blob):
+    tmp_path = f"{WARM_CACHE_PATH}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(blob)
+    os.replace(tmp_path, WARM_CACHE_PATH)
+
+
+def _load_file():
+    if not os.path.exists(WARM_CACHE_PATH):
+        return None
+    with open(WARM_CACHE_PATH, "rb") as f:
+        return f.read()
+
+
+def _save_db(blob):
+    from psycopg2 import Binary
+    from modules.database import get_connection
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO warm_cache (id, payload, saved_at)
+            VALUES ('default', %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (id) DO UPDATE SET payload = EXCLUDED.payload, saved_at = CURRENT_TIMESTAMP
+        """, (Binary(blob),))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def _load_db():
+    from modules.database import get_connection
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT payload FROM warm_cache WHERE id = 'default'")
+        row = cur.fetchone()
+        cur.close()
+        return bytes(row[0]) if row else None
+    finally:
+        conn.close()
+
+
+def _store():
+    return (_save_file, _load_file) if WARM_CACHE_STORE == "file" else (_save_db, _load_db)
+
+
+# ---------- Сохранение и загрузка ----------
+
+def save():
+    """
+    Сохраняет все зарегистрированные кэши
+
+    Каждый источник сериализуется отдельно: ошибка одного не мешает остальным.
+
+    Returns:
+        int: Размер снимка в байтах (0 при ошибке)
+    """
+    started = time.monotonic()
+    caches = {}
+    for name, (export_fn, _) in list(_sources.items()):
+        try:
+            caches[name] = pickle.dumps(export_fn(), protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"[Warm Cache] Пропускаем {name}: {e}")
+
+    blob = pickle.dumps({"saved_at": time.time(), "caches": caches}, protocol=pickle.HIGHEST_PROTOCOL)
+    save_fn, _ = _store()
+    try:
+        with _save_lock:
+            save_fn(blob)
+    except Exception as e:
+        print(f"[Warm Cache] Ошибка сохранения: {e}")
+        return 0
+
+    stats["saves"] += 1
+    stats["last_save_bytes"] = len(blob)
+    stats["last_save_seconds"] = round(time.monotonic() - started, 2)
+    print(f"[Warm Cache] Сохранено: {len(caches)} кэшей, {len(blob) // 1024} КБ")
+    return len(blob)
+
+
+def restore():
+    """
+    Загружает сохраненные кэши (вызывается при старте до начала polling)
+
+    Returns:
+        int: Количество восстановленных записей
+    """
+    if not WARM_CACHE_ENABLED:
+        return 0
+
+    _, load_fn = _store()
+    try:
+        blob = load_fn()
+        snapshot = pickle.loads(blob) if blob else None
+    except Exception as e:
+        print(f"[Warm Cache] Ошибка загрузки снимка: {e}")
+        return 0
+    if not snapshot:
+        print("[Warm Cache] Снимка нет - холодный старт")
+        return 0
+
+    elapsed = max(0.0, time.time() - snapshot["saved_at"])
+    if elapsed > WARM_CACHE_MAX_AGE:
+        print(f"[Warm Cache] Снимок устарел ({elapsed / 3600:.1f} ч) - холодный старт")
+        return 0
+
+    restored = 0
+    for name, data in snapshot["caches"].items():
+        source = _sources.get(name)
+        if source is None:
+            continue
+        try:
+            count = source[1](pickle.loads(data), elapsed) or 0
+            restored += count
+            print(f"[Warm Cache] {name}: {count}")
+        except Exception as e:
+            print(f"[Warm Cache] Ошибка восстановления {name}: {e}")
+
+    stats["restored"] = restored
+    print(f"[Warm Cache] Восстановлено записей: {restored} (снимок {elapsed:.0f}с назад)")
+    return restored
+
+
+def _loop():
+    while True:
+        time.sleep(WARM_CACHE_SAVE_INTERVAL)
+        try:
+            save()
+        except Exception as e:
+            print(f"[Warm Cache] Ошибка периодического сохранения: {e}")
+
+
+def _on_sigterm(signum, frame):
+    # Render останавливает сервис через SIGTERM: завершаемся штатно, atexit сохранит кэши
+    sys.exit(0)
+
+
+def start_saver():
+    """Периодическое сохранение и сохранение при остановке (один раз на процесс)"""
+    global _saver
+    if not WARM_CACHE_ENABLED or _saver is not None:
+        return
+    _saver = threading.Thread(target=_loop, name="warm-cache-saver", daemon=True)
+    _saver.start()
+    atexit.register(save)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _on_sigterm)
+    print(f"[Warm Cache] Сохранение каждые {WARM_CACHE_SAVE_INTERVAL}с и при остановке ({WARM_CACHE_STORE})")
@@ -6,14 +6,33 @@
 - Экстремальная жара/холод снижает интенсивность игры
 """
 import os
-import requests
+import time
 from datetime import datetime
 import pytz
+from modules.http_client import http_get
+from modules.async_runner import to_async
+from modules.memory_cache import MemoryCache
+from modules.response_cache import cached_request
+from modules import team_index, warm_cache
 
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 GEO_URL = "http://api.openweathermap.org/geo/1.0/direct"
 WEATHER_URL = "https://api.openweathermap.org/data/2.5/forecast"
 
+# Прогноз обновляется раз в 3 часа: все матчи в городе внутри корзины делят одну загрузку
+FORECAST_BUCKET_SECONDS = 3 * 3600
+
+# Координаты городов не меняются - храним бессрочно (в памяти и в кэше ответов)
+_geocodes = MemoryCache("geocodes", max_entries=1000, ttl=None)
+warm_cache.register_cache("geocodes", _geocodes)
+
+
+def _fetch_json(url, params):
+    """GET к OpenWeatherMap (ключ API добавляется здесь и не попадает в ключ кэша)"""
+    response = http_get(url, params={**params, "appid": API_KEY})
+    response.raise_for_status()
+    return response.json()
+
 
 def _geocode_location(city_name, country_code=None):
     """
@@ -30,28 +49,31 @@ def _geocode_location(city_name, country_code=None):
         print("[Weather] OPENWEATHER_API_KEY не найден")
         return None
     
+    query = f"{city_name},{country_code}" if country_code else city_name
+    location = _geocodes.get(query)
+    if location is not None:
+        return location
+    
     try:
-        query = f"{city_name},{country_code}" if country_code else city_name
-        
         params = {
             "q": query,
-            "limit": 1,
-            "appid": API_KEY
+            "limit": 1
         }
         
-        response = requests.get(GEO_URL, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
+        # Пустой ответ (город не найден) не кэшируется
+        data = cached_request("openweather", "/geo/1.0/direct", params,
+                              lambda: _fetch_json(GEO_URL, params))
         
         if data and len(data) > 0:
-            location = data[0]
-            return {
-                "lat": location["lat"],
-                "lon": location["lon"],
-                "name": location["name"],
-                "country": location.get("country", "")
+            found = data[0]
+            location = {
+                "lat": found["lat"],
+                "lon": found["lon"],
+                "name": found["name"],
+                "country": found.get("country", "")
             }
+            _geocodes.set(query, location)
+            return location
         
         return None
     
@@ -98,19 +120,17 @@ def get_weather_forecast(city_name, country_code=None, match_datetime=None):
                 "error": f"Город {city_name} не найден"
             }
         
-        # Получаем прогноз погоды
+        # Получаем прогноз погоды (5 дней с шагом 3 часа - один на город в корзине)
         params = {
-            "lat": location["lat"],
-            "lon": location["lon"],
-            "appid": API_KEY,
+            "lat": round(location["lat"], 2),
+            "lon": round(location["lon"], 2),
             "units": "metric",  # Celsius
             "lang": "ru"
         }
+        bucket = int(time.time() // FORECAST_BUCKET_SECONDS)
         
-        response = requests.get(WEATHER_URL, params=params, timeout=10)
-        response.raise_for_status()
-        
-        forecast_data = response.json()
+        forecast_data = cached_request("openweather", "/data/2.5/forecast", dict(params, bucket=bucket),
+                                       lambda: _fetch_json(WEATHER_URL, params))
         
         # Находим прогноз, ближайший к времени матча
         if match_datetime:
@@ -264,68 +284,6 @@ def _analyze_impact_on_goals(temperature, description, wind_speed, rain, snow):
         return "neutral"  # Погода не влияет
 
 
-# Карта стадионов для популярных клубов
-# Используется для автоматического определения города по команде
-STADIUM_LOCATIONS = {
-    # Англия
-    "Arsenal": ("London", "GB"),
-    "Chelsea": ("London", "GB"),
-    "Tottenham": ("London", "GB"),
-    "West Ham": ("London", "GB"),
-    "Crystal Palace": ("London", "GB"),
-    "Fulham": ("London", "GB"),
-    "Brentford": ("London", "GB"),
-    "Manchester United": ("Manchester", "GB"),
-    "Manchester City": ("Manchester", "GB"),
-    "Liverpool": ("Liverpool", "GB"),
-    "Everton": ("Liverpool", "GB"),
-    "Newcastle": ("Newcastle", "GB"),
-    "Aston Villa": ("Birmingham", "GB"),
-    "Leicester": ("Leicester", "GB"),
-    "Brighton": ("Brighton", "GB"),
-    "Southampton": ("Southampton", "GB"),
-    "Bournemouth": ("Bournemouth", "GB"),
-    "Nottingham Forest": ("Nottingham", "GB"),
-    "Leeds": ("Leeds", "GB"),
-    "Wolves": ("Wolverhampton", "GB"),
-    
-    # Испания
-    "Real Madrid": ("Madrid", "ES"),
-    "Atletico Madrid": ("Madrid", "ES"),
-    "Barcelona": ("Barcelona", "ES"),
-    "Sevilla": ("Sevilla", "ES"),
-    "Valencia": ("Valencia", "ES"),
-    "Villarreal": ("Villarreal", "ES"),
-    "Athletic Club": ("Bilbao", "ES"),
-    "Real Sociedad": ("San Sebastian", "ES"),
-    "Real Betis": ("Sevilla", "ES"),
-    
-    # Италия
-    "Juventus": ("Turin", "IT"),
-    "Inter": ("Milan", "IT"),
-    "AC Milan": ("Milan", "IT"),
-    "Napoli": ("Naples", "IT"),
-    "Roma": ("Rome", "IT"),
-    "Lazio": ("Rome", "IT"),
-    "Atalanta": ("Bergamo", "IT"),
-    "Fiorentina": ("Florence", "IT"),
-    
-    # Германия
-    "Bayern Munich": ("Munich", "DE"),
-    "Borussia Dortmund": ("Dortmund", "DE"),
-    "RB Leipzig": ("Leipzig", "DE"),
-    "Bayer Leverkusen": ("Leverkusen", "DE"),
-    "Frankfurt": ("Frankfurt", "DE"),
-    
-    # Франция
-    "PSG": ("Paris", "FR"),
-    "Marseille": ("Marseille", "FR"),
-    "Lyon": ("Lyon", "FR"),
-    "Monaco": ("Monaco", "MC"),
-    "Lille": ("Lille", "FR"),
-}
-
-
 def get_weather_for_match(home_team, away_team=None, match_datetime=None, venue_city=None):
     """
     Автоматически получает погоду для матча
@@ -339,11 +297,12 @@ def get_weather_for_match(home_team, away_team=None, match_datetime=None, venue_
     Returns:
         dict: Данные о погоде
     """
-    # Пытаемся определить город
+    # Пытаемся определить город (справочник команд понимает любое написание названия)
+    team = team_index.lookup(home_team)
     if venue_city:
         city, country = venue_city, None
-    elif home_team in STADIUM_LOCATIONS:
-        city, country = STADIUM_LOCATIONS[home_team]
+    elif team and team.city:
+        city, country = team.city, team.country
     else:
         # Не знаем где играют - возвращаем недоступность
         return {
@@ -352,3 +311,8 @@ def get_weather_for_match(home_team, away_team=None, match_datetime=None, venue_
         }
     
     return get_weather_forecast(city, country, match_datetime)
+
+
+# Асинхронный интерфейс (те же функции в общем пуле потоков)
+get_weather_forecast_async = to_async(get_weather_forecast)
+get_weather_for_match_async = to_async(get_weather_for_match)
@@ -11,6 +11,7 @@ from modules.odds_fetcher import fetch_odds as fetch_odds_global
 from modules.predictor import generate
 from modules.message_formatter import format_match_analysis
 from modules.database import get_team_subscribers, get_notified_users_for_match, mark_notifications_sent_bulk
+from modules.rate_limiter import request_priority, PRIORITY_BACKGROUND
 import json
 from datetime import datetime, timezone, timedelta
 import pytz
@@ -111,7 +112,7 @@ def run_once():
                 continue
             home_stats = get_team_stats(m["home_id"])
             away_stats = get_team_stats(m["away_id"])
-            odds = fetch_odds_global(m["id"])
+            odds = fetch_odds_global(m["id"], m.get("home"), m.get("away"))
             analysis = generate(m, home_stats, away_stats, odds)
             text = format_match_analysis(m, home_stats, away_stats, odds, analysis)
             
@@ -157,9 +158,11 @@ def verify_results():
 
 
 if __name__ == "__main__":
-    # Сначала проверяем результаты завершенных матчей
-    verify_results()
-    # Отправляем уведомления подписчикам за 2 часа до матчей
-    notify_subscribers()
-    # Затем делаем прогнозы для предстоящих (за 50-70 минут)
-    run_once()
+    # Все запросы scheduler - фоновые: уступают квоту интерактивным запросам бота
+    with request_priority(PRIORITY_BACKGROUND):
+        # Сначала проверяем результаты завершенных матчей
+        verify_results()
+        # Отправляем уведомления подписчикам за 2 часа до матчей
+        notify_subscribers()
+        # Затем делаем прогнозы для предстоящих (за 50-70 минут)
+        run_once()